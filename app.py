@@ -1,10 +1,9 @@
 import streamlit as st
 from src.book_qa import BookQA, openai_client
 import os
-import json
-import re
-from pathlib import Path
+import time
 from dotenv import load_dotenv
+from src.answer_cache import AnswerCache
 
 # Modelo padrão fixo
 DEFAULT_MODEL = "gpt-4o-mini"
@@ -16,34 +15,10 @@ if 'OPENAI_API_KEY' in os.environ:
 # Load environment variables from .env file
 load_dotenv()
 
-# Função para busca de texto exato nos chunks
-def busca_texto_exato(query, book_name="principios", max_results=3):
-    chunks_file = Path(f"stores/{book_name}/chunks.json")
-    if not chunks_file.exists():
-        return []
-    
-    with open(chunks_file, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
-    
-    # Criar expressão regular para busca exata (case insensitive)
-    pattern = re.compile(re.escape(query), re.IGNORECASE)
-    
-    # Encontrar matches diretos
-    resultados = []
-    for chunk in chunks:
-        # Corrigido: usando "content" em vez de "text"
-        if pattern.search(chunk["content"]):
-            resultados.append({
-                "content": chunk["content"],
-                "metadata": chunk["metadata"],
-                "score": 0.0,  # Score 0 para resultados exatos (melhor prioridade)
-                "book": book_name,
-                "match_tipo": "exato"
-            })
-            if len(resultados) >= max_results:
-                break
-    
-    return resultados
+@st.cache_resource
+def get_answer_cache():
+    """Answer cache shared by every session of this process."""
+    return AnswerCache()
 
 # Initialize session state
 if 'chat_history' not in st.session_state:
@@ -121,49 +96,41 @@ if query := st.chat_input("Digite sua pergunta..."):
     with st.chat_message("user"):
         st.write(query)
     
-    # Search for relevant chunks
-    with st.spinner("Buscando informações relevantes..."):
-        # Busca híbrida: combine busca exata com busca vetorial
-        results = []
-        
-        if usar_busca_hibrida:
-            # Primeiro tenta busca exata
-            exact_results = busca_texto_exato(query, "principios")
-            if exact_results:
-                st.sidebar.success(f"Encontradas {len(exact_results)} correspondências exatas!")
-                results.extend(exact_results)
-        
-        # Adiciona resultados da busca vetorial
-        vector_results = st.session_state.qa.search(query, k=num_chunks)
-        
-        # Filtrar para evitar duplicações de páginas
-        seen_pages = set(r["metadata"]["page"] for r in results)
-        filtered_vector_results = []
-        
-        for r in vector_results:
-            if r["metadata"]["page"] not in seen_pages:
-                seen_pages.add(r["metadata"]["page"])
-                r["match_tipo"] = "vetorial"
-                filtered_vector_results.append(r)
-        
-        results.extend(filtered_vector_results)
-        
-        # Ordenar por score (menor é melhor)
-        results = sorted(results, key=lambda x: x["score"])
-        
-        # Limitar ao número solicitado
-        if len(results) > num_chunks:
-            results = results[:num_chunks]
+    # Perguntas repetidas (ou equivalentes) são respondidas a partir do cache
+    qa = st.session_state.qa
+    answer_cache = get_answer_cache()
+    start = time.perf_counter()
+    scope = qa.cache_scope(DEFAULT_MODEL, num_chunks, usar_busca_hibrida)
+    query_embedding = qa.embed_query(query)
+    cached = answer_cache.get(query, scope, query_embedding)
+    if cached is not None:
+        results, response = cached.sources, cached.answer
+        st.sidebar.info(f"Resposta do cache ({cached.match}, similaridade {cached.similarity:.2f}) "
+                        f"em {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        # Search for relevant chunks
+        with st.spinner("Buscando informações relevantes..."):
+            if usar_busca_hibrida:
+                # Busca híbrida: BM25 e vetorial em paralelo, combinadas por fusão de rankings
+                results = st.session_state.qa.hybrid_search(query, k=num_chunks)
+                exact_count = sum(1 for r in results if "bm25" in r["retrievers"])
+                if exact_count:
+                    st.sidebar.success(f"Encontradas {exact_count} correspondências textuais!")
+            else:
+                results = st.session_state.qa.search(query, k=num_chunks)[:num_chunks]
+                for r in results:
+                    r["match_tipo"] = "vetorial"
     
-    # Prepare context
-    context = "\n\n".join([
-        f"[Página {r['metadata']['page']}]\n{r['content']}"
-        for r in results
-    ])
+        # Prepare context
+        context = "\n\n".join([
+            f"[Página {r['metadata']['page']}]\n{r['content']}"
+            for r in results
+        ])
     
-    # Get GPT response
-    with st.spinner(f"Gerando resposta com {DEFAULT_MODEL}..."):
-        response = get_gpt_response(query, context)
+        # Get GPT response
+        with st.spinner(f"Gerando resposta com {DEFAULT_MODEL}..."):
+            response = get_gpt_response(query, context)
+        answer_cache.put(query, scope, response, results, time.perf_counter() - start, query_embedding)
     
     # Add assistant message to chat
     st.session_state.chat_history.append({
@@ -176,7 +143,16 @@ if query := st.chat_input("Digite sua pergunta..."):
     # Show sources
     with st.expander("Ver fontes utilizadas"):
         for i, r in enumerate(results, 1):
-            match_type = "📍 Match Exato" if r.get("match_tipo") == "exato" else "🔍 Match Vetorial"
+            match_type = {"exato": "📍 Match Exato", "híbrido": "🔗 Match Híbrido"}.get(r.get("match_tipo"), "🔍 Match Vetorial")
             st.subheader(f"Fonte {i} - {match_type} (Relevância: {r['score']:.4f})")
-            st.caption(f"Página {r['metadata']['page']}")
-            st.text_area("Conteúdo", r['content'], height=200, key=f"source_{i}") 
\ No newline at end of file
+            ranks = ", ".join(f"{name} #{info['rank']}" for name, info in r.get("retrievers", {}).items())
+            st.caption(f"{r['book']} - Página {r['metadata']['page']}" + (f" ({ranks})" if ranks else ""))
+            st.text_area("Conteúdo", r['content'], height=200, key=f"source_{i}")
+
+# Estatísticas do cache de respostas
+cache_stats = get_answer_cache().stats()
+st.sidebar.caption(
+    f"Cache de respostas: {cache_stats['entries']} entradas, "
+    f"{cache_stats['hit_ratio']:.0%} de acertos em {cache_stats['lookups']} consultas, "
+    f"{cache_stats['saved_seconds']:.1f} s poupados"
+)
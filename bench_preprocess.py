@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Compare the legacy and NumPy OCR preprocessing on sample pages of a PDF.
+
+For every sample page this times preprocess + tesseract with both
+pipelines and measures character accuracy against a reference text: a
+page-marked .txt file (e.g. a hand-checked or LLM-cleaned version of the
+book) or, without one, the PDF's embedded text layer.
+"""
+import sys
+import time
+from difflib import SequenceMatcher
+from statistics import mean
+
+import pytesseract
+from pdf2image import convert_from_path
+from pypdf import PdfReader
+
+from src.config import OCR_DPI, OCR_LANG
+from src.image_preprocessing import preprocess
+from src.page_file import PageFile
+from src.pdf_processor import preprocess_image, clean_text
+
+PIPELINES = {
+    "legacy": preprocess_image,
+    "numpy": lambda image: preprocess(image, ("grayscale", "otsu", "deskew", "crop")),
+    "numpy-adaptive": lambda image: preprocess(image, ("grayscale", "adaptive", "deskew", "crop")),
+}
+
+def reference_pages(pdf_path: str, pages: list, reference_file: str = None) -> dict:
+    """Load the reference text of each sample page."""
+    if reference_file:
+        page_file = PageFile(reference_file)
+        return {page: page_file.read_page(page) for page in pages}
+    reader = PdfReader(pdf_path)
+    return {page: reader.pages[page - 1].extract_text() or '' for page in pages}
+
+def accuracy(text: str, reference: str) -> float:
+    """Character-level similarity between OCR output and the reference (0-1)."""
+    normalize = lambda t: ' '.join(t.split())
+    return SequenceMatcher(None, normalize(text), normalize(reference), autojunk=False).ratio()
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python bench_preprocess.py <pdf> [primeira_página] [última_página] [referência.txt]")
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]
+    first = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    last = int(sys.argv[3]) if len(sys.argv) > 3 else first + 4
+    reference_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    pages = list(range(first, last + 1))
+    references = reference_pages(pdf_path, pages, reference_file)
+    images = convert_from_path(pdf_path, dpi=OCR_DPI, first_page=first, last_page=last)
+
+    results = {name: {"preprocess": [], "ocr": [], "accuracy": []} for name in PIPELINES}
+    for page, image in zip(pages, images):
+        for name, pipeline in PIPELINES.items():
+            start = time.perf_counter()
+            processed = pipeline(image)
+            preprocessed = time.perf_counter()
+            text = clean_text(pytesseract.image_to_string(processed, lang=OCR_LANG))
+            done = time.perf_counter()
+
+            results[name]["preprocess"].append(preprocessed - start)
+            results[name]["ocr"].append(done - preprocessed)
+            results[name]["accuracy"].append(accuracy(text, references[page]))
+            print(f"Página {page:4d} {name:15s} pré {preprocessed - start:6.3f}s  "
+                  f"OCR {done - preprocessed:6.3f}s  precisão {results[name]['accuracy'][-1]:.3f}")
+
+    print(f"\nMédias em {len(pages)} páginas ({OCR_DPI} DPI):")
+    print(f"{'pipeline':15s} {'pré (s)':>9s} {'OCR (s)':>9s} {'total (s)':>10s} {'precisão':>9s}")
+    for name, r in results.items():
+        total = mean(r["preprocess"]) + mean(r["ocr"])
+        print(f"{name:15s} {mean(r['preprocess']):9.3f} {mean(r['ocr']):9.3f} {total:10.3f} "
+              f"{mean(r['accuracy']):9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Compare the Chroma and NumPy (stacked exact search) store backends.
+
+Reports load time (open plus first query), p50/p99 search latency over
+all loaded books with the query already embedded, and the recall@k of
+Chroma's approximate index against exact search. Stores not indexed with
+the configured embeddings are re-indexed into a temporary directory first;
+use EMBEDDING_PROVIDER=local to run offline.
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import mean
+import numpy as np
+from langchain_community.vectorstores import Chroma
+
+from bench_vectors import QUESTIONS
+from src.chunk_store import has_chunk_store, open_chunk_store, write_chunk_store
+from src.embeddings import get_embeddings
+from src.incremental_index import store_identity, update_book_store
+from src.vector_index import StackedVectorIndex, has_vectors
+
+def prepare_stores(embeddings, work_dir: Path) -> dict:
+    """Map each book to a store directory indexed with `embeddings`."""
+    stores = {}
+    for store_dir in sorted(p for p in Path("stores").iterdir() if has_chunk_store(str(p))):
+        if store_identity(str(store_dir)) == embeddings.identity() and has_vectors(str(store_dir)):
+            stores[store_dir.name] = store_dir
+            continue
+        print(f"{store_dir.name}: a indexar numa cópia temporária...")
+        target = work_dir / store_dir.name
+        target.mkdir()
+        chunks = list(open_chunk_store(str(store_dir)))
+        write_chunk_store(str(target), chunks)
+        update_book_store(chunks, str(target), store_dir.name, embeddings)
+        stores[store_dir.name] = target
+    return stores
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    embeddings = get_embeddings()
+    print(f"Embeddings: {embeddings.identity()}  k={k}\n")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stores = prepare_stores(embeddings, Path(work_dir))
+        sample = [c["content"] for path in stores.values() for c in list(open_chunk_store(str(path)))[::7]]
+        queries = QUESTIONS + [' '.join(text.split()[:12]) for text in sample]
+        query_vectors = embeddings.embed_documents(queries)
+
+        # Load: open every store and run one query
+        start = time.perf_counter()
+        chroma = {book: Chroma(persist_directory=str(path), embedding_function=embeddings)
+                  for book, path in stores.items()}
+        for store in chroma.values():
+            store.similarity_search_by_vector_with_relevance_scores(query_vectors[0], k=k)
+        chroma_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stacked = StackedVectorIndex(embeddings)
+        for book, path in stores.items():
+            stacked.add_book(book, str(path))
+        stacked.search_books(query_vectors[0], k)
+        numpy_load = time.perf_counter() - start
+
+        chroma_times, numpy_times, recalls = [], [], []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            chroma_results = {
+                book: store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+                for book, store in chroma.items()
+            }
+            chroma_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            exact = stacked.search_books(vector, k)
+            numpy_times.append(time.perf_counter() - start)
+
+            for book, results in exact.items():
+                expected = {(r["metadata"]["page"], r["content"]) for r in results}
+                found = {(doc.metadata["page"], doc.page_content) for doc, _ in chroma_results[book]}
+                recalls.append(len(expected & found) / len(expected) if expected else 1.0)
+
+    print(f"{len(stores)} livros, {len(stacked.matrix)} chunks, {len(queries)} consultas\n")
+    print(f"{'backend':8s} {'carga (ms)':>11s} {'p50 (ms)':>9s} {'p99 (ms)':>9s} {f'recall@{k}':>10s}")
+    print(f"{'chroma':8s} {chroma_load * 1000:11.1f} {percentile(chroma_times, 50):9.3f} "
+          f"{percentile(chroma_times, 99):9.3f} {mean(recalls):10.3f}")
+    print(f"{'numpy':8s} {numpy_load * 1000:11.1f} {percentile(numpy_times, 50):9.3f} "
+          f"{percentile(numpy_times, 99):9.3f} {1.0:10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Compare float32, float16 and int8 vector search on the book stores.
+
+For every store under stores/ this reports the memory held by each
+representation and recall@k against exact float32 search, with and
+without full-precision rescoring. Stores without exported vectors
+(vectors.npy) are embedded on the fly with EMBEDDING_PROVIDER; use
+EMBEDDING_PROVIDER=local to run offline.
+"""
+import sys
+import time
+from pathlib import Path
+from statistics import mean
+import numpy as np
+
+from src.chunk_store import has_chunk_store, open_chunk_store
+from src.config import RESCORE_FACTOR
+from src.embeddings import get_embeddings
+from src.vector_index import VECTORS_FILE, CompactVectors
+
+QUESTIONS = [
+    "O que é o princípio da dignidade da pessoa humana?",
+    "Quais são as características do Estado de Direito?",
+    "Como se relacionam o princípio democrático e a separação de poderes?",
+    "O que diz o Tribunal Constitucional sobre a proteção da confiança?",
+    "Qual é o sentido do princípio da socialidade?",
+    "Direitos fundamentais e limites à restrição de direitos",
+]
+
+def load_store(store_dir: Path, embeddings):
+    chunks = list(open_chunk_store(str(store_dir)))
+    if (store_dir / VECTORS_FILE).exists():
+        return chunks, np.load(store_dir / VECTORS_FILE)
+    print(f"{store_dir.name}: sem {VECTORS_FILE}, a gerar embeddings de {len(chunks)} chunks...")
+    return chunks, np.array(embeddings.embed_documents([c["content"] for c in chunks]), dtype=np.float32)
+
+def main():
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    embeddings = get_embeddings()
+    print(f"Embeddings: {embeddings.identity()}  k={k}\n")
+
+    for store_dir in sorted(p for p in Path("stores").iterdir() if has_chunk_store(str(p))):
+        chunks, vectors = load_store(store_dir, embeddings)
+        # The fixed questions plus the opening words of every 5th chunk
+        queries = QUESTIONS + [' '.join(c["content"].split()[:12]) for c in chunks[::5]]
+        query_vectors = embeddings.embed_documents(queries)
+
+        baseline = CompactVectors.from_vectors(vectors, "float32")
+        expected = [[row for row, _ in baseline.search(q, k)] for q in query_vectors]
+
+        print(f"{store_dir.name}: {len(chunks)} chunks x {vectors.shape[1]} dims, {len(queries)} consultas")
+        print(f"{'formato':10s} {'rescore':>8s} {'memória (KB)':>13s} {'redução':>8s} {f'recall@{k}':>10s} {'ms/consulta':>12s}")
+        for quantization in ("float32", "float16", "int8"):
+            for rescore in ((0,) if quantization == "float32" else (0, RESCORE_FACTOR)):
+                index = CompactVectors.from_vectors(vectors, quantization, rescore=rescore)
+                start = time.perf_counter()
+                found = [[row for row, _ in index.search(q, k)] for q in query_vectors]
+                elapsed = (time.perf_counter() - start) / len(queries)
+                recall = mean(len(set(f) & set(e)) / len(e) for f, e in zip(found, expected))
+                print(f"{quantization:10s} {rescore:8d} {index.nbytes / 1024:13.1f} "
+                      f"{baseline.nbytes / index.nbytes:7.1f}x {recall:10.3f} {elapsed * 1000:12.3f}")
+        print()
+
+if __name__ == "__main__":
+    main()
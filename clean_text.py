@@ -1,4 +1,4 @@
-from src.text_cleaner import clean_ocr_text
+from src.text_cleaner import clean_ocr_text, export_batch_requests, import_batch_results
 import sys
 from pathlib import Path
 import os
@@ -12,8 +12,10 @@ if 'OPENAI_API_KEY' in os.environ:
 load_dotenv()
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Uso: python clean_text.py <arquivo_txt>")
+    usage = ("Uso: python clean_text.py <arquivo_txt> "
+             "[--batch-export | --batch-import <resultados.jsonl>]")
+    if len(sys.argv) not in (2, 3, 4):
+        print(usage)
         sys.exit(1)
     
     input_file = sys.argv[1]
@@ -21,5 +23,14 @@ if __name__ == "__main__":
         print(f"Erro: Arquivo {input_file} não encontrado")
         sys.exit(1)
     
-    clean_ocr_text(input_file)
-    print("\nProcesso de limpeza concluído!") 
\ No newline at end of file
+    if len(sys.argv) == 2:
+        clean_ocr_text(input_file)
+        print("\nProcesso de limpeza concluído!")
+    elif sys.argv[2] == "--batch-export" and len(sys.argv) == 3:
+        export_batch_requests(input_file)
+    elif sys.argv[2] == "--batch-import" and len(sys.argv) == 4:
+        import_batch_results(input_file, sys.argv[3])
+        print("\nProcesso de limpeza concluído!")
+    else:
+        print(usage)
+        sys.exit(1)
\ No newline at end of file
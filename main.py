@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from src.pdf_processor import process_pdf, needs_ocr
+from src.pdf_processor import process_pdf, classify_pages
 from src.vector_store import VectorStore
 from src.config import load_config
 
@@ -13,12 +13,13 @@ def process_pdfs(pdf_dir: str) -> list:
     for pdf_path in pdf_files:
         print(f"\nProcessing {pdf_path.name}...")
         
-        # Check if PDF needs OCR
-        requires_ocr = needs_ocr(str(pdf_path))
+        # Check if PDF needs OCR (the classification is reused, so the PDF is parsed once)
+        pages = classify_pages(str(pdf_path))
+        requires_ocr = any(text is None for text in pages)
         print(f"OCR needed: {requires_ocr}")
         
         # Process PDF and get chunks
-        doc_chunks = process_pdf(str(pdf_path), needs_ocr=requires_ocr)
+        doc_chunks = process_pdf(str(pdf_path), needs_ocr=requires_ocr, pages=pages)
         
         # Add source information to chunks
         chunks.extend([{
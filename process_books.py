@@ -1,25 +1,68 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from src.config import INGEST_WORKERS
 from src.text_chunker import process_book
 
+def process_one(path: Path) -> dict:
+    """Process one book, logging with its name and turning failures into a summary entry."""
+    book = path.stem.replace('_cleaned', '')
+    log = lambda message: print(f"[{book}] {message}", flush=True)
+    start = time.perf_counter()
+    try:
+        return process_book(str(path), log=log)
+    except Exception as e:
+        log(f"Erro: {e}")
+        return {"book": book, "error": str(e), "seconds": time.perf_counter() - start}
+
+def print_summary(results: list, wall_time: float) -> None:
+    print(f"\n{'Livro':40s} {'Páginas':>8s} {'Chunks':>8s} {'Tokens':>10s} {'Embeddings':>10s} {'Tempo (s)':>10s}")
+    for r in sorted(results, key=lambda r: r["book"]):
+        if "error" in r:
+            print(f"{r['book'][:40]:40s} {'ERRO: ' + r['error'][:60]}")
+            continue
+        print(f"{r['book'][:40]:40s} {r['pages']:8d} {r['chunks']:8d} {r['tokens']:10d} "
+              f"{r['index'].embedded_chunks:10d} {r['seconds']:10.1f}")
+    done = [r for r in results if "error" not in r]
+    print(f"\n{len(done)}/{len(results)} livros processados em {wall_time:.1f}s "
+          f"({sum(r['tokens'] for r in done)} tokens, {sum(r['chunks'] for r in done)} chunks)")
+
 def main():
+    # Usage: python process_books.py [pasta] [--workers N]
+    args = sys.argv[1:]
+    workers = INGEST_WORKERS
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+
     # Find all cleaned text files
-    data_dir = Path("data")
-    cleaned_files = list(data_dir.glob("*_cleaned.txt"))
-    
+    data_dir = Path(args[0] if args else "data")
+    cleaned_files = sorted(data_dir.glob("*_cleaned.txt"))
+
     if not cleaned_files:
-        print("Nenhum arquivo de texto limpo encontrado em data/")
+        print(f"Nenhum arquivo de texto limpo encontrado em {data_dir}/")
         return
-    
+
     print(f"Encontrados {len(cleaned_files)} arquivos para processar:")
     for f in cleaned_files:
         print(f"- {f.name}")
-    
-    print("\nProcessando arquivos...")
-    for f in cleaned_files:
-        print(f"\nProcessando {f.name}...")
-        process_book(str(f))
-    
+
+    # Books run on threads: the work is mostly waiting on the embedding API,
+    # and the threads share one embedding cache and rate limiter
+    print(f"\nProcessando arquivos ({workers} em paralelo)...")
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(process_one, f) for f in cleaned_files]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    print_summary(results, time.perf_counter() - start)
     print("\nProcessamento concluído!")
+    if any("error" in r for r in results):
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,117 +1,120 @@
 #!/usr/bin/env python3
-import sys
-from src.book_qa import BookQA, openai_client
-import os
-from dotenv import load_dotenv
 import time
-from src.cost_calculator import count_tokens, calculate_cost, format_cost
-
-# Modelo a ser usado
-MODEL = "gpt-4o-mini"
-
-# Unset any existing OPENAI_API_KEY
-if 'OPENAI_API_KEY' in os.environ:
-    del os.environ['OPENAI_API_KEY']
+STARTED = time.perf_counter()
+import http.client
+import json
+import sys
+from typing import Optional
+from src.config import QUERY_DAEMON_HOST, QUERY_DAEMON_PORT
+from src.cost_calculator import format_cost
 
-# Load environment variables from .env file
-load_dotenv()
+def query_daemon(query: str, books, timeout: float = 300, port: Optional[int] = None):
+    """Ask a running query_daemon.py; None when there is none or it does not answer properly."""
+    port = port or QUERY_DAEMON_PORT
+    conn = http.client.HTTPConnection(QUERY_DAEMON_HOST, port, timeout=timeout)
+    try:
+        conn.request("POST", "/query", body=json.dumps({"query": query, "books": books, "k": 4}),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        payload = json.loads(response.read())
+        if not isinstance(payload, dict):
+            raise ValueError("resposta não é um objeto JSON")
+    except ConnectionRefusedError:
+        return None
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        # Timeouts, resets, or something other than the daemon on that port
+        print(f"Servidor de consultas em {QUERY_DAEMON_HOST}:{port} não respondeu ({e}); "
+              "consultando neste processo")
+        return None
+    finally:
+        conn.close()
+    if response.status != 200:
+        print(f"Erro do servidor: {payload.get('erro')}")
+        sys.exit(1)
+    return payload
 
-def get_gpt_response(query: str, context: str) -> tuple[str, float]:
-    """Get response from GPT-4o-mini and calculate costs."""
-    print(f"Chamando {MODEL}...")
-    start = time.time()
-    
-    system_prompt = """Você é um assistente especializado em direito constitucional português.
-    Use o contexto fornecido para responder à pergunta do usuário.
-    Baseie sua resposta APENAS no contexto fornecido.
-    Se o contexto não for suficiente para responder à pergunta, diga isso claramente.
-    Cite as páginas relevantes do livro em sua resposta."""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"""Contexto do livro:
-        {context}
-        
-        Pergunta: {query}
-        
-        Por favor, responda à pergunta usando apenas o contexto fornecido acima."""}
-    ]
-    
-    # Count input tokens
-    input_text = "".join(m["content"] for m in messages)
-    input_tokens = count_tokens(input_text)
-    
-    response = openai_client.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0
-    )
-    
-    # Get response text and count output tokens
-    response_text = response.choices[0].message.content
-    output_tokens = count_tokens(response_text)
-    
-    # Calculate cost
-    cost = calculate_cost(input_tokens, output_tokens)
-    
-    print(f"{MODEL} respondeu em {time.time() - start:.2f} segundos")
-    print(f"Tokens: {input_tokens} entrada, {output_tokens} saída")
-    print(f"Custo: {format_cost(cost)}")
-    
-    return response_text, cost
+def query_in_process(query: str, books):
+    """Run the query in this process, printing how long each startup phase took."""
+    print("Nenhum servidor de consultas ativo, inicializando sistema...")
+    start = time.perf_counter()
+    from src.query_service import QueryService
+    imported = time.perf_counter()
+    service = QueryService()
+    service.warm_up(books)
+    ready = time.perf_counter()
+    print(f"Sistema inicializado em {ready - STARTED:.2f} segundos")
+    print(f"  imports: {(imported - start) * 1000:.1f} ms")
+    print(f"  abrir livros: {(ready - imported) * 1000:.1f} ms")
+    return service.query(query, books)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python3 query_book.py <consulta>")
+    args = sys.argv[1:]
+    books = None
+    port = None
+    # --porta N: o servidor foi iniciado com query_daemon.py --porta N
+    if "--porta" in args:
+        i = args.index("--porta")
+        if i + 1 >= len(args) or not args[i + 1].isdigit():
+            args = []
+        else:
+            port = int(args[i + 1])
+            del args[i:i + 2]
+    # --livro NOME (repetível) limita a consulta a esses livros
+    while "--livro" in args:
+        i = args.index("--livro")
+        if i + 1 >= len(args):
+            args = []
+            break
+        books = (books or []) + [args[i + 1]]
+        del args[i:i + 2]
+    if not args:
+        print("Uso: python3 query_book.py [--porta N] [--livro NOME]... <consulta>")
         sys.exit(1)
-    
+
     # Get query from command line arguments (handle multiple words)
-    query = " ".join(sys.argv[1:])
-    
-    # Initialize QA system and load books
-    print("Inicializando sistema...")
-    start = time.time()
-    qa = BookQA()
-    qa.load_books()
-    print(f"Sistema inicializado em {time.time() - start:.2f} segundos")
-    
-    # Search
+    query = " ".join(args)
+
+    # Use the query daemon when one is running, otherwise answer in this process
     print("\nBuscando chunks relevantes...")
-    start = time.time()
-    results = qa.search(query, k=4)
-    print(f"Chunks encontrados em {time.time() - start:.2f} segundos")
-    
-    # Calculate embedding cost
-    embedding_tokens = count_tokens(query, model="text-embedding-3-small")
-    embedding_cost = calculate_cost(embedding_tokens, 0, model="text-embedding-3-small")
-    print(f"Custo dos embeddings: {format_cost(embedding_cost)}")
-    
-    # Prepare context from results
-    context = "\n\n".join([
-        f"[Página {r['metadata']['page']}]\n{r['content']}"
-        for r in results
-    ])
-    
-    # Get GPT response
-    response, response_cost = get_gpt_response(query, context)
-    
-    # Total cost
-    total_cost = response_cost + embedding_cost
-    
+    result = query_daemon(query, books, port=port)
+    if result is not None:
+        print(f"Resposta do servidor em {time.perf_counter() - STARTED:.2f} segundos")
+    else:
+        result = query_in_process(query, books)
+
+    timings = result["timings"]
+    print(f"Chunks encontrados em {timings['retrieval']:.2f} segundos")
+    print(f"  embedding da consulta: {timings['embed'] * 1000:.1f} ms")
+    for book, seconds in timings["open"].items():
+        print(f"  abrir {book}: {seconds * 1000:.1f} ms")
+    for book, seconds in timings["books"].items():
+        print(f"  {book}: {seconds * 1000:.1f} ms")
+    print(f"  busca vetorial: {timings['vector'] * 1000:.1f} ms")
+    print(f"  busca BM25: {timings['lexical'] * 1000:.1f} ms")
+    print(f"  fusão: {timings['fusion'] * 1000:.1f} ms")
+    print(f"Custo dos embeddings: {format_cost(result['costs']['embedding'])}")
+
+    print(f"{result['model']} respondeu em {timings['llm']:.2f} segundos")
+    print(f"Tokens: {result['tokens']['input']} entrada, {result['tokens']['output']} saída")
+    print(f"Custo: {format_cost(result['costs']['response'])}")
+
     print("\nResposta:")
     print("=" * 80)
-    print(response)
+    print(result["answer"])
     print("=" * 80)
-    print(f"Custo total: {format_cost(total_cost)}")
-    
+    print(f"Custo total: {format_cost(result['costs']['total'])}")
+    print(f"Tempo total: {time.perf_counter() - STARTED:.2f} segundos")
+
     print("\nTrechos relevantes utilizados:")
-    for i, r in enumerate(results, 1):
+    for i, r in enumerate(result["results"], 1):
         print(f"\n--- Trecho {i} ---")
         print(f"Livro: {r['book']}")
         print(f"Página: {r['metadata']['page']}")
-        print(f"Score: {r['score']:.4f}")
+        print(f"Score: {r['score']:.4f} ({r['match_tipo']})")
+        for name, info in r["retrievers"].items():
+            print(f"  {name}: posição {info['rank']}, score {info['score']:.4f}")
         print("\nConteúdo:")
         print(r['content'])
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Keep BookQA, the stores and the OpenAI client warm for query_book.py.
+
+Usage: python query_daemon.py [--porta N] [--livro NOME]...
+
+Books given with --livro are opened before the first query; the others
+are opened by the first query that needs them. The port defaults to
+QUERY_DAEMON_PORT; pass the same --porta to query_book.py.
+"""
+import asyncio
+import sys
+from src.config import QUERY_DAEMON_HOST, QUERY_DAEMON_PORT
+from src.query_service import QueryService, serve
+
+def main():
+    args = sys.argv[1:]
+    port = QUERY_DAEMON_PORT
+    if "--porta" in args:
+        i = args.index("--porta")
+        port = int(args[i + 1])
+        del args[i:i + 2]
+    books = []
+    while "--livro" in args:
+        i = args.index("--livro")
+        books.append(args[i + 1])
+        del args[i:i + 2]
+
+    service = QueryService()
+    if books:
+        print("Abrindo livros...")
+        service.warm_up(books)
+    try:
+        asyncio.run(serve(service, QUERY_DAEMON_HOST, port))
+    except KeyboardInterrupt:
+        print("\nEncerrando...")
+
+if __name__ == "__main__":
+    main()
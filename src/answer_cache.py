@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from src.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL
+from src.text_index import TOKEN_PATTERN, fold
+
+def normalize_query(query: str) -> str:
+    """Exact-match key of a question: casefolded, accents, punctuation and extra spaces dropped."""
+    return ' '.join(TOKEN_PATTERN.findall(fold(query)))
+
+@dataclass(frozen=True)
+class CacheScope:
+    """What an answer depends on besides the question."""
+    model: str
+    books: Tuple[Tuple[str, int], ...]  # (book, index version), sorted by book
+    settings: Tuple = ()  # Retrieval settings that change the context, e.g. k
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[dict]
+    seconds: float  # Time it took to produce the answer
+    created: float = field(default_factory=time.time)
+    match: str = "exato"  # How the last lookup found it: "exato" or "semântico"
+    similarity: float = 1.0
+
+class AnswerCache:
+    """In-memory cache of generated answers, looked up by question text and meaning.
+
+    Entries live in a CacheScope (see `BookQA.cache_scope`). A question
+    matches an entry of the same scope when its normalized text is equal or,
+    failing that, when its embedding's cosine similarity to the cached
+    question is at least `threshold`. Entries expire after `ttl`
+    seconds, the least recently used go first past `max_entries`, and entries
+    for an older version of a book are dropped when its index changes.
+    Safe to share between threads and Streamlit sessions.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple[CacheScope, str], Tuple[Optional[np.ndarray], CachedAnswer]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    @staticmethod
+    def _unit(embedding: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, answer: CachedAnswer, now: float) -> bool:
+        return bool(self.ttl) and now - answer.created > self.ttl
+
+    def _drop_stale(self, scope: CacheScope, now: float) -> None:
+        """Drop expired entries and those built on another version of a book in `scope`."""
+        versions = dict(scope.books)
+        for key in [key for key, (_, answer) in self._entries.items()
+                    if self._expired(answer, now) or any(
+                        book in versions and versions[book] != version for book, version in key[0].books)]:
+            del self._entries[key]
+
+    def get(self, query: str, scope: CacheScope, embedding: Optional[Sequence[float]] = None) -> Optional[CachedAnswer]:
+        """The cached answer to query in scope, or None; `embedding` enables similarity matches."""
+        start = time.perf_counter()
+        now = time.time()
+        found = None
+        with self._lock:
+            self._drop_stale(scope, now)
+            key = (scope, normalize_query(query))
+            if key in self._entries:
+                found, similarity, match = key, 1.0, "exato"
+            else:
+                vector = self._unit(embedding)
+                candidates = [(k, v) for k, (v, _) in self._entries.items() if k[0] == scope and v is not None]
+                if vector is not None and candidates and self.threshold < 1:
+                    similarities = np.stack([v for _, v in candidates]) @ vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        found, similarity, match = candidates[best][0], float(similarities[best]), "semântico"
+            if found is None:
+                self.misses += 1
+                self.lookup_seconds += time.perf_counter() - start
+                return None
+            self._entries.move_to_end(found)
+            answer = replace(self._entries[found][1], match=match, similarity=similarity)
+            if match == "exato":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            elapsed = time.perf_counter() - start
+            self.lookup_seconds += elapsed
+            self.saved_seconds += max(answer.seconds - elapsed, 0.0)
+            return answer
+
+    def put(self, query: str, scope: CacheScope, answer: str, sources: List[dict], seconds: float,
+            embedding: Optional[Sequence[float]] = None) -> None:
+        """Cache an answer that took `seconds` to produce."""
+        if not self.max_entries:
+            return
+        key = (scope, normalize_query(query))
+        with self._lock:
+            self._entries[key] = (self._unit(embedding), CachedAnswer(answer, sources, seconds))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "saved_seconds": self.saved_seconds,
+            "lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0
+        }
@@ -1,11 +1,22 @@
 from pathlib import Path
-from typing import List, Optional
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from src.embeddings import embeddings_for
+from src.config import HYBRID_CANDIDATES, SEARCH_WORKERS, STORE_BACKEND, VECTOR_QUANTIZATION
+from src.hybrid import LEXICAL, VECTOR, reciprocal_rank_fusion
+from src.chunk_store import has_chunk_store
+from src.answer_cache import CacheScope
+from src.incremental_index import index_version, load_catalog
+from src.text_index import open_text_index, search_books
+from src.vector_index import CompactBookStore, StackedVectorIndex, has_vectors
+
 # Unset any existing OPENAI_API_KEY
 if 'OPENAI_API_KEY' in os.environ:
     del os.environ['OPENAI_API_KEY']
@@ -21,28 +32,98 @@ if not api_key:
 # Create a single OpenAI client instance with explicit API key
 openai_client = OpenAI(api_key=api_key)
 
+# Stores opened by any BookQA in this process, keyed by kind, path, index version and options
+_shared_stores: Dict[Tuple, Any] = {}
+_shared_lock = threading.Lock()
+
+def shared_store(kind: str, store_path: Path, opener: Callable[[], Any], *options) -> Any:
+    """Open a store once per process and reuse it until its index changes."""
+    path = str(Path(store_path).resolve())
+    key = (kind, path, index_version(path)) + options
+    with _shared_lock:
+        if key in _shared_stores:
+            return _shared_stores[key]
+    store = opener()
+    with _shared_lock:
+        # Handles to an older version of this store are dropped
+        for old in [k for k in _shared_stores if k[:2] == key[:2] and k[2] != key[2]]:
+            del _shared_stores[old]
+        return _shared_stores.setdefault(key, store)
+
+def open_vector_store(store_path: Path, embeddings):
+    """A book's vector store: compact NumPy vectors when configured and exported, else Chroma."""
+    if VECTOR_QUANTIZATION and has_vectors(str(store_path)):
+        # Compact in-memory vectors instead of Chroma's float32 index
+        try:
+            return CompactBookStore(str(store_path), embeddings, VECTOR_QUANTIZATION)
+        except ValueError as e:
+            # Vectors out of step with the chunks; Chroma keeps its own copy of each chunk
+            print(f"Aviso: {e}")
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=str(store_path), embedding_function=embeddings)
+
+class LazyStore:
+    """Handle to a book's vector store that opens it, or reuses the process's copy, on first search."""
+    
+    def __init__(self, store_path: Path, embeddings):
+        self.store_path = store_path
+        self.embeddings = embeddings
+        self.open_seconds = 0.0
+        self._store = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        return self._store is not None
+    
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                start = time.perf_counter()
+                self._store = shared_store(
+                    "vectors", self.store_path, lambda: open_vector_store(self.store_path, self.embeddings),
+                    VECTOR_QUANTIZATION, id(self.embeddings)
+                )
+                self.open_seconds = time.perf_counter() - start
+            return self._store
+    
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4):
+        return self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+
 class BookQA:
-    def __init__(self, stores_dir: str = "stores"):
-        """Initialize with path to stores directory."""
-        self.stores_dir = Path(stores_dir)
+    def __init__(self, stores_dir: str = "stores", embeddings=None):
+        """Initialize with path to stores directory.
         
-        # Create embeddings with the shared API key
-        self.embeddings = OpenAIEmbeddings(
-            api_key=api_key,
-            model="text-embedding-3-small"  # Using the latest embedding model
-        )
+        Books come from the directory's catalog.json. Each store is queried
+        with the embeddings recorded for it; when `embeddings` is given,
+        stores built with other ones are refused.
+        """
+        self.stores_dir = Path(stores_dir)
+        self.embeddings = embeddings
         
+        self.catalog = load_catalog(str(self.stores_dir))
         self.available_books = self._get_available_books()
         self.active_stores = {}
+        self.text_indexes = {}
+        # Per-book searches and BM25; the pool starts its threads on first use
+        self._executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS)
     
     def _get_available_books(self) -> List[str]:
         """Get list of available book stores."""
-        return [d.name for d in self.stores_dir.iterdir() if d.is_dir()]
+        return list(self.catalog)
     
     def load_books(self, book_names: Optional[List[str]] = None) -> None:
-        """Load specific books or all available books if none specified."""
+        """Load specific books or all available books if none specified.
+        
+        Stores are not opened here: each book gets a handle that opens its
+        store on the first search (see LazyStore), reusing one already open
+        in this process.
+        """
         # Clear current stores
         self.active_stores = {}
+        self.text_indexes = {}
+        stacked = {}
         
         # If no books specified, load all
         if book_names is None:
@@ -55,32 +136,191 @@ class BookQA:
                 continue
             
             store_path = self.stores_dir / book
-            self.active_stores[book] = Chroma(
-                persist_directory=str(store_path),
-                embedding_function=self.embeddings
-            )
+            entry = self.catalog[book]
+            if self.embeddings is not None and entry["embedding"] != self.embeddings.identity():
+                print(f"Aviso: Livro '{book}' ignorado: usa embeddings {entry['embedding']}, "
+                      f"incompatíveis com {self.embeddings.identity()}")
+                continue
+            try:
+                embeddings = self.embeddings or embeddings_for(entry["embedding"])
+            except ValueError as e:
+                # An old manifest naming a model this version no longer knows
+                print(f"Aviso: Livro '{book}' ignorado: {e}")
+                continue
+            if STORE_BACKEND == "numpy" and entry["vectors"]:
+                # One exact-search matrix per embedding model, shared by its books (mmapped, built on first search)
+                if id(embeddings) not in stacked:
+                    stacked[id(embeddings)] = StackedVectorIndex(embeddings)
+                try:
+                    stacked[id(embeddings)].add_book(book, str(store_path))
+                except ValueError as e:
+                    print(f"Aviso: Livro '{book}' ignorado: {e}")
+                    continue
+                self.active_stores[book] = stacked[id(embeddings)]
+            else:
+                self.active_stores[book] = LazyStore(store_path, embeddings)
             print(f"Carregado: {book}")
     
-    def search(self, query: str, k: int = 4) -> List[dict]:
-        """Search across all loaded books."""
+    def _search_store(self, book_name: str, store, embedding: List[float],
+                      k: int) -> Dict[str, Tuple[List[dict], float]]:
+        """Vector lookup in one store; returns its results (best first) and elapsed seconds."""
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        results = [
+            {
+                "content": doc.page_content,
+                "metadata": doc.metadata,
+                "score": score,
+                "book": book_name
+            }
+            for doc, score in docs
+        ]
+        results.sort(key=lambda x: x["score"])
+        return {book_name: (results, time.perf_counter() - start)}
+    
+    def _search_stacked(self, store: StackedVectorIndex, embedding: List[float], k: int,
+                        books: List[str]) -> Dict[str, Tuple[List[dict], float]]:
+        """Search several books in one stacked index; each book reports the shared elapsed time."""
+        start = time.perf_counter()
+        results = store.search_books(embedding, k, books)
+        elapsed = time.perf_counter() - start
+        return {book_name: (results[book_name], elapsed) for book_name in books}
+    
+    def search(self, query: str, k: int = 4, timings: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """Search across all loaded books.
+        
+        The query is embedded once per embedding model, the books are
+        searched concurrently and their sorted results are merged with a
+        k-way heap merge. Per-book timings of this call are stored in
+        `timings` when a dict is given.
+        """
         if not self.active_stores:
             raise ValueError("Nenhum livro carregado. Use load_books() primeiro.")
         
-        results = []
+        start = time.perf_counter()
+        query_embeddings = {}
+        for store in self.active_stores.values():
+            embeddings = store.embeddings
+            if id(embeddings) not in query_embeddings:
+                query_embeddings[id(embeddings)] = embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        
+        futures = []
+        stacked = {}
+        opening = [book_name for book_name, store in self.active_stores.items()
+                   if isinstance(store, LazyStore) and not store.is_open]
         for book_name, store in self.active_stores.items():
-            docs = store.similarity_search_with_score(query, k=k)
-            for doc, score in docs:
-                results.append({
-                    "content": doc.page_content,
-                    "metadata": doc.metadata,
-                    "score": score,
-                    "book": book_name
-                })
-        
-        # Sort by score (lower is better)
-        results.sort(key=lambda x: x["score"])
+            if isinstance(store, StackedVectorIndex):
+                # Books sharing a stacked index are searched with a single matmul
+                stacked.setdefault(id(store), (store, []))[1].append(book_name)
+            else:
+                futures.append(self._executor.submit(self._search_store, book_name, store,
+                                                     query_embeddings[id(store.embeddings)], k))
+        for store, books in stacked.values():
+            futures.append(self._executor.submit(self._search_stacked, store,
+                                                 query_embeddings[id(store.embeddings)], k, books))
+        per_book = {}
+        for future in futures:
+            per_book.update(future.result())
+        searched = time.perf_counter()
+        
+        # Merge the per-book lists by score (lower is better)
+        results = list(heapq.merge(*(r for r, _ in per_book.values()), key=lambda x: x["score"]))
+        
+        if timings is not None:
+            timings.update({
+                "embed": embedded - start,
+                "books": {book_name: seconds for book_name, (_, seconds) in per_book.items()},
+                "search": searched - embedded,
+                # Stores opened by this search; their time is part of their book's
+                "open": {book_name: self.active_stores[book_name].open_seconds for book_name in opening},
+                "total": time.perf_counter() - start
+            })
         return results
 
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query with the first loaded book's embeddings (cached, so a later search reuses it)."""
+        if not self.active_stores:
+            raise ValueError("Nenhum livro carregado. Use load_books() primeiro.")
+        return next(iter(self.active_stores.values())).embeddings.embed_query(query)
+    
+    def cache_scope(self, model: str, *settings) -> CacheScope:
+        """AnswerCache scope for answers by `model` from the loaded books as they are now."""
+        books = tuple(sorted((book, index_version(str(self.stores_dir / book))) for book in self.active_stores))
+        return CacheScope(model, books, settings)
+    
+    def _open_text_indexes(self) -> None:
+        for book_name in self.active_stores:
+            store_path = self.stores_dir / book_name
+            if book_name not in self.text_indexes and has_chunk_store(str(store_path)):
+                self.text_indexes[book_name] = shared_store("text", store_path,
+                                                            lambda: open_text_index(str(store_path)))
+    
+    def open_stores(self) -> None:
+        """Open every loaded book's vector store and text index now rather than on first search."""
+        for store in self.active_stores.values():
+            if isinstance(store, LazyStore):
+                store.store
+            else:
+                store.matrix
+        self._open_text_indexes()
+    
+    def text_search(self, query: str, limit: int = 5, operator: str = "AND") -> List[dict]:
+        """Full-text search across all loaded books, best BM25 matches first.
+        
+        Matching ignores case and accents and folds plurals; quoted passages
+        and dates are matched as phrases. Each book's index is opened (and
+        built if missing) on first use.
+        """
+        if not self.active_stores:
+            raise ValueError("Nenhum livro carregado. Use load_books() primeiro.")
+        
+        self._open_text_indexes()
+        results = search_books(self.text_indexes, query, limit, operator)
+        for r in results:
+            r["match_tipo"] = "exato"
+        return results
+    
+    def hybrid_search(self, query: str, k: int = 4, candidates: int = HYBRID_CANDIDATES,
+                      timings: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """Search with BM25 and vectors at once and fuse both rankings.
+        
+        Each retriever contributes its best `candidates` chunks across the
+        loaded books; they are merged with reciprocal-rank fusion and
+        deduplicated by (book, page, chunk). Returns the best `k`, highest
+        `score` first, with each retriever's rank and score in `retrievers`.
+        Timings of this call are stored in `timings` when a dict is given.
+        """
+        if not self.active_stores:
+            raise ValueError("Nenhum livro carregado. Use load_books() primeiro.")
+        
+        start = time.perf_counter()
+        
+        def lexical():
+            lexical_start = time.perf_counter()
+            # Any-term matching: questions rarely contain every word of a passage
+            results = self.text_search(query, limit=candidates, operator="OR")
+            return results, time.perf_counter() - lexical_start
+        
+        # BM25 runs in the pool while this thread embeds the query and searches the vectors
+        lexical_future = self._executor.submit(lexical)
+        vector_timings: Dict[str, Any] = {}
+        vector_results = self.search(query, k=candidates, timings=vector_timings)[:candidates]
+        lexical_results, lexical_seconds = lexical_future.result()
+        searched = time.perf_counter()
+        
+        results = reciprocal_rank_fusion({LEXICAL: lexical_results, VECTOR: vector_results}, k)
+        
+        if timings is not None:
+            timings.update({
+                **vector_timings,
+                "lexical": lexical_seconds,
+                "vector": vector_timings["total"],
+                "fusion": time.perf_counter() - searched,
+                "total": time.perf_counter() - start
+            })
+        return results
+    
     def list_available_books(self) -> None:
         """Print list of available books."""
         print("\nLivros disponíveis:")
@@ -0,0 +1,160 @@
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+
+BLOB_FILE = "chunks.bin"
+INDEX_FILE = "chunks.index.npy"
+META_FILE = "chunks.meta.json"
+LEGACY_FILE = "chunks.json"
+FORMAT_VERSION = 1
+
+# Marks an integer metadata field a chunk does not have
+MISSING = np.iinfo(np.int32).min
+# Written after every chunk's text in the blob
+SEPARATOR = b'\x00'
+
+def _write_atomic(path: Path, write) -> None:
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def write_chunk_store(store_dir: str, chunks: List[Dict[str, Any]]) -> None:
+    """Write chunks as a text blob plus a columnar metadata index.
+
+    chunks.bin holds every chunk's UTF-8 text back to back; chunks.index.npy
+    is a structured array with each chunk's byte offset and length and one
+    column per metadata field (integers as they are, other values as codes
+    into a per-field dictionary kept in chunks.meta.json).
+    """
+    store_dir = Path(store_dir)
+    keys: List[str] = []
+    for chunk in chunks:
+        keys.extend(key for key in chunk["metadata"] if key not in keys)
+    int_keys = [key for key in keys if all(
+        isinstance(chunk["metadata"].get(key, 0), int) and not isinstance(chunk["metadata"].get(key), bool)
+        for chunk in chunks
+    )]
+    dictionaries: Dict[str, List[Any]] = {key: [] for key in keys if key not in int_keys}
+    codes: Dict[str, Dict[str, int]] = {key: {} for key in dictionaries}
+
+    dtype = [("offset", "<u8"), ("length", "<u4")] + [(key, "<i4") for key in keys]
+    index = np.zeros(len(chunks), dtype=dtype)
+    texts = []
+    offset = 0
+    for row, chunk in enumerate(chunks):
+        data = chunk["content"].encode('utf-8')
+        texts.append(data)
+        index[row]["offset"] = offset
+        index[row]["length"] = len(data)
+        offset += len(data) + len(SEPARATOR)
+        metadata = chunk["metadata"]
+        for key in keys:
+            if key not in metadata:
+                index[row][key] = MISSING
+            elif key in int_keys:
+                index[row][key] = metadata[key]
+            else:
+                encoded = json.dumps(metadata[key], ensure_ascii=False, sort_keys=True)
+                if encoded not in codes[key]:
+                    codes[key][encoded] = len(dictionaries[key])
+                    dictionaries[key].append(metadata[key])
+                index[row][key] = codes[key][encoded]
+
+    def write_blob(f):
+        for data in texts:
+            f.write(data)
+            f.write(SEPARATOR)
+
+    _write_atomic(store_dir / BLOB_FILE, write_blob)
+    _write_atomic(store_dir / INDEX_FILE, lambda f: np.save(f, index))
+    meta = {"version": FORMAT_VERSION, "keys": keys, "dictionaries": dictionaries}
+    _write_atomic(store_dir / META_FILE, lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+class ChunkStore:
+    """Read-only chunk store over the memory-mapped text blob and column index.
+
+    Chunk text is only decoded when asked for; lookups by row and by page
+    are O(1) and `iter_raw` walks the texts as memoryviews without copying.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.keys: List[str] = meta["keys"]
+        self.dictionaries: Dict[str, List[Any]] = meta["dictionaries"]
+        self.index = np.load(self.store_dir / INDEX_FILE, mmap_mode='r')
+        self._file = open(self.store_dir / BLOB_FILE, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._view = memoryview(self._blob)
+        self._pages: Optional[Dict[int, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def raw(self, row: int) -> memoryview:
+        """A chunk's UTF-8 text as a view into the memory map."""
+        offset, length = int(self.index["offset"][row]), int(self.index["length"][row])
+        return self._view[offset:offset + length]
+
+    def content(self, row: int) -> str:
+        return str(self.raw(row), 'utf-8')
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        entry = self.index[row]
+        metadata = {}
+        for key in self.keys:
+            value = int(entry[key])
+            if value == MISSING:
+                continue
+            metadata[key] = self.dictionaries[key][value] if key in self.dictionaries else value
+        return metadata
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        return {"content": self.content(row), "metadata": self.metadata(row)}
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def iter_raw(self) -> Iterator[memoryview]:
+        """Yield every chunk's text as a memoryview, without copying or decoding."""
+        for offset, length in zip(self.index["offset"], self.index["length"]):
+            yield self._view[int(offset):int(offset) + int(length)]
+
+    def rows_for_page(self, page: int) -> List[int]:
+        """Rows of the chunks starting on a page."""
+        if self._pages is None:
+            pages = np.asarray(self.index["page"]) if "page" in self.keys else np.zeros(0, dtype=np.int32)
+            order = np.argsort(pages, kind='stable')
+            values, starts = np.unique(pages[order], return_index=True)
+            self._pages = {int(v): order[s:e] for v, s, e in zip(values, starts, list(starts[1:]) + [len(order)])}
+        return [int(row) for row in self._pages.get(page, [])]
+
+    def page(self, page: int) -> List[Dict[str, Any]]:
+        return [self[row] for row in self.rows_for_page(page)]
+
+    def close(self) -> None:
+        self._view.release()
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+def has_chunk_store(store_dir: str) -> bool:
+    """Whether a store has chunks, in the binary store or a chunks.json to convert."""
+    return (Path(store_dir) / META_FILE).exists() or (Path(store_dir) / LEGACY_FILE).exists()
+
+def open_chunk_store(store_dir: str) -> ChunkStore:
+    """Open a store's chunks, converting a chunks.json newer than the binary store first."""
+    store_dir = Path(store_dir)
+    legacy = store_dir / LEGACY_FILE
+    blob = store_dir / META_FILE
+    if legacy.exists() and (not blob.exists() or blob.stat().st_mtime_ns < legacy.stat().st_mtime_ns):
+        with open(legacy, 'r', encoding='utf-8') as f:
+            write_chunk_store(str(store_dir), json.load(f))
+    return ChunkStore(str(store_dir))
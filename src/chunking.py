@@ -0,0 +1,216 @@
+import re
+from dataclasses import dataclass
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+
+# Pages the cleaner marked as having no usable text
+SKIPPED_PAGES = ("(Página em branco)", "(Página ilegível)")
+
+CONTINUES_PATTERN = re.compile(r"\[continua\]\W*\Z")
+MARKER_PATTERN = re.compile(r"\s*\[continua(?:ção)?\]\s*")
+PARAGRAPH_PATTERN = re.compile(r"\S(?:.*?\S)?(?=\s*\n\s*\n|\s*\Z)", re.DOTALL)
+# A sentence ends at . ! ? or … unless the next word is lowercase or a number ("cf. art. 5")
+SENTENCE_PATTERN = re.compile(r"\S.*?(?:[.!?…]+[\"'»”)]*(?=\s+[^\sa-zà-ÿ\d])|\Z)", re.DOTALL)
+# Bare page numbers and blank-page notes the cleaner left at the top of some pages
+NOISE_PATTERN = re.compile(r"\d{1,4}|\(Página em branco\)")
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the embedding model's tiktoken encoding.
+
+    Falls back to a 4-characters-per-token estimate when the encoding
+    cannot be loaded (tiktoken downloads it on first use).
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+@dataclass
+class Sentence:
+    text: str
+    page: int
+    start: int  # Char offset in its page's content
+    end_page: int
+    end: int  # Char offset in end_page's content
+    paragraph_start: bool
+    tokens: int
+    segments: Tuple[Tuple[int, int, int], ...]  # (page, start, end) spans of the source the text comes from
+
+def _clean(text: str) -> str:
+    return MARKER_PATTERN.sub(' ', text).strip()
+
+def split_sentences(page_num: int, content: str, count: Callable[[str], int] = count_tokens) -> List[Sentence]:
+    """Split a page into sentences, keeping their char offsets and paragraph starts."""
+    sentences = []
+    for paragraph in PARAGRAPH_PATTERN.finditer(content):
+        first = True
+        for match in SENTENCE_PATTERN.finditer(paragraph.group()):
+            text = _clean(match.group())
+            if not text:
+                continue
+            start = paragraph.start() + match.start()
+            end = paragraph.start() + match.end()
+            sentences.append(Sentence(text, page_num, start, page_num, end, first, count(text),
+                                      ((page_num, start, end),)))
+            first = False
+    return sentences
+
+def _words(sentence: Sentence, contents: Dict[int, str]) -> List[Tuple[int, int, int, str]]:
+    """The sentence's words as (page, start, end, word), with offsets in their page's content."""
+    words = []
+    for page, start, end in sentence.segments:
+        # Blank out the markers without shifting offsets; what is left matches _clean's words
+        span = MARKER_PATTERN.sub(lambda m: ' ' * len(m.group()), contents[page][start:end])
+        words.extend((page, start + m.start(), start + m.end(), m.group()) for m in re.finditer(r'\S+', span))
+    return words
+
+def _split_long(sentence: Sentence, max_tokens: int, count: Callable[[str], int],
+                contents: Dict[int, str]) -> List[Sentence]:
+    """Cut a sentence longer than a whole chunk into word windows of at most max_tokens.
+
+    Windows are sized from the tokens per word and cut again while they
+    still count over the limit (a single word is never cut). Each window
+    keeps the offsets of its own first and last word.
+    """
+    def split(words: List[Tuple[int, int, int, str]], tokens: int) -> List[Sentence]:
+        per_window = max(1, min(len(words) - 1, int(len(words) * max_tokens / max(tokens, 1))))
+        parts = []
+        for i in range(0, len(words), per_window):
+            window = words[i:i + per_window]
+            text = ' '.join(word for *_, word in window)
+            window_tokens = count(text)
+            if window_tokens > max_tokens and len(window) > 1:
+                parts.extend(split(window, window_tokens))
+                continue
+            segments = []
+            for page, group in groupby(window, key=itemgetter(0)):
+                group = list(group)
+                segments.append((page, group[0][1], group[-1][2]))
+            parts.append(Sentence(text, window[0][0], window[0][1], window[-1][0], window[-1][2],
+                                  False, window_tokens, tuple(segments)))
+        return parts
+
+    parts = split(_words(sentence, contents), sentence.tokens)
+    parts[0].paragraph_start = sentence.paragraph_start
+    return parts
+
+def _join(sentences: List[Sentence]) -> str:
+    text = sentences[0].text
+    for sentence in sentences[1:]:
+        text += ('\n\n' if sentence.paragraph_start else ' ') + sentence.text
+    return text
+
+def pack_sentences(sentences: List[Sentence], chunk_size: int, overlap: int) -> Iterator[List[Sentence]]:
+    """Group sentences into windows of at most chunk_size tokens.
+
+    A window preferably ends at a paragraph break when one falls in its
+    second half, and the next window repeats up to `overlap` tokens of
+    trailing sentences.
+    """
+    window: List[Sentence] = []
+    tokens = 0
+    for sentence in sentences:
+        carry = True
+        while window and tokens + sentence.tokens > chunk_size:
+            cut = len(window)
+            seen = 0
+            for i, candidate in enumerate(window):
+                if i and candidate.paragraph_start and seen >= chunk_size / 2:
+                    cut = i
+                seen += candidate.tokens
+            yield window[:cut]
+
+            carried = []
+            if carry:
+                carried_tokens = 0
+                for candidate in reversed(window[:cut]):
+                    if carried_tokens + candidate.tokens > overlap:
+                        break
+                    carried.insert(0, candidate)
+                    carried_tokens += candidate.tokens
+            window = window[cut:]
+            tokens = sum(s.tokens for s in window)
+            # Keep as much overlap as still leaves room for the new sentence
+            while carried and tokens + carried_tokens + sentence.tokens > chunk_size:
+                carried_tokens -= carried.pop(0).tokens
+            window = carried + window
+            tokens += sum(s.tokens for s in carried)
+            carry = False
+        window.append(sentence)
+        tokens += sentence.tokens
+    if window:
+        yield window
+
+def _stitch(previous: List[Sentence], current: List[Sentence], count: Callable[[str], int]) -> None:
+    """Move the start of a continued sentence onto the end of the previous page's sentence."""
+    if not previous:
+        return
+    for i, sentence in enumerate(current):
+        if NOISE_PATTERN.fullmatch(sentence.text):
+            continue
+        last = previous[-1]
+        text = f"{last.text} {sentence.text}"
+        previous[-1] = Sentence(text, last.page, last.start, sentence.page, sentence.end,
+                                last.paragraph_start, count(text), last.segments + sentence.segments)
+        del current[:i + 1]
+        return
+
+def iter_chunks(pages: Iterable[Tuple[int, str]], book: str, source: str,
+                chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                stitch: bool = True, count: Callable[[str], int] = count_tokens) -> Iterator[Dict]:
+    """Stream overlapping, token-sized chunks from (page_number, content) pairs.
+
+    Pages are split on paragraph and sentence boundaries and never share a
+    chunk, except that a sentence a page ends with "[continua]" is completed
+    with the start of the next page (the markers themselves are dropped).
+    Each chunk records its page, end_page and the char offsets of its first
+    and last sentence within those pages. Only one page of lookahead is held.
+    """
+    pending: Optional[Tuple[List[Sentence], bool]] = None
+    contents: Dict[int, str] = {}  # The pending and current pages, to locate the words of long sentences
+
+    def emit(sentences: List[Sentence]) -> Iterator[Dict]:
+        sized = []
+        for sentence in sentences:
+            sized.extend(_split_long(sentence, chunk_size, count, contents) if sentence.tokens > chunk_size else [sentence])
+        for window in pack_sentences(sized, chunk_size, overlap):
+            yield {
+                "content": _join(window),
+                "metadata": {
+                    "page": window[0].page,
+                    "end_page": window[-1].end_page,
+                    "start_char": window[0].start,
+                    "end_char": window[-1].end,
+                    "book": book,
+                    "source": source
+                }
+            }
+
+    for page_num, content in pages:
+        if not content or content in SKIPPED_PAGES:
+            continue
+        sentences = [s for s in split_sentences(int(page_num), content, count) if s.text not in SKIPPED_PAGES]
+        if not sentences:
+            continue
+        continues = bool(CONTINUES_PATTERN.search(content))
+        contents[int(page_num)] = content
+        if pending is not None:
+            previous, previous_continues = pending
+            if stitch and previous_continues:
+                _stitch(previous, sentences, count)
+            yield from emit(previous)
+            contents = {int(page_num): content}
+        pending = (sentences, continues)
+    if pending is not None:
+        yield from emit(pending[0])
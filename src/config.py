@@ -26,13 +26,15 @@ def load_config():
         "QDRANT_API_KEY": os.getenv("QDRANT_API_KEY"),
         "CHAT_MODEL": os.getenv("CHAT_MODEL", "gpt-4"),  # Default to GPT-4
         "EMBEDDING_MODEL": os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),  # Default to latest embedding model
-        "CHUNK_SIZE": int(os.getenv("CHUNK_SIZE", "2000")),  # Default chunk size
-        "CHUNK_OVERLAP": int(os.getenv("CHUNK_OVERLAP", "400")),  # Default chunk overlap
+        "CHUNK_SIZE": CHUNK_SIZE,  # Tokens per chunk
+        "CHUNK_OVERLAP": CHUNK_OVERLAP,  # Tokens repeated between consecutive chunks
     }
 
 # OpenAI settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")  # "openai" or "local" (offline hashed n-grams)
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", 512))
 CHAT_MODEL = "gpt-4-turbo-preview"
 
 # Qdrant settings
@@ -40,9 +42,65 @@ QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
 COLLECTION_NAME = "books"
 
-# Chunking settings
-CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
+# Book store search settings
+# "numpy" searches every book's exported vectors exactly in one stacked matrix instead of Chroma
+STORE_BACKEND = os.getenv("STORE_BACKEND", "chroma")
+# "float32", "float16" or "int8" searches the store's NumPy vectors in that precision instead of Chroma
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "")
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", 4))  # Compact-vector candidates re-scored per result (0 = off)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", 8))  # Books searched at once by BookQA.search
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))  # Results taken from each retriever before fusion
+RRF_K = int(os.getenv("RRF_K", 60))  # Reciprocal-rank fusion constant: higher flattens the rank weights
+
+# Query daemon settings (query_daemon.py; query_book.py falls back to in-process queries without it)
+QUERY_DAEMON_HOST = os.getenv("QUERY_DAEMON_HOST", "127.0.0.1")
+QUERY_DAEMON_PORT = int(os.getenv("QUERY_DAEMON_PORT", 8765))
+
+# Answer cache settings
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 256))  # Answers kept, least recently used evicted first (0 = off)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))  # Seconds an answer stays valid (0 = forever)
+# Cosine similarity above which a differently worded question reuses a cached answer (1 = exact matches only)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+
+# Indexing settings
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", 100000))  # API limit is 300k tokens per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 512))  # API limit is 2048 inputs per request
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 256))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", 4))
+EMBED_RPM = int(os.getenv("EMBED_RPM", 3000))  # Embedding requests per minute, shared by all books (0 = unlimited)
+EMBED_TPM = int(os.getenv("EMBED_TPM", 1000000))  # Embedding tokens per minute (0 = unlimited)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))  # Books processed at once by process_books.py
+
+# Chunking settings (in tokens)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 400))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 80))
+
+# OCR settings
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+OCR_LANG = os.getenv("OCR_LANG", "por")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_WINDOW = int(os.getenv("OCR_WINDOW", 0))  # Pages rasterized at once (0 = 2 per worker)
+# "legacy" for the PIL enhance pipeline, or comma-separated NumPy steps from grayscale, otsu,
+# adaptive, deskew, crop (e.g. "grayscale,otsu,deskew,crop"); compare them with bench_preprocess.py
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "legacy")
+TEXT_LAYER_MIN_CHARS = 100  # Pages with less embedded text than this are OCRed
+TEXT_LAYER_MIN_QUALITY = 0.8  # Minimum share of plausible words in an embedded text layer
+
+# LLM page cleaning settings
+CLEAN_MODEL = os.getenv("CLEAN_MODEL", "gpt-4o-mini")
+CLEAN_MAX_WORKERS = int(os.getenv("CLEAN_MAX_WORKERS", 8))  # Requests in flight at once
+CLEAN_RPM = int(os.getenv("CLEAN_RPM", 500))  # Requests per minute (0 = unlimited)
+CLEAN_TPM = int(os.getenv("CLEAN_TPM", 200000))  # Tokens per minute (0 = unlimited)
+CLEAN_MAX_RETRIES = int(os.getenv("CLEAN_MAX_RETRIES", 5))
+CLEAN_ROUTING = os.getenv("CLEAN_ROUTING", "1") != "0"  # Only send garbled pages to the model
+
+# Cache settings
+CACHE_DIR = os.getenv("BOOKSAI_CACHE_DIR", ".cache")
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 512))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", 90))
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 1024))
+EMBEDDING_LRU_SIZE = int(os.getenv("EMBEDDING_LRU_SIZE", 1024))  # Query embeddings kept in memory
+EMBEDDING_EVICT_EVERY = int(os.getenv("EMBEDDING_EVICT_EVERY", 1000))  # New vectors cached between size checks
 
 # File settings
 PDF_DIR = "."  # Current directory where PDFs are stored 
\ No newline at end of file
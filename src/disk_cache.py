@@ -0,0 +1,91 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+def make_key(*parts) -> str:
+    """Hash JSON-serializable parts into a stable cache key."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """Persistent SQLite key/value cache with size- and age-based eviction.
+
+    Entries older than `max_age` seconds are dropped, and when the cache
+    grows past `max_bytes` the least recently used entries go first
+    (0 disables either limit). Safe to share between threads.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, max_age: float = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value, replacing any previous entry for the key."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+
+    def evict(self) -> int:
+        """Apply the age and size limits, returning how many entries were removed."""
+        removed = 0
+        with self._lock:
+            if self.max_age:
+                removed += self._conn.execute(
+                    "DELETE FROM entries WHERE created < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_bytes:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    # Walk entries from least recently used until enough space is freed
+                    to_free = total - self.max_bytes
+                    keys = []
+                    for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                        keys.append((key,))
+                        to_free -= size
+                        if to_free <= 0:
+                            break
+                    self._conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+                    removed += len(keys)
+        return removed
+
+    def stats(self) -> str:
+        """Summarize hits and misses since the cache was opened."""
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return f"{self.hits} acertos, {self.misses} falhas ({ratio:.0%} de acertos)"
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from openai import OpenAI
+
+from src.config import (
+    CACHE_DIR,
+    EMBEDDING_MODEL,
+    EMBED_BATCH_TOKENS,
+    EMBED_BATCH_SIZE,
+    EMBED_RPM,
+    EMBED_TPM,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDING_EVICT_EVERY,
+    EMBEDDING_LRU_SIZE,
+    EMBEDDING_PROVIDER,
+    LOCAL_EMBEDDING_DIM
+)
+from src.disk_cache import DiskCache, make_key
+from src.rate_limiter import RateLimiter
+
+# Native vector size of the OpenAI embedding models
+OPENAI_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+LOCAL_MODEL = "hashed-ngram-v1"
+LOCAL_WORD_PATTERN = re.compile(r"\w+")
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate (UTF-8 bytes / 3) used to pack embedding requests."""
+    return len(text.encode('utf-8')) // 3 + 1
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache keys: Unicode NFC and collapsed whitespace."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+class CachedEmbeddings(Embeddings):
+    """OpenAI embeddings behind a persistent cache, shared by indexing and querying.
+
+    Vectors are stored as float32 in a DiskCache keyed by (model,
+    dimensions, normalized text), so rebuilding a store or repeating a
+    question never re-embeds known text. Query strings are also kept in an
+    in-memory LRU. The OpenAI client is only created on the first miss.
+    The disk cache is trimmed once every `evict_every` new vectors rather
+    than on each miss.
+    API calls are paced by `limiter`, which threads indexing several books
+    share. Instances are also callable on a list of texts, as VectorStore expects.
+    """
+
+    provider = "openai"
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: Optional[int] = None,
+                 client: Optional[OpenAI] = None, cache: Optional[DiskCache] = None,
+                 lru_size: int = EMBEDDING_LRU_SIZE, limiter: Optional[RateLimiter] = None,
+                 evict_every: int = EMBEDDING_EVICT_EVERY):
+        self.model = model
+        self.dimensions = dimensions
+        self._client = client
+        self.cache = cache or DiskCache(
+            Path(CACHE_DIR) / "embeddings.sqlite",
+            max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.limiter = limiter
+        self.api_calls = 0
+        self.evict_every = evict_every
+        self._inserts = 0
+
+    @property
+    def client(self) -> OpenAI:
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        return self._client
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return make_key("embedding", self.model, self.dimensions, digest)
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with as few API calls as the batch limits allow."""
+        vectors = []
+        start = 0
+        while start < len(texts):
+            end, tokens = start, 0
+            while end < len(texts) and end - start < EMBED_BATCH_SIZE:
+                text_tokens = estimate_tokens(texts[end])
+                if end > start and tokens + text_tokens > EMBED_BATCH_TOKENS:
+                    break
+                tokens += text_tokens
+                end += 1
+            if self.limiter is not None:
+                self.limiter.acquire(tokens)
+            kwargs = {"dimensions": self.dimensions} if self.dimensions else {}
+            response = self.client.embeddings.create(model=self.model, input=texts[start:end], **kwargs)
+            with self._lock:
+                self.api_calls += 1
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+            start = end
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, calling the API only for those not cached yet."""
+        keys = [self._key(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = np.frombuffer(cached, dtype=np.float32).tolist()
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            # Identical texts in one call are embedded once
+            positions = list(missing.values())
+            vectors = self._request([texts[indices[0]] for indices in positions])
+            for indices, vector in zip(positions, vectors):
+                self.cache.set(keys[indices[0]], np.asarray(vector, dtype=np.float32).tobytes())
+                for i in indices:
+                    results[i] = vector
+            with self._lock:
+                self._inserts += len(positions)
+                evict = self._inserts >= self.evict_every
+                if evict:
+                    self._inserts = 0
+            if evict:
+                self.cache.evict()
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query string, serving repeated questions from the in-memory LRU."""
+        key = self._key(text)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+        vector = self.embed_documents([text])[0]
+        with self._lock:
+            self._lru[key] = vector
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return vector
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    def identity(self) -> Dict:
+        """Provider, model and vector size, as recorded in a store's manifest."""
+        return {"provider": self.provider, "model": self.model,
+                "dimensions": self.dimensions or OPENAI_DIMENSIONS.get(self.model)}
+
+class HashedNgramEmbeddings(Embeddings):
+    """Local CPU embeddings from hashed words and character n-grams.
+
+    Accent- and case-folded words and their 3- and 4-character n-grams are
+    hashed into `dimensions` signed buckets, damped with log1p and L2
+    normalized. Deterministic, needs no network and embeds a query in well
+    under a millisecond; quality is lexical, not semantic.
+    """
+
+    provider = "local"
+    model = LOCAL_MODEL
+
+    def __init__(self, dimensions: int = LOCAL_EMBEDDING_DIM, ngram_sizes: tuple = (3, 4)):
+        self.dimensions = dimensions
+        self.ngram_sizes = ngram_sizes
+
+    def _features(self, text: str) -> List[str]:
+        folded = unicodedata.normalize('NFKD', text.lower())
+        folded = ''.join(char for char in folded if not unicodedata.combining(char))
+        features = []
+        for word in LOCAL_WORD_PATTERN.findall(folded):
+            features.append(word)
+            padded = f"<{word}>"
+            for n in self.ngram_sizes:
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in self._features(text)),
+                             dtype=np.uint32)
+        # The low bits pick the bucket and the top bit the sign, so collisions tend to cancel out
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        vector = np.bincount(hashes % self.dimensions, weights=signs, minlength=self.dimensions)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    def identity(self) -> Dict:
+        return {"provider": self.provider, "model": self.model, "dimensions": self.dimensions}
+
+_shared: Dict[tuple, Embeddings] = {}
+_shared_lock = threading.Lock()
+
+def get_embeddings(provider: str = EMBEDDING_PROVIDER, model: Optional[str] = None,
+                   dimensions: Optional[int] = None) -> Embeddings:
+    """Return the process-wide embeddings for a provider ("openai" or "local") and model."""
+    if provider == "openai":
+        model = model or EMBEDDING_MODEL
+        if dimensions == OPENAI_DIMENSIONS.get(model):
+            dimensions = None  # Same vectors (and cache keys) as not asking for a size
+    elif provider == "local":
+        if (model or LOCAL_MODEL) != LOCAL_MODEL:
+            raise ValueError(f"Modelo local desconhecido: {model}")
+        model, dimensions = LOCAL_MODEL, dimensions or LOCAL_EMBEDDING_DIM
+    else:
+        raise ValueError(f"Provedor de embeddings desconhecido: {provider}")
+
+    with _shared_lock:
+        key = (provider, model, dimensions)
+        if key not in _shared:
+            if provider == "local":
+                _shared[key] = HashedNgramEmbeddings(dimensions)
+            else:
+                _shared[key] = CachedEmbeddings(model, dimensions, limiter=RateLimiter(EMBED_RPM, EMBED_TPM))
+        return _shared[key]
+
+def embeddings_for(identity: Dict) -> Embeddings:
+    """Return the embeddings matching an identity recorded in a store's manifest."""
+    return get_embeddings(identity["provider"], identity["model"], identity["dimensions"])
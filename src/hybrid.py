@@ -0,0 +1,47 @@
+from typing import Dict, List, Tuple
+
+from src.config import RRF_K
+
+LEXICAL = "bm25"
+VECTOR = "vetorial"
+
+def result_key(result: dict) -> Tuple:
+    """Identify a result's chunk: (book, page, start offset), or its text for stores without offsets."""
+    metadata = result["metadata"]
+    position = metadata["start_char"] if "start_char" in metadata else result["content"]
+    return (result["book"], metadata.get("page"), position)
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[dict]], k: int, rrf_k: int = RRF_K) -> List[dict]:
+    """Fuse several best-first result lists with reciprocal-rank fusion.
+
+    A chunk scores sum(1 / (rrf_k + rank)) over the retrievers that found it,
+    divided by the best possible sum, so `score` is in (0, 1] and higher is
+    better (1.0: ranked first by every retriever). `retrievers` records each
+    retriever's rank and original score, and `match_tipo` is "exato" (only
+    BM25), "vetorial" (only vectors) or "híbrido" (both).
+    """
+    fused: Dict[Tuple, dict] = {}
+    for retriever, results in rankings.items():
+        seen = set()
+        for result in results:
+            key = result_key(result)
+            if key in seen:
+                continue
+            seen.add(key)
+            rank = len(seen)
+            entry = fused.setdefault(key, {
+                "content": result["content"],
+                "metadata": result["metadata"],
+                "book": result["book"],
+                "score": 0.0,
+                "retrievers": {}
+            })
+            entry["score"] += 1 / (rrf_k + rank)
+            entry["retrievers"][retriever] = {"rank": rank, "score": result["score"]}
+
+    best = len(rankings) / (rrf_k + 1)
+    for entry in fused.values():
+        entry["score"] /= best
+        found = set(entry["retrievers"])
+        entry["match_tipo"] = "híbrido" if len(found) > 1 else ("exato" if found == {LEXICAL} else VECTOR)
+    return sorted(fused.values(), key=lambda x: -x["score"])[:k]
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.chunk_store import LEGACY_FILE, META_FILE, has_chunk_store
+from src.embeddings import OPENAI_DIMENSIONS, get_embeddings
+from src.vector_index import has_vectors, save_vectors
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# Lists the books under a stores directory, so opening BookQA does not scan every store
+CATALOG_FILE = "catalog.json"
+CATALOG_VERSION = 1
+_catalog_lock = threading.Lock()  # process_books.py indexes several books at once
+# Stores built before the manifest existed were all embedded with OpenAI's default model
+LEGACY_IDENTITY = {"provider": "openai", "model": "text-embedding-3-small",
+                   "dimensions": OPENAI_DIMENSIONS["text-embedding-3-small"]}
+
+@dataclass
+class IndexStats:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    embedded_chunks: int = 0
+    rebuilt: bool = False
+
+    def __str__(self) -> str:
+        summary = (f"{self.added} novas, {self.changed} alteradas, "
+                   f"{self.removed} removidas, {self.unchanged} inalteradas")
+        return summary + (" (índice reconstruído)" if self.rebuilt else "")
+
+def chunk_id(book: str, page: int, index: int) -> str:
+    """Stable Chroma ID for the index-th chunk of a book page."""
+    return f"{book}:{page}:{index}"
+
+def page_hash(chunks: List[Dict[str, Any]]) -> str:
+    """Hash a page's chunks, content and metadata alike, to detect any change."""
+    payload = json.dumps([[chunk["content"], chunk["metadata"]] for chunk in chunks],
+                         ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def group_by_page(chunks: List[Dict[str, Any]]) -> "OrderedDict[str, List[Dict[str, Any]]]":
+    """Group chunks by page number, keeping their order."""
+    pages: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for chunk in chunks:
+        pages.setdefault(str(chunk["metadata"]["page"]), []).append(chunk)
+    return pages
+
+def load_manifest(store_dir: str) -> Optional[Dict[str, Any]]:
+    """Load a store's manifest, or None if it is missing or unreadable."""
+    try:
+        with open(Path(store_dir) / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if "embedding" not in manifest:
+        # Early version-1 manifests only named the model, always at its default dimensions
+        model = manifest.pop("embedding_model", None)
+        manifest["embedding"] = (
+            {"provider": "openai", "model": model, "dimensions": OPENAI_DIMENSIONS[model]}
+            if model in OPENAI_DIMENSIONS else {"provider": "desconhecido", "model": model, "dimensions": None}
+        )
+    return manifest
+
+def save_manifest(store_dir: str, manifest: Dict[str, Any]) -> None:
+    path = Path(store_dir) / MANIFEST_FILE
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def store_identity(store_dir: str) -> Dict[str, Any]:
+    """Embedding provider, model and dimensions a store was built with."""
+    manifest = load_manifest(store_dir)
+    return manifest["embedding"] if manifest else dict(LEGACY_IDENTITY)
+
+def index_version(store_dir: str) -> int:
+    """A number that changes whenever a store's chunks or index are rewritten (0 if it has none)."""
+    versions = [(Path(store_dir) / name).stat().st_mtime_ns
+                for name in (MANIFEST_FILE, META_FILE, LEGACY_FILE) if (Path(store_dir) / name).exists()]
+    return max(versions, default=0)
+
+def catalog_entry(store_dir: str) -> Dict[str, Any]:
+    """What BookQA needs to know about a store before opening it."""
+    return {"embedding": store_identity(store_dir), "vectors": has_vectors(store_dir)}
+
+def _is_store(path: Path) -> bool:
+    return path.is_dir() and (has_chunk_store(str(path)) or (path / MANIFEST_FILE).exists())
+
+def load_catalog(stores_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Books under stores_dir with their catalog entries.
+
+    Entries come from catalog.json; store directories it does not list
+    (copied in, built before the catalog or without update_book_store) are
+    added with entries read from their manifests, and listed stores whose
+    directory is gone are left out. No store is opened.
+    """
+    try:
+        with open(Path(stores_dir) / CATALOG_FILE, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        catalog = {}
+    listed = catalog.get("books", {}) if catalog.get("version") == CATALOG_VERSION else {}
+    books = {}
+    for path in sorted(Path(stores_dir).iterdir()):
+        if path.name in listed and path.is_dir():
+            books[path.name] = listed[path.name]
+        elif _is_store(path):
+            books[path.name] = catalog_entry(str(path))
+    return books
+
+def update_catalog(stores_dir: str, book: str) -> None:
+    """Record a book's current store in catalog.json, along with any unlisted stores found by load_catalog."""
+    path = Path(stores_dir) / CATALOG_FILE
+    with _catalog_lock:
+        books = load_catalog(stores_dir)
+        books[book] = catalog_entry(str(Path(stores_dir) / book))
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CATALOG_VERSION, "books": dict(sorted(books.items()))}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+def update_book_store(chunks: List[Dict[str, Any]], store_dir: str, book: str,
+                      embeddings: Optional[Embeddings] = None) -> IndexStats:
+    """Bring a book's Chroma store in line with its chunks, touching only what changed.
+
+    The store's manifest.json records a content hash and the Chroma IDs of
+    every page. Pages whose hash is unchanged are left alone; new and
+    changed pages are embedded and upserted (stale IDs of a changed page
+    are deleted first) and pages that disappeared are deleted. Stores
+    without a manifest (built before it existed, with random IDs) or built
+    with other embeddings (provider, model or dimensions) are rebuilt from
+    scratch; the manifest records which embeddings the store uses.
+    The store's vectors are then exported in chunk order (see save_vectors)
+    for the NumPy search path, and the book is recorded in the catalog.json
+    of the directory holding its store.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    embeddings = embeddings or get_embeddings()
+    identity = embeddings.identity()
+    store = Chroma(persist_directory=str(store_dir), embedding_function=embeddings)
+    stats = IndexStats()
+
+    manifest = load_manifest(store_dir)
+    if manifest is None or manifest.get("embedding") != identity:
+        store.delete_collection()
+        store = Chroma(persist_directory=str(store_dir), embedding_function=embeddings)
+        manifest = {"version": MANIFEST_VERSION, "embedding": identity, "pages": {}}
+        stats.rebuilt = True
+
+    old_pages = manifest["pages"]
+    new_pages = {}
+    texts, metadatas, ids, stale_ids = [], [], [], []
+    for page, page_chunks in group_by_page(chunks).items():
+        digest = page_hash(page_chunks)
+        page_ids = [chunk_id(book, page, i) for i in range(len(page_chunks))]
+        new_pages[page] = {"hash": digest, "ids": page_ids}
+
+        previous = old_pages.get(page)
+        if previous is not None and previous["hash"] == digest:
+            stats.unchanged += 1
+            continue
+        if previous is None:
+            stats.added += 1
+        else:
+            stats.changed += 1
+            stale_ids.extend(set(previous["ids"]) - set(page_ids))
+        texts.extend(chunk["content"] for chunk in page_chunks)
+        metadatas.extend(chunk["metadata"] for chunk in page_chunks)
+        ids.extend(page_ids)
+
+    for page, previous in old_pages.items():
+        if page not in new_pages:
+            stats.removed += 1
+            stale_ids.extend(previous["ids"])
+
+    if stale_ids:
+        store.delete(ids=stale_ids)
+    stats.embedded_chunks = len(texts)
+    if texts:
+        store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+
+    manifest["pages"] = new_pages
+    save_manifest(store_dir, manifest)
+    export_vectors(store, chunks, book, store_dir)
+    update_catalog(str(Path(store_dir).parent), Path(store_dir).name)
+    return stats
+
+def export_vectors(store: "Chroma", chunks: List[Dict[str, Any]], book: str, store_dir: str) -> None:
+    """Save the store's vectors with row i holding chunk i's embedding, read back from Chroma."""
+    chunk_ids, per_page = [], {}
+    for chunk in chunks:
+        page = str(chunk["metadata"]["page"])
+        chunk_ids.append(chunk_id(book, page, per_page.get(page, 0)))
+        per_page[page] = per_page.get(page, 0) + 1
+    if not chunk_ids:
+        return
+    stored = store.get(ids=chunk_ids, include=["embeddings"])
+    by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    save_vectors(store_dir, np.array([by_id[i] for i in chunk_ids], dtype=np.float32))
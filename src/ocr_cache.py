@@ -0,0 +1,81 @@
+import hashlib
+import inspect
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from src.config import CACHE_DIR
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Hash a file's content without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def _atomic_write(path: Path, text: str) -> None:
+    """Write text so readers never see a half-written cache entry."""
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+class OCRCache:
+    """Content-addressed, per-page cache of OCR output for one PDF.
+
+    Raw tesseract output is keyed by (PDF content hash, page, OCR settings),
+    where the settings cover DPI, preprocessing, language and tesseract
+    version. Cleaned text is keyed by the raw text plus the source of the
+    cleaning function and of the `helpers` it calls, so editing the cleanup
+    rules never forces a re-OCR but always invalidates the cleaned pages.
+    """
+
+    def __init__(self, pdf_path: str, ocr_settings: str, cleaner: Callable[[str], str],
+                 cache_dir: str = CACHE_DIR, helpers: Iterable[Callable] = ()):
+        self.pdf_hash = file_sha256(pdf_path)
+        self.settings_key = _short_hash(ocr_settings)
+        self.cleaner = cleaner
+        self.cleaner_key = _short_hash(''.join(inspect.getsource(f) for f in (cleaner, *helpers)))
+
+        self.root = Path(cache_dir) / "ocr" / self.pdf_hash
+        self.raw_dir = self.root / "raw" / self.settings_key
+        self.clean_dir = self.root / "clean" / self.cleaner_key
+        self.raw_dir.mkdir(parents=True, exist_ok=True)
+        self.clean_dir.mkdir(parents=True, exist_ok=True)
+
+        self.raw_hits = 0
+        self.clean_hits = 0
+
+    def _raw_path(self, page_num: int) -> Path:
+        return self.raw_dir / f"{page_num:05d}.txt"
+
+    def has_raw(self, page_num: int) -> bool:
+        """Check whether a page's OCR output is already cached."""
+        return self._raw_path(page_num).exists()
+
+    def get_raw(self, page_num: int) -> Optional[str]:
+        """Return the cached tesseract output for a page, if any."""
+        path = self._raw_path(page_num)
+        if not path.exists():
+            return None
+        self.raw_hits += 1
+        return path.read_text(encoding='utf-8')
+
+    def put_raw(self, page_num: int, text: str) -> None:
+        """Store a page's tesseract output."""
+        _atomic_write(self._raw_path(page_num), text)
+
+    def clean(self, raw_text: str) -> str:
+        """Return the cleaned version of a page's raw text, using the cache when possible."""
+        path = self.clean_dir / f"{_short_hash(raw_text)}.txt"
+        if path.exists():
+            self.clean_hits += 1
+            return path.read_text(encoding='utf-8')
+
+        cleaned = self.cleaner(raw_text)
+        _atomic_write(path, cleaned)
+        return cleaned
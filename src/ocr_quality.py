@@ -0,0 +1,142 @@
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+
+# Frequent Portuguese words; in running text they make up a large share of all tokens
+COMMON_WORDS = frozenset("""
+a à ao aos as às até com como contra da das de debaixo deste desta dessa desse do dos e é em entre
+essa esse esta este foi for há isso isto já lhe lhes mais mas me mesmo muito na nas nem no nos não
+o os ou para pela pelas pelo pelos per por quais qual quando que quem se sem ser seu seus sua suas
+sobre são também tem têm todo toda todos todas um uma umas uns vez assim ainda apenas cada onde
+porque pois ser sendo sido seja sejam será serão seria estado estados direito direitos lei leis
+pessoa pessoas humana humano dignidade constituição constitucional constitucionais princípio
+princípios fundamental fundamentais poder poderes público pública liberdade igualdade democrático
+democrática república portuguesa artigo artigos n.º cf. sentido forma modo caso termos relação
+parte âmbito natureza valor valores ordem jurídica jurídico proteção protecção social justiça
+tribunal norma normas regime limites sua seu outro outra outros outras qualquer quaisquer
+""".split())
+
+# Running headers repeated at the top of the pages of the books we process
+RUNNING_HEADERS = (
+    "Os princípios constitucionais estruturantes da República Portuguesa",
+)
+
+TOKEN_PATTERN = re.compile(r"\S+")
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:[-'][^\W\d_]+)*")
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,/ºª°-]\d*)*[ºª°]?")
+# Abbreviations such as "n.º", "n.ºs", "art.º" or "Sr.ª"
+ABBREVIATION_PATTERN = re.compile(r"[^\W\d_]+\.[ºª]s?")
+ROMAN_NUMERAL_PATTERN = re.compile(r"[IVXLCDM]+")
+VOWELS = set("aeiouáàâãéêíóôõúü")
+PUNCTUATION = '.,;:!?()[]{}«»"“”‘’\'…*-–—'
+
+# A line is garbage when fewer than this share of its tokens look like words
+MIN_LINE_PLAUSIBILITY = 0.6
+# Lines at least this long are expected to contain some common word
+MIN_TOKENS_FOR_DICTIONARY_CHECK = 5
+# Mean per-line character entropy (bits) above which a page looks like symbol soup
+MAX_PAGE_LINE_ENTROPY = 4.9
+
+ROUTE_CLEAN = "clean"
+ROUTE_LIGHT = "light"
+ROUTE_LLM = "llm"
+
+@dataclass
+class PageScore:
+    route: str
+    dictionary_hit_rate: float
+    non_alpha_ratio: float
+    line_entropy: float
+    garbage_lines: int
+    total_lines: int
+
+def _is_plausible_word(token: str) -> bool:
+    """Check whether a token looks like a Portuguese word or a number."""
+    # Optional plural markers such as "dignidade(s)" are written inside the word
+    token = token.strip(PUNCTUATION).replace("(", "").replace(")", "")
+    if not token or NUMBER_PATTERN.fullmatch(token) or ABBREVIATION_PATTERN.fullmatch(token):
+        return True
+    if not WORD_PATTERN.fullmatch(token):
+        return False
+    lower = token.lower()
+    if lower in COMMON_WORDS or ROMAN_NUMERAL_PATTERN.fullmatch(token):
+        return True
+    # Stray one- and two-letter fragments ("BB", "ão", "tr") are typical OCR noise
+    if len(token) <= 2:
+        return False
+    # So are mixed case inside a word ("lUms"), vowel-less runs and impossible starts ("rrenan")
+    if not (token.islower() or token.isupper() or token.istitle()):
+        return False
+    if not VOWELS.intersection(lower) or lower.startswith(("rr", "ss")):
+        return False
+    return not re.search(r"(.)\1\1", lower)
+
+def _entropy(text: str) -> float:
+    """Shannon entropy of a string's characters, in bits per character."""
+    counts = Counter(text)
+    total = len(text)
+    return -sum(n / total * math.log2(n / total) for n in counts.values())
+
+def _is_running_header(line: str) -> bool:
+    return any(line.strip().lower() == header.lower() for header in RUNNING_HEADERS)
+
+def is_garbage_line(line: str) -> bool:
+    """Check whether a line of OCR output is noise rather than text."""
+    tokens = TOKEN_PATTERN.findall(line)
+    if not tokens:
+        return False
+    plausible = sum(1 for token in tokens if _is_plausible_word(token))
+    if plausible / len(tokens) < MIN_LINE_PLAUSIBILITY:
+        return True
+    # Real sentences almost always contain a function word ("de", "a", "que", ...)
+    words = [token.strip(PUNCTUATION) for token in tokens if WORD_PATTERN.fullmatch(token.strip(PUNCTUATION))]
+    if len(words) >= MIN_TOKENS_FOR_DICTIONARY_CHECK and line == line.lower():
+        return not any(word in COMMON_WORDS for word in words)
+    return False
+
+def score_page(text: str) -> PageScore:
+    """Score a page of OCR output and decide how it should be cleaned.
+
+    Pages are routed to "clean" (no noise), "light" (a few noisy lines that
+    local rules can drop) or "llm" (too damaged for local rules).
+    """
+    lines = [line for line in text.split('\n') if line.strip() and not _is_running_header(line)]
+    tokens = TOKEN_PATTERN.findall('\n'.join(lines))
+    if not tokens:
+        return PageScore(ROUTE_CLEAN, 1.0, 0.0, 0.0, 0, 0)
+
+    words = [token.strip(PUNCTUATION).lower() for token in tokens]
+    dictionary_hits = sum(1 for word in words if word in COMMON_WORDS)
+    non_alpha = sum(
+        1 for token in tokens
+        if not any(char.isalpha() for char in token) and not NUMBER_PATTERN.fullmatch(token.strip(PUNCTUATION))
+    )
+    garbage_lines = sum(1 for line in lines if is_garbage_line(line))
+    line_entropy = sum(_entropy(line.strip()) for line in lines) / len(lines)
+
+    dictionary_hit_rate = dictionary_hits / len(tokens)
+    non_alpha_ratio = non_alpha / len(tokens)
+
+    if line_entropy > MAX_PAGE_LINE_ENTROPY:
+        route = ROUTE_LLM
+    elif garbage_lines == 0 and dictionary_hit_rate >= 0.2 and non_alpha_ratio <= 0.05:
+        route = ROUTE_CLEAN
+    elif garbage_lines <= max(2, len(lines) // 10) and dictionary_hit_rate >= 0.15 and non_alpha_ratio <= 0.15:
+        route = ROUTE_LIGHT
+    else:
+        route = ROUTE_LLM
+    return PageScore(route, dictionary_hit_rate, non_alpha_ratio, line_entropy, garbage_lines, len(lines))
+
+def light_fix(text: str) -> str:
+    """Apply the deterministic cleanup rules: drop running headers and noisy lines."""
+    kept: List[str] = []
+    for line in text.split('\n'):
+        if _is_running_header(line) or is_garbage_line(line):
+            continue
+        # Collapse runs of blank lines left behind by removed lines
+        if not line.strip() and (not kept or not kept[-1].strip()):
+            continue
+        kept.append(line)
+    return '\n'.join(kept).strip()
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PAGE_RULE = b'=' * 40
+PAGE_HEADER = re.compile(r"\[PÁGINA (\d+)\]\n".encode('utf-8'))
+
+# (page number, marker offset, content start offset, content end offset), in bytes
+IndexEntry = Tuple[int, int, int, int]
+
+def _scan(path: str) -> Iterator[Tuple[IndexEntry, bytes]]:
+    """Parse a page-marked text file line by line, yielding each page's offsets and raw content.
+
+    A page starts with a "====\\n[PÁGINA n]\\n====\\n" marker (40 "=" per rule)
+    and its content runs until the next line starting with 40 "=" or the end
+    of the file, as in the regex the pipeline used before. Only the current
+    page is held in memory.
+    """
+    with open(path, 'rb') as f:
+        page: Optional[Tuple[int, int, int]] = None  # (page number, marker offset, content start)
+        content: List[bytes] = []
+        state = 0  # 0: text, 1: after an opening rule, 2: after the page header
+        marker_offset = page_num = 0
+        offset = 0
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+
+            if state == 2:
+                state = 0
+                if line == PAGE_RULE + b'\n':
+                    page = (page_num, marker_offset, offset)
+                    content = []
+                    continue
+            elif state == 1:
+                state = 0
+                match = PAGE_HEADER.fullmatch(line)
+                if match:
+                    page_num = int(match.group(1))
+                    state = 2
+                    continue
+
+            if line.startswith(PAGE_RULE):
+                # A rule line ends the current page; the newline before it is not content
+                if page is not None:
+                    data = b''.join(content)[:-1]
+                    yield (page[0], page[1], page[2], page[2] + len(data)), data
+                    page = None
+                if line == PAGE_RULE + b'\n':
+                    marker_offset = line_offset
+                    state = 1
+            elif page is not None:
+                content.append(line)
+
+        if page is not None:
+            data = b''.join(content)
+            yield (page[0], page[1], page[2], page[2] + len(data)), data
+
+class PageFile:
+    """Page-marked text file with a sidecar byte-offset index for random access.
+
+    The first full read builds "<file>.pageidx", which maps every page to
+    its byte range; later lookups of a page or a page range seek straight to
+    it. The index is rebuilt whenever the file's size or mtime changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.index_path = Path(self.path + '.pageidx')
+        self._entries: Optional[List[IndexEntry]] = None
+        self._by_page: Dict[int, IndexEntry] = {}
+
+    def _signature(self) -> Dict[str, int]:
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _set_entries(self, entries: List[IndexEntry]) -> None:
+        self._entries = entries
+        self._by_page = {}
+        for entry in entries:
+            # Keep the first occurrence if a page number repeats
+            self._by_page.setdefault(entry[0], entry)
+
+    def _load_index(self) -> bool:
+        """Load the sidecar index if it still matches the file."""
+        if self._entries is not None:
+            return True
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get("file") != self._signature():
+            return False
+        self._set_entries([tuple(entry) for entry in index["pages"]])
+        return True
+
+    def _save_index(self, entries: List[IndexEntry], signature: Dict[str, int]) -> None:
+        self._set_entries(entries)
+        tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"file": signature, "pages": entries}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # A read-only location only costs us the sidecar, not the read
+            pass
+
+    def __iter__(self) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, stripped content) for every page, in file order."""
+        if self._load_index():
+            with open(self.path, 'rb') as f:
+                for page_num, _, start, end in self._entries:
+                    f.seek(start)
+                    yield page_num, f.read(end - start).decode('utf-8').strip()
+            return
+
+        signature = self._signature()
+        entries = []
+        for entry, data in _scan(self.path):
+            entries.append(entry)
+            yield entry[0], data.decode('utf-8').strip()
+        self._save_index(entries, signature)
+
+    def index(self) -> List[IndexEntry]:
+        """Return the page index, building it if needed."""
+        if not self._load_index():
+            signature = self._signature()
+            self._save_index([entry for entry, _ in _scan(self.path)], signature)
+        return self._entries
+
+    def page_numbers(self) -> List[int]:
+        return [entry[0] for entry in self.index()]
+
+    def marker_offset(self, page_num: int) -> int:
+        """Byte offset where a page's marker starts."""
+        self.index()
+        return self._by_page[page_num][1]
+
+    def read_page(self, page_num: int) -> str:
+        """Read one page's content by seeking to it."""
+        self.index()
+        _, _, start, end = self._by_page[page_num]
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start).decode('utf-8').strip()
+
+    def read_pages(self, first: int, last: int) -> List[Tuple[int, str]]:
+        """Read the pages numbered first..last (inclusive), in file order."""
+        entries = [entry for entry in self.index() if first <= entry[0] <= last]
+        pages = []
+        with open(self.path, 'rb') as f:
+            for page_num, _, start, end in entries:
+                f.seek(start)
+                pages.append((page_num, f.read(end - start).decode('utf-8').strip()))
+        return pages
+
+def iter_pages(path: str) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, content) for every page of a page-marked text file."""
+    return iter(PageFile(path))
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, TextIO, Tuple
+
+def _source_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class PageJournal:
+    """Append-only journal of finished pages, used to resume interrupted runs.
+
+    Each finished page is written as a JSON line holding the page number, a
+    hash of its source text and its output. A page recorded with
+    `done=False` (a fallback output) is written out like the others but
+    still counts as unfinished, so a resumed run redoes it. Only byte
+    offsets are kept in memory; page texts are read back from disk when the
+    final file is assembled. Writes are fsynced every `fsync_every` pages.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 10):
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self._entries: Dict[int, Tuple[str, int, int, bool]] = {}  # page -> (source hash, offset, length, done)
+        self._unsynced = 0
+        self._load()
+        self._writer = open(self.path, 'ab')
+        self._reader = open(self.path, 'rb')
+
+    def _load(self) -> None:
+        """Index existing entries, dropping a partially written last line."""
+        if not self.path.exists():
+            return
+        good_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self._entries[entry["page"]] = (entry["source"], good_size, len(line), entry.get("done", True))
+                good_size += len(line)
+        if good_size < self.path.stat().st_size:
+            os.truncate(self.path, good_size)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_done(self, page_num: int, source_text: str) -> bool:
+        """Check whether a page was already finished from the same source text."""
+        entry = self._entries.get(page_num)
+        return entry is not None and entry[3] and entry[0] == _source_hash(source_text)
+
+    @property
+    def unfinished(self) -> int:
+        """Pages recorded with done=False and not redone since."""
+        return sum(not entry[3] for entry in self._entries.values())
+
+    def append(self, page_num: int, source_text: str, output: str, done: bool = True) -> None:
+        """Record a page's output; with done=False it is kept for the output but redone on resume."""
+        entry = {"page": page_num, "source": _source_hash(source_text), "text": output}
+        if not done:
+            entry["done"] = False
+        line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+        offset = self._writer.seek(0, os.SEEK_END)
+        self._writer.write(line)
+        self._entries[page_num] = (_source_hash(source_text), offset, len(line), done)
+
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush pending entries to stable storage."""
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._unsynced = 0
+
+    def read(self, page_num: int) -> str:
+        """Read a finished page's output back from the journal."""
+        _, offset, length, _ = self._entries[page_num]
+        self._writer.flush()
+        self._reader.seek(offset)
+        return json.loads(self._reader.read(length))["text"]
+
+    def write_pages(self, out: TextIO, page_nums: Iterable[int], separator: str = '\n') -> None:
+        """Stream the outputs of the given pages, in that order, into a text file."""
+        for i, page_num in enumerate(page_nums):
+            if i:
+                out.write(separator)
+            out.write(self.read(page_num))
+
+    def close(self) -> None:
+        self.sync()
+        self._writer.close()
+        self._reader.close()
+
+    def remove(self) -> None:
+        """Close and delete the journal once its output has been assembled."""
+        self.close()
+        self.path.unlink()
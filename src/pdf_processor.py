@@ -1,10 +1,36 @@
 import os
-from pdf2image import convert_from_path
+import sys
+import time
+import resource
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pypdf import PdfReader
 import pytesseract
 import re
 from PIL import Image, ImageEnhance
 from pathlib import Path
 
+from src.config import (
+    OCR_DPI,
+    OCR_LANG,
+    OCR_WORKERS,
+    OCR_WINDOW,
+    OCR_PREPROCESS,
+    TEXT_LAYER_MIN_CHARS,
+    TEXT_LAYER_MIN_QUALITY
+)
+from src.image_preprocessing import preprocess
+from src.ocr_cache import OCRCache
+
+# Identifies the preprocessing in OCR cache keys; bump the version when preprocessing code changes
+if OCR_PREPROCESS == "legacy":
+    PREPROCESSING = "legacy:grayscale,contrast=2.0,sharpness=2.0"
+else:
+    PREPROCESSING = f"numpy-v1:{OCR_PREPROCESS}"
+
 def preprocess_image(image):
     """Preprocess image to improve OCR quality."""
     # Convert to grayscale if not already
@@ -21,6 +47,12 @@ def preprocess_image(image):
     
     return image
 
+def prepare_page(image):
+    """Preprocess a page image for OCR with the pipeline selected by OCR_PREPROCESS."""
+    if OCR_PREPROCESS == "legacy":
+        return preprocess_image(image)
+    return preprocess(image, OCR_PREPROCESS.split(","))
+
 def clean_text(text: str) -> str:
     """Clean OCR artifacts and normalize text."""
     # Remove non-printable characters except newlines
@@ -56,7 +88,10 @@ def clean_text(text: str) -> str:
     for pattern, replacement in replacements.items():
         text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
     
-    # Remove excessive whitespace but keep paragraph structure
+    return join_paragraphs(text)
+
+def join_paragraphs(text: str) -> str:
+    """Remove excessive whitespace but keep paragraph structure."""
     lines = text.split('\n')
     cleaned_lines = []
     current_paragraph = []
@@ -83,44 +118,222 @@ def clean_text(text: str) -> str:
     
     return '\n\n'.join(cleaned_lines)
 
-def process_pdf_ocr(pdf_path: str, output_path: str = None) -> None:
-    """Process a PDF file with OCR and save the text with page markers."""
-    print(f"Processing: {pdf_path}")
+# A word is a run of letters (optionally hyphenated) or a number such as "1976", "25/04" or "3.º"
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:[-'][^\W\d_]+)*|\d+(?:[.,/ºª°-]\d*)*[ºª°]?")
+
+def text_layer_quality(text: str) -> float:
+    """Score an embedded text layer from 0 (unusable) to 1 (clean).
+
+    The score is the share of whitespace-separated tokens that look like
+    words or numbers once surrounding punctuation is removed. Broken font
+    encodings, "(cid:NN)" glyph ids and near-empty scanned pages score low.
+    """
+    if len(text.strip()) < TEXT_LAYER_MIN_CHARS or '(cid:' in text or '\ufffd' in text:
+        return 0.0
+    
+    tokens = text.split()
+    plausible = 0
+    for token in tokens:
+        token = token.strip('.,;:!?()[]{}«»"“”‘’\'…*-–—')
+        if not token or WORD_PATTERN.fullmatch(token):
+            plausible += 1
+    return plausible / len(tokens)
+
+def classify_pages(pdf_path: str) -> List[Optional[str]]:
+    """Return each page's embedded text, or None for pages that need OCR."""
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text() or ''
+        except Exception:
+            text = ''
+        pages.append(text if text_layer_quality(text) >= TEXT_LAYER_MIN_QUALITY else None)
+    return pages
+
+def needs_ocr(pdf_path: str) -> bool:
+    """Check whether any page of a PDF lacks a usable text layer."""
+    return any(text is None for text in classify_pages(pdf_path))
+
+def clean_text_layer(text: str) -> str:
+    """Normalize embedded PDF text without the OCR-specific corrections."""
+    text = ''.join(char for char in text if char.isprintable() or char in '\n')
+    return join_paragraphs(text)
+
+def format_page(page_num: int, text: str) -> str:
+    """Format a page's text with the page marker used across the pipeline."""
+    page_marker = f"\n{'='*40}\n[PÁGINA {page_num}]\n{'='*40}\n"
+    return f"{page_marker}\n{text}"
+
+def _ocr_page_file(image_path: str) -> str:
+    """OCR a rasterized page stored on disk and return the raw tesseract text.
+
+    Runs inside a worker process; the image file is removed once read so
+    only the pages still in flight occupy the temporary directory.
+    """
+    with Image.open(image_path) as image:
+        processed_page = prepare_page(image)
+        page_text = pytesseract.image_to_string(processed_page, lang=OCR_LANG)
+    os.remove(image_path)
+    return page_text
+
+def _page_windows(page_numbers: Iterable[int], size: int) -> Iterator[Tuple[int, int]]:
+    """Group page numbers into contiguous (first, last) ranges of at most `size` pages."""
+    first = last = None
+    for page_num in page_numbers:
+        if first is not None and page_num == last + 1 and page_num - first < size:
+            last = page_num
+            continue
+        if first is not None:
+            yield first, last
+        first = last = page_num
+    if first is not None:
+        yield first, last
+
+def _peak_rss_mb(who: int) -> float:
+    """Peak resident set size in MB for this process or its largest child."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def iter_ocr_pages(pdf_path: str, page_numbers: Optional[List[int]] = None,
+                   dpi: int = OCR_DPI, workers: int = OCR_WORKERS,
+                   window: int = OCR_WINDOW) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, raw_text) in page order, running OCR in a process pool.
+
+    Pages are rasterized to a temporary directory in windows of `window`
+    pages, so at most about two windows of page images exist at any time
+    instead of the whole book.
+    """
+    if page_numbers is None:
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        page_numbers = range(1, page_count + 1)
+    workers = max(1, workers)
+    window = window or 2 * workers
     
-    # Convert PDF to images
-    print("Converting PDF to images...")
-    pages = convert_from_path(pdf_path, dpi=300)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with tempfile.TemporaryDirectory(prefix="ocr_") as tmp_dir:
+            pending = deque()
+            for first, last in _page_windows(page_numbers, window):
+                paths = convert_from_path(
+                    pdf_path, dpi=dpi, first_page=first, last_page=last,
+                    output_folder=tmp_dir, paths_only=True
+                )
+                for page_num, path in zip(range(first, last + 1), paths):
+                    pending.append((page_num, pool.submit(_ocr_page_file, path)))
+                
+                # Drain finished pages before rasterizing the next window
+                while len(pending) > window:
+                    page_num, future = pending.popleft()
+                    yield page_num, future.result()
+            
+            while pending:
+                page_num, future = pending.popleft()
+                yield page_num, future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def ocr_settings(dpi: int = OCR_DPI, lang: str = OCR_LANG) -> str:
+    """Describe everything besides the PDF itself that affects raw OCR output."""
+    version = pytesseract.get_tesseract_version()
+    return f"dpi={dpi}|preprocessing={PREPROCESSING}|lang={lang}|tesseract={version}"
+
+def iter_cached_ocr_pages(pdf_path: str, page_numbers: List[int], cache: OCRCache,
+                          workers: int = OCR_WORKERS, window: int = OCR_WINDOW) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, cleaned_text) in page order, only OCRing pages missing from the cache.
+
+    Each page's raw text is stored as soon as it is produced, so an
+    interrupted run resumes from the first page that was not finished.
+    """
+    missing = [page_num for page_num in page_numbers if not cache.has_raw(page_num)]
+    if len(missing) < len(page_numbers):
+        print(f"OCR cache: {len(page_numbers) - len(missing)} page(s) cached, {len(missing)} to OCR")
     
-    # Process each page
-    all_text = []
-    for i, page in enumerate(pages, 1):
-        print(f"Processing page {i}...")
-        
-        # Preprocess image
-        processed_page = preprocess_image(page)
-        
-        # Extract text with OCR
-        page_text = pytesseract.image_to_string(processed_page, lang='por')
-        
-        # Clean text
-        cleaned_text = clean_text(page_text)
-        
-        # Add page marker
-        page_marker = f"\n{'='*40}\n[PÁGINA {i}]\n{'='*40}\n"
-        all_text.append(f"{page_marker}\n{cleaned_text}")
+    ocr_pages = iter_ocr_pages(pdf_path, missing, workers=workers, window=window)
+    next_ocr = next(ocr_pages, None)
+    for page_num in page_numbers:
+        if next_ocr is not None and next_ocr[0] == page_num:
+            raw_text = next_ocr[1]
+            cache.put_raw(page_num, raw_text)
+            next_ocr = next(ocr_pages, None)
+        else:
+            raw_text = cache.get_raw(page_num)
+        yield page_num, cache.clean(raw_text)
+
+def iter_pdf_pages(pdf_path: str, use_text_layer: bool = True, ocr: bool = True,
+                   workers: int = OCR_WORKERS, window: int = OCR_WINDOW,
+                   pages: Optional[List[Optional[str]]] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, cleaned_text) for every page of a PDF, in order.
+    
+    Pages with a usable embedded text layer are read directly; only the
+    remaining pages are rasterized and OCRed (unless `ocr` is False, in which
+    case they are kept as extracted). Pass `pages` from classify_pages to
+    avoid parsing the PDF again.
+    """
+    if pages is not None:
+        reader_pages = pages
+    elif use_text_layer:
+        reader_pages = classify_pages(pdf_path)
+    else:
+        reader_pages = [None] * pdfinfo_from_path(pdf_path)["Pages"]
+    ocr_pages = [i for i, text in enumerate(reader_pages, 1) if text is None] if ocr else []
+    print(f"Text layer: {len(reader_pages) - len(ocr_pages)} page(s), OCR: {len(ocr_pages)} page(s)")
+    
+    ocr_results = iter(())
+    if ocr_pages:
+        # Only touch tesseract when there is something to OCR
+        cache = OCRCache(pdf_path, ocr_settings(), clean_text, helpers=(join_paragraphs,))
+        ocr_results = iter_cached_ocr_pages(pdf_path, ocr_pages, cache, workers=workers, window=window)
     
-    # Join all pages
-    final_text = '\n\n'.join(all_text)
+    for page_num, text in enumerate(reader_pages, 1):
+        if ocr_pages and text is None:
+            _, cleaned_text = next(ocr_results)
+        else:
+            cleaned_text = clean_text_layer(text or '')
+        yield page_num, cleaned_text
+
+def process_pdf(pdf_path: str, needs_ocr: Optional[bool] = None,
+                pages: Optional[List[Optional[str]]] = None) -> List[str]:
+    """Extract a PDF as a list of page-marked page texts.
+    
+    Only pages without a usable text layer are OCRed; pass `needs_ocr=False`
+    to skip OCR entirely, and `pages` from classify_pages when it already ran.
+    """
+    return [
+        format_page(page_num, text)
+        for page_num, text in iter_pdf_pages(pdf_path, ocr=needs_ocr is not False, pages=pages)
+    ]
+
+def process_pdf_ocr(pdf_path: str, output_path: str = None, workers: int = OCR_WORKERS,
+                    window: int = OCR_WINDOW, use_text_layer: bool = True) -> None:
+    """Process a PDF file with OCR and save the text with page markers."""
+    print(f"Processing: {pdf_path}")
     
     # Determine output path
     if output_path is None:
         output_path = str(Path(pdf_path).with_suffix('.txt'))
     
-    # Save text
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(final_text)
+    # Stream pages to a partial file so the whole book never sits in memory
+    print(f"Running OCR with {workers} worker(s)...")
+    start = time.perf_counter()
+    num_pages = 0
+    partial_path = output_path + '.part'
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        for page_num, cleaned_text in iter_pdf_pages(pdf_path, use_text_layer=use_text_layer,
+                                                     workers=workers, window=window):
+            print(f"Processing page {page_num}...")
+            if num_pages:
+                f.write('\n\n')
+            f.write(format_page(page_num, cleaned_text))
+            num_pages += 1
+    os.replace(partial_path, output_path)
+    elapsed = time.perf_counter() - start
     
     print(f"\nProcessed text saved to: {output_path}")
+    print(f"{num_pages} pages in {elapsed:.1f}s ({num_pages / max(elapsed, 1e-9):.2f} pages/s)")
+    print(f"Peak RSS: main {_peak_rss_mb(resource.RUSAGE_SELF):.0f} MB, "
+          f"largest worker {_peak_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
 
 if __name__ == "__main__":
     # Process the dignity book as an example
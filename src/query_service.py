@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.book_qa import BookQA, openai_client
+from src.config import QUERY_DAEMON_HOST, QUERY_DAEMON_PORT
+from src.incremental_index import load_catalog
+from src.cost_calculator import count_tokens, calculate_cost
+
+# Modelo a ser usado
+MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = """Você é um assistente especializado em direito constitucional português.
+    Use o contexto fornecido para responder à pergunta do usuário.
+    Baseie sua resposta APENAS no contexto fornecido.
+    Se o contexto não for suficiente para responder à pergunta, diga isso claramente.
+    Cite as páginas relevantes do livro em sua resposta."""
+
+def get_gpt_response(query: str, context: str) -> Dict[str, Any]:
+    """Answer a query from the context with MODEL; returns the answer, tokens, cost and seconds."""
+    start = time.perf_counter()
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"""Contexto do livro:
+        {context}
+
+        Pergunta: {query}
+
+        Por favor, responda à pergunta usando apenas o contexto fornecido acima."""}
+    ]
+    input_tokens = count_tokens("".join(m["content"] for m in messages))
+
+    response = openai_client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=0
+    )
+
+    response_text = response.choices[0].message.content
+    output_tokens = count_tokens(response_text)
+    return {
+        "answer": response_text,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": calculate_cost(input_tokens, output_tokens),
+        "seconds": time.perf_counter() - start
+    }
+
+class QueryService:
+    """Answers queries with BookQA and MODEL, keeping books, stores and clients warm between queries.
+
+    One BookQA is kept per set of books. Searches on the same BookQA take
+    turns (they are milliseconds); the model calls run concurrently.
+    """
+
+    def __init__(self, stores_dir: str = "stores"):
+        self.stores_dir = stores_dir
+        self.requests = 0
+        self.started = time.time()
+        self._qas: Dict[Optional[Tuple[str, ...]], Tuple[BookQA, threading.Lock]] = {}
+        self._lock = threading.Lock()
+
+    def _book_qa(self, books: Optional[List[str]]) -> Tuple[BookQA, threading.Lock]:
+        key = tuple(sorted(books)) if books else None
+        with self._lock:
+            if key in self._qas:
+                return self._qas[key]
+            qa = BookQA(self.stores_dir)
+            qa.load_books(list(key) if key else None)
+            if not qa.active_stores:
+                # Nothing to search: let the query fail, but don't keep the BookQA
+                return qa, threading.Lock()
+            self._qas[key] = (qa, threading.Lock())
+            return self._qas[key]
+
+    def available_books(self) -> List[str]:
+        return list(load_catalog(self.stores_dir))
+
+    def warm_up(self, books: Optional[List[str]] = None) -> None:
+        """Open the stores of a set of books (all by default) ahead of their first query."""
+        qa, _ = self._book_qa(books)
+        qa.open_stores()
+
+    def query(self, query: str, books: Optional[List[str]] = None, k: int = 4) -> Dict[str, Any]:
+        """Search the books for query and answer it; the result is JSON-serializable."""
+        start = time.perf_counter()
+        qa, lock = self._book_qa(books)
+        timings: Dict[str, Any] = {}
+        with lock:
+            results = qa.hybrid_search(query, k=k, timings=timings)
+        searched = time.perf_counter()
+
+        embedding_tokens = count_tokens(query, model="text-embedding-3-small")
+        embedding_cost = calculate_cost(embedding_tokens, 0, model="text-embedding-3-small")
+
+        # Prepare context from results
+        context = "\n\n".join([
+            f"[Página {r['metadata']['page']}]\n{r['content']}"
+            for r in results
+        ])
+        response = get_gpt_response(query, context)
+        with self._lock:
+            self.requests += 1
+        return {
+            "query": query,
+            "model": MODEL,
+            "results": results,
+            "timings": {**timings, "retrieval": searched - start, "llm": response["seconds"],
+                        "total": time.perf_counter() - start},
+            "answer": response["answer"],
+            "tokens": {"input": response["input_tokens"], "output": response["output_tokens"]},
+            "costs": {"embedding": embedding_cost, "response": response["cost"],
+                      "total": embedding_cost + response["cost"]}
+        }
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "books": sorted({book for qa, _ in self._qas.values() for book in qa.active_stores})
+        }
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    """Method, path and body of one HTTP/1.1 request."""
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) < 2:
+        raise ValueError("Pedido HTTP inválido")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return request_line[0], request_line[1], body
+
+def _response(status: int, payload: Dict[str, Any]) -> bytes:
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n")
+    return head.encode('latin-1') + body
+
+def _invalid_query(request: Any, service: QueryService) -> Optional[str]:
+    """Why a /query request cannot be served, or None when it is valid."""
+    if not isinstance(request, dict) or not isinstance(request.get("query"), str) or not request["query"].strip():
+        return "Campo 'query' em falta"
+    books = request.get("books")
+    if books is not None:
+        if not isinstance(books, list) or not books or not all(isinstance(book, str) for book in books):
+            return "Campo 'books' deve ser uma lista de nomes de livros"
+        unknown = sorted(set(books) - set(service.available_books()))
+        if unknown:
+            return f"Livros desconhecidos: {', '.join(unknown)}"
+    k = request.get("k", 4)
+    if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+        return "Campo 'k' deve ser um inteiro positivo"
+    return None
+
+async def handle_connection(service: QueryService, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    """Serve one request: POST /query {"query", "books", "k"} or GET /status.
+
+    BookQA and the model client block, so queries run in the default thread
+    pool and several can be in flight at once.
+    """
+    request = None
+    try:
+        # Only reading and validating the request can make it a bad request
+        try:
+            method, path, body = await _read_request(reader)
+            if method == "POST" and path == "/query":
+                request = json.loads(body or b'{}')
+                error = _invalid_query(request, service)
+                if error:
+                    raise ValueError(error)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, {"erro": str(e)}
+        else:
+            if method == "GET" and path == "/status":
+                status, payload = 200, service.status()
+            elif request is not None:
+                loop = asyncio.get_running_loop()
+                payload = await loop.run_in_executor(
+                    None, service.query, request["query"], request.get("books"), request.get("k", 4)
+                )
+                status = 200
+            else:
+                status, payload = 404, {"erro": f"Rota desconhecida: {method} {path}"}
+    except Exception as e:
+        status, payload = 500, {"erro": f"{type(e).__name__}: {e}"}
+    try:
+        writer.write(_response(status, payload))
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(service: QueryService, host: str = QUERY_DAEMON_HOST, port: int = QUERY_DAEMON_PORT) -> None:
+    """Serve queries over HTTP on host:port until cancelled."""
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"Servidor de consultas em http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
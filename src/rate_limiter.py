@@ -0,0 +1,43 @@
+import threading
+import time
+
+class RateLimiter:
+    """Thread-safe token-bucket limiter for requests-per-minute and tokens-per-minute quotas.
+
+    A limit of 0 disables that quota. Callers block in acquire() until the
+    request fits both buckets, so many worker threads can share one limiter.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until one request using `tokens` tokens is allowed."""
+        # A request larger than the whole bucket would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            time.sleep(wait)
@@ -1,14 +1,18 @@
-import re
 from pathlib import Path
-from typing import List, Dict, Any
-import json
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import TextSplitter
+from typing import Callable, Iterator, List, Dict, Any, Optional
+import time
+from langchain_core.embeddings import Embeddings
 from tqdm import tqdm
 import os
 from dotenv import load_dotenv
 
+from src.chunk_store import BLOB_FILE, LEGACY_FILE, write_chunk_store
+from src.chunking import count_tokens, iter_chunks
+from src.config import CHUNK_SIZE, CHUNK_OVERLAP
+from src.incremental_index import update_book_store
+from src.page_file import iter_pages
+from src.text_index import INDEX_FILE, build_text_index
+
 # Unset any existing OPENAI_API_KEY
 if 'OPENAI_API_KEY' in os.environ:
     del os.environ['OPENAI_API_KEY']
@@ -22,81 +26,68 @@ if not api_key:
     raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
 
 class PageChunker:
-    def __init__(self, cleaned_text_file: str):
-        """Initialize with path to cleaned text file."""
+    def __init__(self, cleaned_text_file: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        """Initialize with path to cleaned text file and chunk sizes in tokens."""
         self.text_file = cleaned_text_file
         self.book_name = Path(cleaned_text_file).stem.replace('_cleaned', '')
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+    
+    def iter_chunks(self) -> Iterator[Dict[str, Any]]:
+        """Stream the book's chunks: token-sized windows over each page, with page and char offsets."""
+        return iter_chunks(iter_pages(self.text_file), self.book_name, Path(self.text_file).name,
+                           chunk_size=self.chunk_size, overlap=self.chunk_overlap)
     
     def extract_pages(self) -> List[Dict[str, Any]]:
-        """Extract pages from cleaned text, returning list of dicts with content and metadata."""
-        with open(self.text_file, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
-        # Find all page markers and their content
-        page_pattern = r"={40}\n\[PÁGINA (\d+)\]\n={40}\n(.*?)(?=\n={40}|\Z)"
-        pages = re.findall(page_pattern, text, re.DOTALL)
-        
-        chunks = []
-        for page_num, content in pages:
-            content = content.strip()
-            # Skip empty pages or pages marked as blank
-            if not content or content == "(Página em branco)" or content == "(Página ilegível)":
-                continue
-            
-            chunks.append({
-                "content": content,
-                "metadata": {
-                    "page": int(page_num),
-                    "book": self.book_name,
-                    "source": Path(self.text_file).name
-                }
-            })
-        
-        return chunks
+        """Extract chunks from cleaned text, returning list of dicts with content and metadata."""
+        return list(self.iter_chunks())
 
-def create_book_store(chunks: List[Dict[str, Any]], store_dir: str) -> None:
-    """Create a vector store for a book's chunks."""
-    # Create embeddings using the global API key
-    embeddings = OpenAIEmbeddings(
-        api_key=api_key,
-        model="text-embedding-3-small"  # Using the latest embedding model
-    )
-    
-    # Create vector store
-    texts = [chunk["content"] for chunk in chunks]
-    metadatas = [chunk["metadata"] for chunk in chunks]
-    
-    Chroma.from_texts(
-        texts=texts,
-        metadatas=metadatas,
-        embedding=embeddings,
-        persist_directory=store_dir
-    )
+def process_book(cleaned_text_file: str, output_dir: str = "stores",
+                 log: Callable[[str], None] = print, embeddings: Optional[Embeddings] = None) -> Dict[str, Any]:
+    """Process a cleaned book text file into chunks and create its vector store.
 
-def process_book(cleaned_text_file: str, output_dir: str = "stores") -> None:
-    """Process a cleaned book text file into chunks and create its vector store."""
+    The store is embedded with `embeddings` (EMBEDDING_PROVIDER by default),
+    which its manifest records. Returns a summary with the book's pages,
+    chunks, tokens, index stats and elapsed seconds; `log` receives the
+    progress messages.
+    """
+    start = time.perf_counter()
     # Create chunker
     chunker = PageChunker(cleaned_text_file)
     
     # Extract pages
-    print(f"Extraindo páginas de {chunker.book_name}...")
+    log(f"Extraindo páginas de {chunker.book_name}...")
     chunks = chunker.extract_pages()
-    print(f"Encontrados {len(chunks)} chunks válidos")
+    log(f"Encontrados {len(chunks)} chunks válidos")
     
     # Create store directory
     store_dir = Path(output_dir) / chunker.book_name
     store_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save chunks to JSON for reference
-    chunks_file = store_dir / "chunks.json"
-    with open(chunks_file, 'w', encoding='utf-8') as f:
-        json.dump(chunks, f, ensure_ascii=False, indent=2)
-    print(f"Chunks salvos em {chunks_file}")
+    # Update vector store, re-embedding only new or changed pages. The chunk
+    # store is written after it, so a failed or interrupted embedding run never
+    # leaves new chunk rows next to the old exported vectors
+    log("Atualizando vector store...")
+    stats = update_book_store(chunks, str(store_dir), chunker.book_name, embeddings)
+    log(f"Vector store atualizada em {store_dir}: páginas {stats}")
+    
+    # Save chunks in the binary chunk store, which replaces chunks.json
+    write_chunk_store(str(store_dir), chunks)
+    (store_dir / LEGACY_FILE).unlink(missing_ok=True)
+    log(f"Chunks salvos em {store_dir / BLOB_FILE}")
+    
+    # Full-text index for exact-match search
+    build_text_index(str(store_dir), chunks)
+    log(f"Índice de texto salvo em {store_dir / INDEX_FILE}")
     
-    # Create vector store
-    print("Criando vector store...")
-    create_book_store(chunks, str(store_dir))
-    print(f"Vector store criada em {store_dir}")
+    return {
+        "book": chunker.book_name,
+        "pages": len({chunk["metadata"]["page"] for chunk in chunks}),
+        "chunks": len(chunks),
+        "tokens": sum(count_tokens(chunk["content"]) for chunk in chunks),
+        "index": stats,
+        "seconds": time.perf_counter() - start
+    }
 
 if __name__ == "__main__":
     import sys
@@ -1,11 +1,33 @@
-import re
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import openai
 from openai import OpenAI
 import os
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+from src.config import (
+    CACHE_DIR,
+    CLEAN_MODEL,
+    CLEAN_MAX_WORKERS,
+    CLEAN_RPM,
+    CLEAN_TPM,
+    CLEAN_MAX_RETRIES,
+    CLEAN_ROUTING,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_MAX_AGE_DAYS
+)
+from src.disk_cache import DiskCache, make_key
+from src.ocr_quality import ROUTE_CLEAN, ROUTE_LIGHT, ROUTE_LLM, score_page, light_fix
+from src.page_file import iter_pages
+from src.page_journal import PageJournal
+from src.rate_limiter import RateLimiter
+
 # Unset any existing OPENAI_API_KEY
 if 'OPENAI_API_KEY' in os.environ:
     del os.environ['OPENAI_API_KEY']
@@ -13,19 +35,7 @@ if 'OPENAI_API_KEY' in os.environ:
 # Load environment variables from .env file
 load_dotenv()
 
-def extract_pages(text: str) -> List[Tuple[int, str]]:
-    """Extract pages and their content from the OCR text."""
-    # Split text by page markers
-    page_pattern = r"={40}\n\[PÁGINA (\d+)\]\n={40}\n(.*?)(?=\n={40}|\Z)"
-    pages = re.findall(page_pattern, text, re.DOTALL)
-    return [(int(num), content.strip()) for num, content in pages]
-
-def clean_page_with_model(client, text: str, page_num: int) -> str:
-    """Clean a single page using a language model."""
-    if not text.strip():
-        return f"{'='*40}\n[PÁGINA {page_num}]\n{'='*40}\n\n(Página em branco)\n"
-    
-    system_prompt = """Você é um assistente especializado em corrigir texto em português europeu (PT-PT) extraído por OCR.
+SYSTEM_PROMPT = """Você é um assistente especializado em corrigir texto em português europeu (PT-PT) extraído por OCR.
 
 Regras OBRIGATÓRIAS:
 1. REMOVA SEMPRE o título/cabeçalho "Os princípios constitucionais estruturantes da República Portuguesa" que aparece no início da maioria das páginas. Este é apenas um cabeçalho do livro, não faz parte do texto principal.
@@ -48,69 +58,323 @@ Regras OBRIGATÓRIAS:
 
 Mantenha APENAS texto que faça sentido e tenha significado claro. É melhor remover texto duvidoso do que manter conteúdo sem sentido."""
 
+# Errors worth retrying: rate limits, server-side failures and network problems
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+def format_cleaned_page(page_num: int, text: str) -> str:
+    """Format a cleaned page with its page marker."""
+    return f"{'='*40}\n[PÁGINA {page_num}]\n{'='*40}\n\n{text}\n"
+
+def build_cleaning_request(text: str, page_num: int) -> dict:
+    """Build the chat-completions request body used to clean one page."""
+    return {
+        "model": CLEAN_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Corrija o seguinte texto da página {page_num}. REMOVA o cabeçalho repetitivo 'Os princípios constitucionais estruturantes da República Portuguesa' e todo texto sem sentido. Indique claramente continuações de frases entre páginas:\n\n{text}"}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 2000
+    }
+
+def estimate_request_tokens(request: dict) -> int:
+    """Roughly estimate the tokens a request counts against the TPM quota.
+
+    The API counts the prompt plus max_tokens; four characters per token is
+    close enough for pacing and avoids loading a tokenizer per request.
+    """
+    prompt_chars = sum(len(m["content"]) for m in request["messages"])
+    return prompt_chars // 4 + request["max_tokens"]
+
+def _retry_delay(error: Exception, attempt: int, backoff: float) -> float:
+    """Seconds to wait before the next attempt, honouring Retry-After when sent."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return backoff * (2 ** attempt) * (1 + random.random())
+
+def complete_with_retry(client, request: dict, limiter: Optional[RateLimiter] = None,
+                        max_retries: int = CLEAN_MAX_RETRIES, backoff: float = 1.0):
+    """Send a chat-completions request, retrying on 429/5xx with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire(estimate_request_tokens(request))
+        try:
+            return client.chat.completions.create(**request)
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            time.sleep(_retry_delay(e, attempt, backoff))
+
+def clean_page_locally(text: str, page_num: int) -> str:
+    """Clean a page with the deterministic rules instead of the model."""
+    return format_cleaned_page(page_num, light_fix(text) or "(Página ilegível)")
+
+def route_page(page_num: int, content: str) -> Tuple[str, int]:
+    """Route one page with the OCR quality scorer; returns the route and the tokens it saves.
+    
+    Blank pages go to the model because clean_page_with_model handles them
+    without an API call.
+    """
+    route = score_page(content).route if content.strip() else ROUTE_LLM
+    if route == ROUTE_LLM:
+        return route, 0
+    # Prompt plus a response about as long as the page
+    return route, estimate_request_tokens(build_cleaning_request(content, page_num)) - 2000 + len(content) // 4
+
+def _print_routing(routes: Counter, saved_tokens: int) -> None:
+    print(f"Encaminhamento: {routes[ROUTE_CLEAN]} limpas, {routes[ROUTE_LIGHT]} com correção local, "
+          f"{routes[ROUTE_LLM]} para o modelo (~{saved_tokens} tokens poupados)")
+
+def route_pages(pages: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+    """Split pages into (local, model) groups using the OCR quality scorer (see route_page)."""
+    local, model = [], []
+    routes = Counter()
+    saved_tokens = 0
+    for page_num, content in pages:
+        route, saved = route_page(page_num, content)
+        routes[route] += 1
+        saved_tokens += saved
+        (model if route == ROUTE_LLM else local).append((page_num, content))
+    
+    _print_routing(routes, saved_tokens)
+    return local, model
+
+def open_response_cache() -> DiskCache:
+    """Open the shared on-disk cache of cleaning responses."""
+    return DiskCache(
+        Path(CACHE_DIR) / "llm_responses.sqlite",
+        max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+        max_age=LLM_CACHE_MAX_AGE_DAYS * 24 * 3600
+    )
+
+def clean_page_with_model(client, text: str, page_num: int, limiter: Optional[RateLimiter] = None,
+                          backoff: float = 1.0, cache: Optional[DiskCache] = None) -> Optional[str]:
+    """Clean a single page using a language model; None when the request failed.
+    
+    When a cache is given, responses are looked up by a hash of the full
+    request (model, temperature, prompts and page text) before calling the API.
+    """
+    if not text.strip():
+        return format_cleaned_page(page_num, "(Página em branco)")
+    
+    request = build_cleaning_request(text, page_num)
+    key = make_key(request) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return format_cleaned_page(page_num, cached.decode('utf-8'))
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Corrija o seguinte texto da página {page_num}. REMOVA o cabeçalho repetitivo 'Os princípios constitucionais estruturantes da República Portuguesa' e todo texto sem sentido. Indique claramente continuações de frases entre páginas:\n\n{text}"}
-            ],
-            temperature=0.3,
-            max_tokens=2000
-        )
-        
+        response = complete_with_retry(client, request, limiter, backoff=backoff)
         cleaned_text = response.choices[0].message.content.strip()
-        return f"{'='*40}\n[PÁGINA {page_num}]\n{'='*40}\n\n{cleaned_text}\n"
+        if cache is not None:
+            cache.set(key, cleaned_text.encode('utf-8'))
+        return format_cleaned_page(page_num, cleaned_text)
     except Exception as e:
         print(f"Erro ao processar página {page_num}: {str(e)}")
-        return f"{'='*40}\n[PÁGINA {page_num}]\n{'='*40}\n\n{text}\n"
+        return None
 
-def clean_ocr_text(input_file: str, output_file: str = None) -> None:
-    """Clean OCR text using a language model while preserving page structure."""
-    print(f"Lendo arquivo: {input_file}")
+def clean_ocr_text(input_file: str, output_file: str = None, client=None,
+                   max_workers: int = CLEAN_MAX_WORKERS, limiter: Optional[RateLimiter] = None,
+                   backoff: float = 1.0, cache: Optional[DiskCache] = None,
+                   routing: bool = CLEAN_ROUTING) -> None:
+    """Clean OCR text using a language model while preserving page structure.
     
-    # Verificar API key
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
+    Pages are read one at a time and up to `max_workers` are cleaned
+    concurrently, paced by `limiter` (requests/tokens per minute); each is
+    journaled as soon as it finishes and the result is written back in the
+    original order. With `routing`, pages the local quality scorer considers
+    clean or lightly damaged are fixed with deterministic rules and never
+    reach the model. Pages whose request fails keep their raw text but stay
+    unfinished in the journal, so running again retries only those pages.
+    """
+    print(f"Lendo arquivo: {input_file}")
     
-    # Inicializar cliente OpenAI com a API key do .env
-    client = OpenAI(api_key=api_key)
+    if client is None:
+        # Verificar API key
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY não encontrada no arquivo .env")
+        
+        # Inicializar cliente OpenAI com a API key do .env; as retentativas são feitas aqui
+        client = OpenAI(api_key=api_key, max_retries=0)
+    if limiter is None:
+        limiter = RateLimiter(CLEAN_RPM, CLEAN_TPM)
+    if cache is None:
+        cache = open_response_cache()
     
-    # Ler arquivo
-    with open(input_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    # Determinar arquivo de saída
+    if output_file is None:
+        input_path = Path(input_file)
+        output_file = str(input_path.parent / f"{input_path.stem}_cleaned{input_path.suffix}")
     
-    # Extrair páginas
-    pages = extract_pages(text)
-    print(f"Encontradas {len(pages)} páginas")
+    # Retomar a partir do diário de páginas já limpas, se existir
+    journal = PageJournal(output_file + '.journal')
+    page_nums = []
+    resumed = 0
+    routes = Counter()
+    saved_tokens = 0
     
-    # Processar cada página
-    cleaned_pages = []
-    for page_num, content in tqdm(pages, desc="Limpando páginas"):
-        cleaned_content = clean_page_with_model(client, content, page_num)
-        cleaned_pages.append(cleaned_content)
+    # Ler as páginas uma a uma; só as que estão a ser limpas ficam em memória
+    in_flight = {}
+    max_in_flight = 2 * max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, tqdm(desc="Limpando páginas") as progress:
+        def finish(futures) -> None:
+            """Journal finished pages as soon as they are done."""
+            for future in futures:
+                page_num, content = in_flight.pop(future)
+                cleaned = future.result()
+                if cleaned is None:
+                    # Fica com o texto original, mas por fazer, para ser repetida na próxima execução
+                    journal.append(page_num, content, format_cleaned_page(page_num, content), done=False)
+                else:
+                    journal.append(page_num, content, cleaned)
+                progress.update()
         
-        # Salvar progresso a cada 10 páginas
-        if page_num % 10 == 0 or page_num == len(pages):
-            temp_text = '\n'.join(cleaned_pages)
-            temp_file = input_file.replace('.txt', f'_cleaned_temp.txt')
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(temp_text)
-            print(f"\nProgresso salvo até a página {page_num}")
+        for page_num, content in iter_pages(input_file):
+            page_nums.append(page_num)
+            if journal.is_done(page_num, content):
+                resumed += 1
+                continue
+            if routing:
+                route, saved = route_page(page_num, content)
+                routes[route] += 1
+                saved_tokens += saved
+                if route != ROUTE_LLM:
+                    journal.append(page_num, content, clean_page_locally(content, page_num))
+                    progress.update()
+                    continue
+            future = executor.submit(clean_page_with_model, client, content, page_num, limiter, backoff, cache)
+            in_flight[future] = (page_num, content)
+            if len(in_flight) >= max_in_flight:
+                finish(wait(in_flight, return_when=FIRST_COMPLETED).done)
+        finish(as_completed(list(in_flight)))
+    
+    print(f"Encontradas {len(page_nums)} páginas")
+    if resumed:
+        print(f"Retomando: {resumed} páginas já limpas")
+    if routing:
+        _print_routing(routes, saved_tokens)
+
+    # Montar o resultado pela ordem original, lendo as páginas do diário
+    with open(output_file, 'w', encoding='utf-8') as f:
+        journal.write_pages(f, page_nums)
+    if journal.unfinished:
+        print(f"Aviso: {journal.unfinished} páginas mantidas com o texto original; "
+              f"execute novamente para repetir apenas essas")
+        journal.close()
+    else:
+        journal.remove()
     
-    # Juntar páginas limpas
-    final_text = '\n'.join(cleaned_pages)
+    print(f"\nTexto limpo salvo em: {output_file}")
+    
+    cache.evict()
+    print(f"Cache de respostas: {cache.stats()}")
+
+def _batch_custom_id(page_num: int) -> str:
+    return f"pagina-{page_num}"
+
+def export_batch_requests(input_file: str, batch_file: str = None, routing: bool = CLEAN_ROUTING) -> str:
+    """Export one cleaning request per non-blank page as a Batch API input file (JSONL).
+    
+    Each line carries the same request body clean_page_with_model sends, so
+    the batch results can be merged back with import_batch_results. With
+    `routing`, only the pages that need the model are exported.
+    """
+    pages = list(iter_pages(input_file))
+    if routing:
+        _, pages = route_pages(pages)
+    
+    if batch_file is None:
+        input_path = Path(input_file)
+        batch_file = str(input_path.parent / f"{input_path.stem}_batch_input.jsonl")
+    
+    num_requests = 0
+    with open(batch_file, 'w', encoding='utf-8') as f:
+        for page_num, content in pages:
+            if not content.strip():
+                continue
+            f.write(json.dumps({
+                "custom_id": _batch_custom_id(page_num),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": build_cleaning_request(content, page_num)
+            }, ensure_ascii=False) + '\n')
+            num_requests += 1
+    
+    print(f"{num_requests} pedidos exportados para: {batch_file}")
+    return batch_file
+
+def _read_batch_results(results_file: str) -> dict:
+    """Map custom_id to cleaned text for every successful line of a results file."""
+    results = {}
+    skipped = 0
+    with open(results_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    skipped += 1
+                    continue
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[result["custom_id"]] = content.strip()
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                skipped += 1
+    if skipped:
+        print(f"Aviso: {skipped} linhas de resultado com erro ou inválidas")
+    return results
+
+def import_batch_results(input_file: str, results_file: str, output_file: str = None,
+                         cache: Optional[DiskCache] = None, routing: bool = CLEAN_ROUTING) -> None:
+    """Rebuild the cleaned text file, in page order, from a Batch API results file.
+    
+    Pages whose result is missing or failed fall back to the raw OCR text,
+    just like a failed interactive request, unless `routing` marks them as
+    fixable by the local rules. Successful results are also stored in the
+    response cache.
+    """
+    pages = list(iter_pages(input_file))
+    results = _read_batch_results(results_file)
+    if cache is None:
+        cache = open_response_cache()
     
-    # Determinar arquivo de saída
     if output_file is None:
         input_path = Path(input_file)
         output_file = str(input_path.parent / f"{input_path.stem}_cleaned{input_path.suffix}")
     
-    # Salvar resultado
+    fallbacks = 0
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(final_text)
+        for i, (page_num, content) in enumerate(pages):
+            if i:
+                f.write('\n')
+            cleaned_text = results.get(_batch_custom_id(page_num))
+            if not content.strip():
+                cleaned_text = "(Página em branco)"
+            elif cleaned_text is not None:
+                cache.set(make_key(build_cleaning_request(content, page_num)), cleaned_text.encode('utf-8'))
+            elif routing and score_page(content).route != ROUTE_LLM:
+                f.write(clean_page_locally(content, page_num))
+                continue
+            else:
+                fallbacks += 1
+                cleaned_text = content
+            f.write(format_cleaned_page(page_num, cleaned_text))
     
+    if fallbacks:
+        print(f"Aviso: {fallbacks} páginas sem resultado mantidas com o texto original")
     print(f"\nTexto limpo salvo em: {output_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import heapq
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.chunk_store import META_FILE, ChunkStore, open_chunk_store
+
+INDEX_FILE = "text_index.sqlite"
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUOTED_PATTERN = re.compile(r'"([^"]+)"|“([^”]+)”|«([^»]+)»')
+# 25/04/1974, 25-4-74, 25.04.1974 and "25 de Abril de 1974"
+DATE_PATTERN = re.compile(
+    r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b|\b\d{1,2}\s+de\s+[^\W\d_]+(?:\s+de\s+\d{4})?\b",
+    re.IGNORECASE
+)
+
+# Function words left out of any-term queries, where they would match every chunk
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de do dos e em entre essa esse esta este isso isto ja lhe lhes
+mais mas me na nas nem no nos o os ou para pela pelas pelo pelos por qual quais quando que quem
+se sem ser seu seus sua suas sao tambem um uma umas uns
+""".split())
+
+# Plural endings, longest first, with what replaces them (matched after accents are stripped)
+PLURAL_SUFFIXES = (
+    ("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("uis", "ul"),
+    ("eses", "e"), ("res", "r"), ("zes", "z"), ("ns", "m"), ("s", ""),
+)
+
+def fold(text: str) -> str:
+    """Casefold and strip accents: "Constituição" -> "constituicao"."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def stem(token: str) -> str:
+    """Light Portuguese stemming: reduce plurals to the singular ("constituicoes" -> "constituicao")."""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)] + replacement
+    return token
+
+def normalize_terms(text: str) -> List[str]:
+    """Fold, tokenize and stem text into index terms."""
+    return [stem(token) for token in TOKEN_PATTERN.findall(fold(text))]
+
+def _phrase(terms: List[str]) -> str:
+    return '"' + ' '.join(terms) + '"'
+
+def build_match_query(query: str, operator: str = "AND") -> str:
+    """Turn a user query into an FTS5 MATCH expression over normalized terms.
+
+    Quoted passages and dates become phrases; the remaining words are
+    joined with `operator` ("AND" or "OR"; stopwords are dropped for OR).
+    Returns "" when nothing searchable is left.
+    """
+    clauses = []
+    for match in QUOTED_PATTERN.finditer(query):
+        terms = normalize_terms(next(group for group in match.groups() if group))
+        if terms:
+            clauses.append(_phrase(terms))
+    rest = QUOTED_PATTERN.sub(' ', query)
+    for match in DATE_PATTERN.finditer(rest):
+        clauses.append(_phrase(normalize_terms(match.group())))
+    rest = DATE_PATTERN.sub(' ', rest)
+
+    terms = normalize_terms(rest)
+    if operator == "OR":
+        terms = [term for term in terms if term not in STOPWORDS] or terms
+    # Every term is quoted, so FTS5 operators typed by the user are plain words
+    clauses.extend(_phrase([term]) for term in dict.fromkeys(terms))
+    return f" {operator} ".join(clauses)
+
+def build_text_index(store_dir: str, chunks: Iterable[Dict]) -> None:
+    """Build a book's FTS5 index over its chunks' normalized text (rowid = chunk row)."""
+    path = Path(store_dir) / INDEX_FILE
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE VIRTUAL TABLE chunks USING fts5(body, content='', tokenize='unicode61')")
+        conn.executemany(
+            "INSERT INTO chunks (rowid, body) VALUES (?, ?)",
+            ((row, ' '.join(normalize_terms(chunk["content"]))) for row, chunk in enumerate(chunks))
+        )
+        conn.execute("INSERT INTO chunks (chunks) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+class TextIndex:
+    """Accent-insensitive BM25 full-text search over one book's chunks."""
+
+    def __init__(self, store_dir: str, chunks: Optional[ChunkStore] = None):
+        self.store_dir = Path(store_dir)
+        self.chunks = chunks or open_chunk_store(str(store_dir))
+        self._conn = sqlite3.connect(self.store_dir / INDEX_FILE, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def search_rows(self, query: str, limit: int = 5, operator: str = "AND") -> List[Tuple[int, float]]:
+        """(chunk row, bm25) of the best matches; lower bm25 is better."""
+        match = build_match_query(query, operator)
+        if not match:
+            return []
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rowid, bm25(chunks) FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+
+    def search(self, query: str, limit: int = 5, operator: str = "AND", book: str = "") -> List[dict]:
+        """Best matches as BookQA result dicts, scored by BM25 (lower is better)."""
+        return [
+            {
+                "content": self.chunks.content(row),
+                "metadata": self.chunks.metadata(row),
+                "score": score,
+                "book": book or self.chunks.metadata(row).get("book", self.store_dir.name)
+            }
+            for row, score in self.search_rows(query, limit, operator)
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+def open_text_index(store_dir: str) -> TextIndex:
+    """Open a book's text index, (re)building it when missing or older than its chunks."""
+    store_dir = Path(store_dir)
+    chunks = open_chunk_store(str(store_dir))
+    index_path = store_dir / INDEX_FILE
+    if not index_path.exists() or index_path.stat().st_mtime_ns < (store_dir / META_FILE).stat().st_mtime_ns:
+        build_text_index(str(store_dir), chunks)
+    return TextIndex(str(store_dir), chunks)
+
+def search_books(indexes: Dict[str, TextIndex], query: str, limit: int = 5, operator: str = "AND") -> List[dict]:
+    """Search several books' indexes and merge their hits by BM25 score."""
+    per_book = [index.search(query, limit, operator, book) for book, index in indexes.items()]
+    return list(heapq.merge(*per_book, key=lambda x: x["score"]))[:limit]
@@ -0,0 +1,297 @@
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.chunk_store import META_FILE, open_chunk_store
+from src.config import VECTOR_QUANTIZATION, RESCORE_FACTOR
+
+VECTORS_FILE = "vectors.npy"
+QUANTIZATIONS = ("float32", "float16", "int8")
+# Rows dequantized at once during a scan; bounds the float32 scratch memory
+SCAN_BLOCK = 1024
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (rows of zeros are left as they are)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 scalar quantization with one scale per dimension."""
+    scale = np.abs(vectors).max(axis=0) / 127
+    scale[scale == 0] = 1
+    codes = np.clip(np.round(vectors / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+def _compact_files(store_dir: Path, quantization: str) -> List[Path]:
+    if quantization == "float16":
+        return [store_dir / "vectors.float16.npy"]
+    if quantization == "int8":
+        return [store_dir / "vectors.int8.npy", store_dir / "vectors.int8.scale.npy"]
+    return []
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    """Replace an .npy file as a whole; processes that memory-mapped the old one keep reading it."""
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+def save_vectors(store_dir: str, vectors: np.ndarray) -> None:
+    """Write a store's normalized float32 vectors and their float16 and int8 copies.
+
+    Row i belongs to row i of the store's chunk store.
+    """
+    store_dir = Path(store_dir)
+    full = normalize_rows(vectors)
+    _save_atomic(store_dir / VECTORS_FILE, full)
+    _save_atomic(_compact_files(store_dir, "float16")[0], full.astype(np.float16))
+    codes, scale = quantize_int8(full)
+    codes_file, scale_file = _compact_files(store_dir, "int8")
+    _save_atomic(codes_file, codes)
+    _save_atomic(scale_file, scale)
+
+def has_vectors(store_dir: str) -> bool:
+    return (Path(store_dir) / VECTORS_FILE).exists()
+
+def check_rows(store_dir: str, vectors: np.ndarray, chunks) -> None:
+    """Reject vectors that do not have exactly one row per chunk of the store."""
+    if len(vectors) != len(chunks):
+        raise ValueError(f"Store {store_dir} tem {len(vectors)} vetores para {len(chunks)} chunks; "
+                         f"indexe o livro novamente")
+
+class CompactVectors:
+    """Vectors held in memory in a compact form, with full-precision rescoring.
+
+    Top-k candidates are found by scanning the float16 or int8 (per-dimension
+    scale) copy, then the `rescore` * k best are re-scored against the
+    float32 vectors, which stay memory-mapped on disk and are only read for
+    those rows. With "float32" the full vectors are loaded and scanned directly.
+    """
+
+    def __init__(self, compact: np.ndarray, full: np.ndarray, scale: Optional[np.ndarray] = None,
+                 rescore: int = RESCORE_FACTOR):
+        self.compact = compact
+        self.full = full
+        self.scale = scale
+        self.rescore = rescore
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, quantization: str = "int8", rescore: int = RESCORE_FACTOR):
+        """Build in memory from float32 vectors (used to compare quantizations)."""
+        full = normalize_rows(vectors)
+        if quantization == "int8":
+            codes, scale = quantize_int8(full)
+            return cls(codes, full, scale, rescore)
+        if quantization == "float16":
+            return cls(full.astype(np.float16), full, None, rescore)
+        return cls(full, full, None, rescore)
+
+    @classmethod
+    def load(cls, store_dir: str, quantization: str = "int8", rescore: int = RESCORE_FACTOR):
+        """Load a store's vectors: the compact copy in memory, the float32 ones memory-mapped."""
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Quantização desconhecida: {quantization}")
+        store_dir = Path(store_dir)
+        if quantization == "float32":
+            full = np.load(store_dir / VECTORS_FILE)
+            return cls(full, full, None, rescore)
+        full = np.load(store_dir / VECTORS_FILE, mmap_mode='r')
+        files = _compact_files(store_dir, quantization)
+        compact = np.load(files[0])
+        scale = np.load(files[1]) if len(files) > 1 else None
+        return cls(compact, full, scale, rescore)
+
+    def __len__(self) -> int:
+        return len(self.compact)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of vector data held in process memory."""
+        return self.compact.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        if self.compact.dtype == np.float32:
+            return self.compact @ query
+        if self.scale is not None:
+            # codes · (q * scale) == (codes * scale) · q, without dequantizing the matrix
+            query = query * self.scale
+        scores = np.empty(len(self.compact), dtype=np.float32)
+        for start in range(0, len(self.compact), SCAN_BLOCK):
+            block = self.compact[start:start + SCAN_BLOCK].astype(np.float32)
+            scores[start:start + SCAN_BLOCK] = block @ query
+        return scores
+
+    def search(self, query, k: int) -> List[Tuple[int, float]]:
+        """Return the (row, cosine similarity) of the k nearest rows, best first."""
+        if len(self) == 0 or k <= 0:
+            return []
+        query = normalize_rows(np.asarray(query, dtype=np.float32))
+        scores = self._approximate_scores(query)
+
+        exact = self.compact.dtype == np.float32
+        candidates = min(len(scores), k if exact or not self.rescore else k * self.rescore)
+        rows = np.argpartition(-scores, candidates - 1)[:candidates]
+        if exact or not self.rescore:
+            top = scores[rows]
+        else:
+            rows.sort()  # Sequential reads from the memory map
+            top = np.asarray(self.full[rows], dtype=np.float32) @ query
+        order = np.argsort(-top)[:k]
+        return [(int(rows[i]), float(top[i])) for i in order]
+
+class CompactBookStore:
+    """A book store searched through CompactVectors instead of Chroma.
+
+    Offers the `similarity_search_with_score` call BookQA uses on Chroma;
+    scores are 2 - 2·cos, Chroma's default L2 distance on normalized vectors,
+    so results from both kinds of store sort together.
+    """
+
+    def __init__(self, store_dir: str, embeddings: Embeddings, quantization: str = VECTOR_QUANTIZATION or "int8"):
+        self.store_dir = Path(store_dir)
+        self.embeddings = embeddings
+        self.vectors = CompactVectors.load(str(store_dir), quantization)
+        self.chunks = open_chunk_store(str(store_dir))
+        check_rows(str(store_dir), self.vectors, self.chunks)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float],
+                                                          k: int = 4) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=self.chunks.content(row), metadata=self.chunks.metadata(row)),
+             2 - 2 * similarity)
+            for row, similarity in self.vectors.search(embedding, k)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embeddings.embed_query(query), k)
+
+def _files_version(store_dir: str) -> Tuple:
+    """Identifies the vectors and chunk files a store has now; both are replaced, never rewritten, on re-indexing."""
+    stats = [(Path(store_dir) / name).stat() for name in (VECTORS_FILE, META_FILE)]
+    return tuple((stat.st_ino, stat.st_mtime_ns) for stat in stats)
+
+class StackedVectorIndex:
+    """Exact search over several books' vectors stacked into one matrix.
+
+    Each book's vectors.npy is memory-mapped; with more than one book they
+    are copied once into a single contiguous matrix, with row offsets
+    mapping books to their rows. A query is one matmul over the whole
+    matrix, then an argpartition per requested book. All books must share
+    the same embeddings. A book re-indexed since it was added is reopened
+    and the matrix rebuilt before the next search. Results are the dicts
+    BookQA.search returns, scored 2 - 2·cos like CompactBookStore.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.books: List[str] = []
+        self.chunks = {}
+        self._store_dirs: List[str] = []
+        self._versions: List[Tuple] = []
+        self._parts: List[np.ndarray] = []
+        # (books, matrix, starts), replaced as a whole so searches running in
+        # other threads always see a consistent stack
+        self._stack: Optional[Tuple[List[str], np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _open(store_dir: str):
+        version = _files_version(store_dir)
+        chunks = open_chunk_store(store_dir)
+        vectors = np.load(Path(store_dir) / VECTORS_FILE, mmap_mode='r')
+        check_rows(store_dir, vectors, chunks)
+        return version, chunks, vectors
+
+    def add_book(self, book: str, store_dir: str) -> None:
+        version, chunks, vectors = self._open(str(store_dir))
+        with self._lock:
+            self.books.append(book)
+            self.chunks[book] = chunks
+            self._store_dirs.append(str(store_dir))
+            self._versions.append(version)
+            self._parts.append(vectors)
+            self._stack = None
+
+    def _reopen_changed(self) -> None:
+        """Reopen the books re-indexed since they were opened."""
+        changed = [i for i, (store_dir, version) in enumerate(zip(self._store_dirs, self._versions))
+                   if _files_version(store_dir) != version]
+        if not changed:
+            return
+        with self._lock:
+            for i in changed:
+                try:
+                    version, chunks, vectors = self._open(self._store_dirs[i])
+                except ValueError:
+                    # Caught between writing the vectors and the chunks; the old files are still mapped
+                    continue
+                self.chunks[self.books[i]] = chunks
+                self._versions[i] = version
+                self._parts[i] = vectors
+                self._stack = None
+
+    def _stacked(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Books, matrix and row offsets, rebuilt on first use after books were added or re-indexed."""
+        self._reopen_changed()
+        stack = self._stack
+        if stack is not None:
+            return stack
+        with self._lock:
+            if self._stack is None:
+                if not self._parts:
+                    matrix = np.zeros((0, 0), dtype=np.float32)
+                else:
+                    matrix = self._parts[0] if len(self._parts) == 1 else np.concatenate(self._parts)
+                sizes = [len(part) for part in self._parts]
+                starts = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+                self._stack = (list(self.books), matrix, starts)
+            return self._stack
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The stacked matrix, built on first use after books were added."""
+        return self._stacked()[1]
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._stacked()[2]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def search_books(self, embedding: List[float], k: int,
+                     books: Optional[List[str]] = None) -> dict:
+        """Top k results of each book (all by default), as {book: results best first}."""
+        stacked_books, matrix, starts = self._stacked()
+        if not stacked_books:
+            return {}
+        query = normalize_rows(np.asarray(embedding, dtype=np.float32))
+        scores = matrix @ query
+        results = {}
+        for book in books or stacked_books:
+            book_id = stacked_books.index(book)
+            start, end = int(starts[book_id]), int(starts[book_id + 1])
+            book_scores = scores[start:end]
+            top = min(k, len(book_scores))
+            if top <= 0:
+                results[book] = []
+                continue
+            rows = np.argpartition(-book_scores, top - 1)[:top]
+            rows = rows[np.argsort(-book_scores[rows])]
+            chunks = self.chunks[book]
+            results[book] = [
+                {
+                    "content": chunks.content(int(row)),
+                    "metadata": chunks.metadata(int(row)),
+                    "score": float(2 - 2 * book_scores[row]),
+                    "book": book
+                }
+                for row in rows
+            ]
+        return results
@@ -1,71 +1,139 @@
-from typing import List, Dict
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Dict, Optional
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from openai import OpenAI
-from config import (
+from src.config import (
     QDRANT_HOST,
     QDRANT_PORT,
     COLLECTION_NAME,
-    OPENAI_API_KEY,
-    EMBEDDING_MODEL
+    EMBED_BATCH_TOKENS,
+    EMBED_BATCH_SIZE,
+    UPSERT_BATCH_SIZE,
+    UPSERT_WORKERS
 )
+from src.embeddings import estimate_tokens, get_embeddings
+
+# Namespace for deterministic point IDs derived from (book, chunk index)
+POINT_NAMESPACE = uuid.UUID("6f1c2a52-7c1e-4d0a-9a43-5b8f3f0d2e11")
+
+def point_id(book: str, chunk_index: int) -> str:
+    """Stable Qdrant point ID for a book's chunk, so re-indexing overwrites instead of duplicating."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{book}:{chunk_index}"))
 
 class VectorStore:
-    def __init__(self):
-        self.client = QdrantClient(QDRANT_HOST, port=QDRANT_PORT)
-        self.openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, collection_name: str = COLLECTION_NAME, host: str = QDRANT_HOST,
+                 port: int = QDRANT_PORT, api_key: Optional[str] = None,
+                 client: Optional[QdrantClient] = None,
+                 embedder: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 vector_size: Optional[int] = None):
+        """Connect to Qdrant; `client` and `embedder` can be injected (e.g. QdrantClient(":memory:"))."""
+        self.collection_name = collection_name
+        self.client = client or QdrantClient(host, port=port, api_key=api_key)
+        self.embed = embedder or get_embeddings()
+        if vector_size is None:
+            vector_size = self.embed.identity()["dimensions"] if hasattr(self.embed, "identity") else 1536
+        self.vector_size = vector_size
         self._ensure_collection()
 
     def _ensure_collection(self):
         """Ensure the collection exists with the correct settings."""
         collections = self.client.get_collections().collections
-        exists = any(col.name == COLLECTION_NAME for col in collections)
+        exists = any(col.name == self.collection_name for col in collections)
         
         if not exists:
             self.client.create_collection(
-                collection_name=COLLECTION_NAME,
+                collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
-                    size=1536,  # OpenAI embedding dimension
+                    size=self.vector_size,
                     distance=models.Distance.COSINE
                 )
             )
 
     def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for a text using OpenAI API."""
-        response = self.openai_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text
-        )
-        return response.data[0].embedding
+        """Get embedding for a text."""
+        if hasattr(self.embed, "embed_query"):
+            return self.embed.embed_query(text)
+        return self.embed([text])[0]
 
-    def add_documents(self, chunks: List[Dict[str, str]]):
-        """Add documents to the vector store."""
-        for i, chunk in enumerate(chunks):
-            embedding = self._get_embedding(chunk["text"])
-            
-            self.client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=[
-                    models.PointStruct(
-                        id=i,
+    @staticmethod
+    def _embedding_batches(chunks: List[Dict], max_tokens: int, max_size: int) -> Iterator[List[Dict]]:
+        """Pack chunks into embedding requests under a token budget and input count."""
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = estimate_tokens(chunk["text"])
+            if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _upsert(self, points: List[models.PointStruct]) -> None:
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
+
+    def add_documents(self, chunks: List[Dict], batch_tokens: int = EMBED_BATCH_TOKENS,
+                      batch_size: int = EMBED_BATCH_SIZE, upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                      workers: int = UPSERT_WORKERS) -> int:
+        """Add documents to the vector store, embedding and upserting them in batches.
+        
+        Point IDs come from the chunk's book (or source) and its chunk_index
+        (its position within that book in `chunks` when absent), so
+        re-indexing a book replaces its points and never touches other
+        books. Upserts run on `workers` threads. Returns the number of chunks added.
+        """
+        # Resolve each chunk's stable identity before batching
+        per_book = {}
+        prepared = []
+        for chunk in chunks:
+            metadata = dict(chunk.get("metadata", {}))
+            book = metadata.get("book") or metadata.get("source", "")
+            if "chunk_index" not in metadata:
+                metadata["chunk_index"] = per_book.get(book, 0)
+            per_book[book] = metadata["chunk_index"] + 1
+            prepared.append({"text": chunk["text"], "metadata": metadata, "id": point_id(book, metadata["chunk_index"])})
+        
+        start = time.perf_counter()
+        pending_points = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = []
+            for batch in self._embedding_batches(prepared, batch_tokens, batch_size):
+                embeddings = self.embed([chunk["text"] for chunk in batch])
+                for chunk, embedding in zip(batch, embeddings):
+                    pending_points.append(models.PointStruct(
+                        id=chunk["id"],
                         vector=embedding,
                         payload={
                             "text": chunk["text"],
                             **chunk["metadata"]
                         }
-                    )
-                ]
-            )
+                    ))
+                while len(pending_points) >= upsert_batch_size:
+                    futures.append(executor.submit(self._upsert, pending_points[:upsert_batch_size]))
+                    pending_points = pending_points[upsert_batch_size:]
+            if pending_points:
+                futures.append(executor.submit(self._upsert, pending_points))
+            for future in futures:
+                future.result()
+        
+        elapsed = time.perf_counter() - start
+        print(f"Indexed {len(prepared)} chunks in {elapsed:.2f}s ({len(prepared) / max(elapsed, 1e-9):.1f} chunks/s)")
+        return len(prepared)
+
+    # main.py predates the rename
+    add_texts = add_documents
 
     def search(self, query: str, limit: int = 5) -> List[Dict]:
         """Search for similar documents."""
         query_embedding = self._get_embedding(query)
         
-        results = self.client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_embedding,
+        results = self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_embedding,
             limit=limit
-        )
+        ).points
         
         return [
             {
@@ -82,7 +150,7 @@ class VectorStore:
         try:
             # Get all points from the collection
             results = self.client.scroll(
-                collection_name=COLLECTION_NAME,
+                collection_name=self.collection_name,
                 limit=100,  # Get all points (adjust if you have more)
                 with_payload=True,
                 with_vectors=False  # We don't need the vectors
@@ -1,33 +1,22 @@
 from src.text_cleaner import clean_ocr_text
+from src.page_file import PageFile
 import sys
 from pathlib import Path
 
 def extract_first_pages(input_file: str, num_pages: int = 10) -> str:
     """Extract first N pages from the OCR text file."""
-    with open(input_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    page_file = PageFile(input_file)
+    index = page_file.index()
     
-    # Find all page markers
-    page_markers = []
-    current_pos = 0
-    for i in range(num_pages + 1):  # +1 to get the start of the next page as boundary
-        marker_start = text.find('='*40 + '\n[PÁGINA', current_pos)
-        if marker_start == -1:
-            break
-        page_markers.append(marker_start)
-        current_pos = marker_start + 1
-    
-    if len(page_markers) < 2:
-        return text
-    
-    # Extract text up to the start of page after num_pages
-    end_pos = page_markers[min(num_pages, len(page_markers)-1)]
-    extracted_text = text[:end_pos]
+    # Cut right before the marker of the first page after num_pages
+    end_pos = index[num_pages][1] if len(index) > num_pages else None
+    with open(input_file, 'rb') as f:
+        extracted = f.read(end_pos) if end_pos is not None else f.read()
     
     # Save to temporary file
     temp_file = input_file.replace('.txt', f'_first_{num_pages}pages.txt')
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        f.write(extracted_text)
+    with open(temp_file, 'wb') as f:
+        f.write(extracted)
     
     return temp_file
 
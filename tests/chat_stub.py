@@ -0,0 +1,86 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+class ChatCompletionsStub:
+    """Local stand-in for the OpenAI chat-completions endpoint.
+
+    Every request sleeps `latency` seconds and answers "Página N limpa".
+    `errors` maps a page number to the HTTP status codes returned, in order,
+    before that page succeeds (use a long list to make a page always fail).
+    """
+
+    def __init__(self, latency: float = 0.0, errors: Optional[Dict[int, List[int]]] = None):
+        self.latency = latency
+        self.errors = {page: list(codes) for page, codes in (errors or {}).items()}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, body: dict):
+        """Return (status, payload) for one request body."""
+        prompt = body["messages"][-1]["content"]
+        page = int(re.search(r"página (\d+)", prompt).group(1))
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            codes = self.errors.get(page)
+            status = codes.pop(0) if codes else 200
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+
+        if status != 200:
+            return status, {"error": {"message": f"erro simulado {status}", "type": "stub", "code": None}}
+        return 200, {
+            "id": f"stub-{page}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Página {page} limpa"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                status, payload = stub._respond(json.loads(self.rfile.read(length)))
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
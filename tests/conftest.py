@@ -0,0 +1,19 @@
+import importlib
+
+import dotenv
+import pytest
+
+@pytest.fixture
+def book_qa_module(monkeypatch):
+    """src.book_qa, imported without a .env (it requires OPENAI_API_KEY at import)."""
+    monkeypatch.setattr(dotenv, "load_dotenv", lambda *args, **kwargs: monkeypatch.setenv("OPENAI_API_KEY", "sk-test"))
+    return importlib.import_module("src.book_qa")
+
+@pytest.fixture
+def query_service_module(book_qa_module):
+    return importlib.import_module("src.query_service")
+
+@pytest.fixture
+def text_chunker_module(book_qa_module):
+    """src.text_chunker, which also requires OPENAI_API_KEY at import."""
+    return importlib.import_module("src.text_chunker")
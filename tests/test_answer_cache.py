@@ -0,0 +1,49 @@
+import time
+
+from src.answer_cache import AnswerCache, CacheScope, normalize_query
+
+SCOPE = CacheScope("gpt-4o-mini", (("principios", 1),), (4, True))
+
+def test_normalize_query():
+    assert normalize_query("  O que é a DIGNIDADE humana?? ") == "o que e a dignidade humana"
+
+def test_exact_and_semantic_hits():
+    cache = AnswerCache(threshold=0.9)
+    cache.put("O que é a dignidade?", SCOPE, "resposta", [{"page": 1}], seconds=2.0, embedding=[1.0, 0.0])
+
+    hit = cache.get("o que e a dignidade", SCOPE)
+    assert hit.answer == "resposta" and hit.match == "exato" and hit.sources == [{"page": 1}]
+
+    hit = cache.get("Que significa dignidade?", SCOPE, embedding=[0.95, 0.1])
+    assert hit.match == "semântico" and hit.similarity > 0.9
+    assert cache.get("Outra pergunta", SCOPE, embedding=[0.0, 1.0]) is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+    assert abs(stats["hit_ratio"] - 2 / 3) < 1e-9
+    assert 3.9 < stats["saved_seconds"] <= 4.0
+
+def test_scope_isolation_and_index_changes():
+    cache = AnswerCache()
+    cache.put("pergunta", SCOPE, "resposta", [], seconds=1.0)
+
+    assert cache.get("pergunta", CacheScope("gpt-4o", SCOPE.books, SCOPE.settings)) is None
+    assert cache.get("pergunta", CacheScope(SCOPE.model, (("outro", 1),), SCOPE.settings)) is None
+    assert cache.get("pergunta", SCOPE) is not None
+
+    # A new version of the book drops the old answers
+    assert cache.get("pergunta", CacheScope(SCOPE.model, (("principios", 2),), SCOPE.settings)) is None
+    assert len(cache) == 0
+
+def test_lru_and_ttl(monkeypatch):
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.put("a", SCOPE, "1", [], seconds=1.0)
+    cache.put("b", SCOPE, "2", [], seconds=1.0)
+    cache.get("a", SCOPE)
+    cache.put("c", SCOPE, "3", [], seconds=1.0)
+    assert cache.get("b", SCOPE) is None
+    assert cache.get("a", SCOPE).answer == "1"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("a", SCOPE) is None
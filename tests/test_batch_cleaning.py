@@ -0,0 +1,54 @@
+import json
+
+from src.disk_cache import DiskCache, make_key
+from src.text_cleaner import export_batch_requests, import_batch_results, build_cleaning_request
+
+def write_ocr_file(path, contents):
+    pages = [f"\n{'='*40}\n[PÁGINA {i}]\n{'='*40}\n\n{text}" for i, text in enumerate(contents, 1)]
+    path.write_text('\n\n'.join(pages), encoding='utf-8')
+
+def result_line(page_num, content=None, status_code=200):
+    if content is None:
+        return {"custom_id": f"pagina-{page_num}", "response": None,
+                "error": {"code": "server_error", "message": "falhou"}}
+    return {
+        "custom_id": f"pagina-{page_num}",
+        "response": {"status_code": status_code, "body": {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]
+        }},
+        "error": None
+    }
+
+def test_export_matches_interactive_requests(tmp_path):
+    input_file = tmp_path / "livro.txt"
+    write_ocr_file(input_file, ["texto um", "", "texto três"])
+    
+    batch_file = export_batch_requests(str(input_file), routing=False)
+    lines = [json.loads(line) for line in open(batch_file, encoding='utf-8')]
+    
+    assert [line["custom_id"] for line in lines] == ["pagina-1", "pagina-3"]
+    assert lines[0]["url"] == "/v1/chat/completions"
+    assert lines[1]["body"] == build_cleaning_request("texto três", 3)
+
+def test_import_rebuilds_pages_in_order_with_fallbacks(tmp_path):
+    input_file = tmp_path / "livro.txt"
+    write_ocr_file(input_file, ["bruto 1", "bruto 2", "", "bruto 4", "bruto 5"])
+    results_file = tmp_path / "resultados.jsonl"
+    with open(results_file, 'w', encoding='utf-8') as f:
+        # Results arrive out of order, with one failure, one missing page and a bad line
+        f.write(json.dumps(result_line(4, "limpo 4")) + '\n')
+        f.write(json.dumps(result_line(1, "limpo 1")) + '\n')
+        f.write(json.dumps(result_line(2)) + '\n')
+        f.write('{"custom_id": "pagina-5", "resp\n')
+    
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    import_batch_results(str(input_file), str(results_file), cache=cache)
+    output = (tmp_path / "livro_cleaned.txt").read_text(encoding='utf-8')
+    
+    expected = [
+        (1, "limpo 1"), (2, "bruto 2"), (3, "(Página em branco)"), (4, "limpo 4"), (5, "bruto 5")
+    ]
+    assert output == '\n'.join(
+        f"{'='*40}\n[PÁGINA {n}]\n{'='*40}\n\n{text}\n" for n, text in expected
+    )
+    assert cache.get(make_key(build_cleaning_request("bruto 1", 1))) == b"limpo 1"
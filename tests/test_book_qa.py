@@ -0,0 +1,99 @@
+import os
+
+from langchain_core.documents import Document
+
+from src.chunk_store import META_FILE, write_chunk_store
+from src.embeddings import get_embeddings
+from src.incremental_index import LEGACY_IDENTITY, MANIFEST_VERSION, save_manifest
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+    def identity(self):
+        return dict(LEGACY_IDENTITY)
+
+class FakeStore:
+    def __init__(self, path):
+        self.path = path
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        return [(Document(page_content=f"trecho de {self.path.name}", metadata={"page": 1}), 0.5)]
+
+def make_stores(tmp_path, books):
+    for book in books:
+        (tmp_path / book).mkdir()
+        write_chunk_store(str(tmp_path / book), [{"content": f"trecho de {book}", "metadata": {"page": 1}}])
+
+def counting_opener(book_qa, monkeypatch):
+    opened = []
+
+    def open_vector_store(store_path, embeddings):
+        opened.append(store_path.name)
+        return FakeStore(store_path)
+
+    monkeypatch.setattr(book_qa, "open_vector_store", open_vector_store)
+    monkeypatch.setattr(book_qa, "_shared_stores", {})
+    return opened
+
+def test_stores_open_on_first_search_and_are_shared(book_qa_module, monkeypatch, tmp_path):
+    opened = counting_opener(book_qa_module, monkeypatch)
+    make_stores(tmp_path, ["a", "b"])
+    embeddings = FakeEmbeddings()  # Shared like get_embeddings' singletons
+
+    qa = book_qa_module.BookQA(str(tmp_path), embeddings=embeddings)
+    qa.load_books(["a"])
+    assert opened == []
+    assert all(isinstance(store, book_qa_module.LazyStore) for store in qa.active_stores.values())
+
+    timings = {}
+    results = qa.search("pergunta", timings=timings)
+    assert opened == ["a"]
+    assert [r["book"] for r in results] == ["a"]
+    assert set(timings["open"]) == {"a"}
+    qa.search("outra", timings=timings)
+    assert opened == ["a"]
+    assert timings["open"] == {}
+
+    # Another BookQA reuses the process-wide handle and only opens what it adds
+    other = book_qa_module.BookQA(str(tmp_path), embeddings=embeddings)
+    other.load_books()
+    assert opened == ["a"]
+    other.search("pergunta")
+    assert sorted(opened) == ["a", "b"]
+    assert other.active_stores["a"].store is qa.active_stores["a"].store
+
+def test_shared_handle_replaced_when_index_changes(book_qa_module, monkeypatch, tmp_path):
+    opened = counting_opener(book_qa_module, monkeypatch)
+    make_stores(tmp_path, ["a"])
+    embeddings = FakeEmbeddings()
+    qa = book_qa_module.BookQA(str(tmp_path), embeddings=embeddings)
+    qa.load_books()
+    qa.search("pergunta")
+    first = qa.active_stores["a"].store
+
+    write_chunk_store(str(tmp_path / "a"), [{"content": "novo", "metadata": {"page": 1}}])
+    meta = tmp_path / "a" / META_FILE
+    later = meta.stat().st_mtime_ns + 10**9
+    os.utime(meta, ns=(later, later))
+
+    rebuilt = book_qa_module.BookQA(str(tmp_path), embeddings=embeddings)
+    rebuilt.load_books()
+    rebuilt.search("pergunta")
+    assert opened == ["a", "a"]
+    assert rebuilt.active_stores["a"].store is not first
+    assert len(book_qa_module._shared_stores) == 1
+
+def test_store_with_unknown_embeddings_is_skipped(book_qa_module, monkeypatch, tmp_path):
+    counting_opener(book_qa_module, monkeypatch)
+    make_stores(tmp_path, ["a", "antigo", "b"])
+    local = get_embeddings("local", dimensions=32)
+    for book in ("a", "b"):
+        save_manifest(str(tmp_path / book), {"version": MANIFEST_VERSION, "embedding": local.identity(), "pages": {}})
+    save_manifest(str(tmp_path / "antigo"), {"version": MANIFEST_VERSION, "embedding_model": "foo-model", "pages": {}})
+
+    qa = book_qa_module.BookQA(str(tmp_path))
+    assert qa.available_books == ["a", "antigo", "b"]
+    qa.load_books()
+    assert list(qa.active_stores) == ["a", "b"]
+    assert {r["book"] for r in qa.search("pergunta")} == {"a", "b"}
@@ -0,0 +1,33 @@
+import json
+import os
+
+from src.chunk_store import BLOB_FILE, open_chunk_store, write_chunk_store
+
+CHUNKS = [
+    {"content": "Princípio do Estado de Direito.", "metadata": {"page": 3, "book": "livro", "source": "livro.txt"}},
+    {"content": "ÉPOCA LIBERAL e Estado social.", "metadata": {"page": 3, "end_page": 4, "book": "livro", "source": "livro.txt"}},
+    {"content": "", "metadata": {"page": 5, "book": "livro", "source": "livro.txt"}},
+    {"content": "A época do Estado de Direito.", "metadata": {"page": 6, "book": "livro", "source": "livro.txt"}},
+]
+
+def test_round_trip_and_lookups(tmp_path):
+    write_chunk_store(str(tmp_path), CHUNKS)
+    store = open_chunk_store(str(tmp_path))
+
+    assert len(store) == 4
+    assert list(store) == CHUNKS
+    assert store[1] == CHUNKS[1]
+    assert store.rows_for_page(3) == [0, 1]
+    assert store.page(6) == [CHUNKS[3]]
+    assert store.page(99) == []
+    assert [bytes(view).decode('utf-8') for view in store.iter_raw()] == [c["content"] for c in CHUNKS]
+    store.close()
+
+def test_chunks_json_is_converted(tmp_path):
+    with open(tmp_path / "chunks.json", 'w', encoding='utf-8') as f:
+        json.dump(CHUNKS, f, ensure_ascii=False)
+
+    assert list(open_chunk_store(str(tmp_path))) == CHUNKS
+    converted = os.stat(tmp_path / BLOB_FILE).st_mtime_ns
+    open_chunk_store(str(tmp_path))
+    assert os.stat(tmp_path / BLOB_FILE).st_mtime_ns == converted
@@ -0,0 +1,77 @@
+from src.chunking import iter_chunks, split_sentences
+
+def count_words(text):
+    return len(text.split())
+
+def chunks_of(pages, chunk_size=12, overlap=4):
+    return list(iter_chunks(pages, "livro", "livro_cleaned.txt", chunk_size=chunk_size,
+                            overlap=overlap, count=count_words))
+
+def test_sentences_keep_offsets():
+    content = "Primeira frase aqui. Segunda frase, cf. art. 5 da lei.\n\nNovo parágrafo."
+    sentences = split_sentences(7, content, count_words)
+    assert [s.text for s in sentences] == [
+        "Primeira frase aqui.", "Segunda frase, cf. art. 5 da lei.", "Novo parágrafo."
+    ]
+    assert [s.paragraph_start for s in sentences] == [True, False, True]
+    for s in sentences:
+        assert content[s.start:s.end] == s.text
+
+def test_windows_are_sized_and_overlap():
+    text = " ".join(f"Frase número {i} do texto." for i in range(10))  # 5 words each
+    chunks = chunks_of([(3, text)], overlap=5)
+
+    assert len(chunks) > 1
+    assert all(count_words(c["content"]) <= 12 for c in chunks)
+    for before, after in zip(chunks, chunks[1:]):
+        assert before["content"].split(". ")[-1] in after["content"]
+    assert chunks[0]["metadata"]["start_char"] == 0
+    assert chunks[-1]["metadata"]["end_char"] == len(text)
+    assert {c["metadata"]["page"] for c in chunks} == {3}
+
+def test_continued_sentence_is_stitched_across_pages():
+    pages = [
+        (1, "Uma frase completa. O Estado de [continua]"),
+        (2, "12\n\n[continuação] Direito é um princípio. Outra frase."),
+        (3, "(Página em branco)"),
+    ]
+    chunks = chunks_of(pages, chunk_size=50)
+
+    assert [c["content"] for c in chunks] == [
+        "Uma frase completa. O Estado de Direito é um princípio.",
+        "Outra frase.",
+    ]
+    first = chunks[0]["metadata"]
+    assert (first["page"], first["end_page"]) == (1, 2)
+    assert pages[1][1][:first["end_char"]].endswith("princípio.")
+
+def test_long_sentences_are_cut_with_their_own_offsets():
+    words = [f"palavra{i}" for i in range(30)]
+    pages = {
+        4: "Curta.\n\n" + " ".join(words[:20]) + " [continua]",
+        5: "[continuação] " + " ".join(words[20:]) + ". Fim.",
+    }
+    chunks = chunks_of(list(pages.items()), chunk_size=8, overlap=0)
+
+    assert all(count_words(c["content"]) <= 8 for c in chunks)
+    assert " ".join(c["content"] for c in chunks).split() == ["Curta."] + words[:-1] + ["palavra29.", "Fim."]
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        content = chunk["content"].split()
+        assert pages[meta["page"]][meta["start_char"]:].startswith(content[0])
+        assert pages[meta["end_page"]][:meta["end_char"]].endswith(content[-1])
+    # Parts of the stitched sentence no longer share the sentence's start offset
+    assert len({(c["metadata"]["page"], c["metadata"]["start_char"]) for c in chunks}) == len(chunks)
+    assert any(c["metadata"]["page"] == 4 and c["metadata"]["end_page"] == 5 for c in chunks)
+
+def test_long_sentence_parts_are_recut_until_they_fit():
+    # Uneven words: the per-word estimate undershoots, so some windows need a second cut
+    def count_chars(text):
+        return len(text) // 4 + 1
+    text = " ".join(("a" if i % 3 else "constitucionalmente") for i in range(120))
+    chunks = list(iter_chunks([(1, text)], "livro", "livro_cleaned.txt", chunk_size=20,
+                              overlap=0, count=count_chars))
+    assert all(count_chars(c["content"]) <= 20 for c in chunks)
+    assert " ".join(c["content"] for c in chunks) == text
+    for c in chunks:
+        assert text[c["metadata"]["start_char"]:c["metadata"]["end_char"]] == c["content"]
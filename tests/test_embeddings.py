@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.disk_cache import DiskCache
+from src.embeddings import CachedEmbeddings, get_embeddings
+from src.incremental_index import store_identity, update_book_store
+
+class FakeEmbeddingsAPI:
+    """Stands in for client.embeddings, recording every request's inputs."""
+
+    def __init__(self):
+        self.requests = []
+
+    def create(self, model, input, **kwargs):
+        self.requests.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=[float(len(text)), 0.5]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=data)
+
+def make_embeddings(tmp_path):
+    api = FakeEmbeddingsAPI()
+    embeddings = CachedEmbeddings(client=SimpleNamespace(embeddings=api),
+                                  cache=DiskCache(tmp_path / "embeddings.sqlite"), lru_size=2)
+    return embeddings, api
+
+def test_documents_are_embedded_once(tmp_path):
+    embeddings, api = make_embeddings(tmp_path)
+    first = embeddings.embed_documents(["um texto", "outro texto", "um  texto"])
+
+    # Whitespace variants share a cache key and are only sent once
+    assert api.requests == [["um texto", "outro texto"]]
+    assert first[0] == first[2]
+
+    second = embeddings.embed_documents(["outro texto", "um texto", "novo"])
+    assert api.requests[1:] == [["novo"]]
+    assert second[:2] == [first[1], first[0]]
+
+def test_cache_persists_across_instances(tmp_path):
+    embeddings, _ = make_embeddings(tmp_path)
+    embeddings.embed_documents(["página um", "página dois"])
+    embeddings.cache.close()
+
+    embeddings, api = make_embeddings(tmp_path)
+    assert embeddings.embed_query("página um") == [9.0, 0.5]
+    assert api.requests == []
+
+def test_queries_use_memory_lru(tmp_path):
+    embeddings, api = make_embeddings(tmp_path)
+    for query in ["dignidade", "dignidade", "liberdade", "dignidade"]:
+        embeddings.embed_query(query)
+    assert api.requests == [["dignidade"], ["liberdade"]]
+    assert embeddings.cache.hits == 0
+
+    embeddings.embed_query("igualdade")  # Pushes "liberdade" out of the LRU, not out of the disk cache
+    embeddings.embed_query("liberdade")
+    assert len(api.requests) == 3
+    assert embeddings.cache.hits == 1
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, tokens=0):
+        self.acquired.append(tokens)
+
+def test_requests_are_paced_by_shared_limiter(tmp_path):
+    embeddings, api = make_embeddings(tmp_path)
+    embeddings.limiter = RecordingLimiter()
+    embeddings.embed_documents(["a" * 30, "b" * 30])
+    embeddings.embed_documents(["a" * 30])
+
+    assert len(api.requests) == 1
+    assert embeddings.limiter.acquired == [22]
+
+def test_cache_is_trimmed_every_few_inserts(tmp_path, monkeypatch):
+    embeddings, _ = make_embeddings(tmp_path)
+    embeddings.evict_every = 4
+    evictions = []
+    monkeypatch.setattr(embeddings.cache, "evict", lambda: evictions.append(1) or 0)
+
+    embeddings.embed_query("primeira")
+    embeddings.embed_query("segunda")
+    embeddings.embed_documents(["segunda", "terceira"])
+    assert evictions == []
+    embeddings.embed_documents(["quarta", "quinta", "sexta"])
+    assert evictions == [1]
+
+def test_local_embeddings_are_deterministic_and_lexical():
+    local = get_embeddings("local", dimensions=256)
+    assert local is get_embeddings("local", dimensions=256)
+    assert local.identity() == {"provider": "local", "model": "hashed-ngram-v1", "dimensions": 256}
+
+    query, related, unrelated = (np.array(v) for v in local.embed_documents([
+        "dignidade da pessoa humana", "A Dignidade da Pessoa Humana", "orçamento municipal"
+    ]))
+    assert len(query) == 256
+    assert np.isclose(np.linalg.norm(query), 1.0)
+    assert local.embed_query("dignidade da pessoa humana") == query.tolist()
+    assert query @ related > 0.9
+    assert query @ unrelated < 0.5
+
+def test_store_records_its_embeddings(tmp_path):
+    local = get_embeddings("local", dimensions=64)
+    chunks = [{"content": "texto", "metadata": {"page": 1, "book": "livro", "source": "livro.txt"}}]
+    update_book_store(chunks, str(tmp_path), "livro", local)
+
+    assert store_identity(str(tmp_path)) == local.identity()
+    assert store_identity(str(tmp_path)) != get_embeddings("local", dimensions=32).identity()
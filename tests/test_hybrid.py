@@ -0,0 +1,34 @@
+from src.hybrid import LEXICAL, VECTOR, reciprocal_rank_fusion
+
+def result(book, page, start, score):
+    return {"content": f"{book} {page} {start}", "metadata": {"page": page, "start_char": start},
+            "book": book, "score": score}
+
+def test_fusion_rewards_agreement_and_records_provenance():
+    lexical = [result("a", 1, 0, -5.0), result("a", 2, 0, -3.0)]
+    vector = [result("a", 2, 0, 0.4), result("b", 1, 0, 0.5), result("a", 3, 0, 0.6)]
+
+    fused = reciprocal_rank_fusion({LEXICAL: lexical, VECTOR: vector}, k=10, rrf_k=60)
+
+    assert [(r["book"], r["metadata"]["page"]) for r in fused][:1] == [("a", 2)]
+    top = fused[0]
+    assert top["match_tipo"] == "híbrido"
+    assert top["retrievers"] == {LEXICAL: {"rank": 2, "score": -3.0}, VECTOR: {"rank": 1, "score": 0.4}}
+    assert {r["match_tipo"] for r in fused[1:]} == {"exato", "vetorial"}
+    assert all(0 < r["score"] <= 1 for r in fused)
+    assert [r["score"] for r in fused] == sorted((r["score"] for r in fused), reverse=True)
+
+def test_fusion_dedupes_by_book_and_chunk():
+    # Same page in two books and two chunks of one page stay apart; a repeated chunk does not
+    lexical = [result("a", 1, 0, -2.0), result("a", 1, 0, -1.0), result("a", 1, 500, -1.0), result("b", 1, 0, -1.0)]
+
+    fused = reciprocal_rank_fusion({LEXICAL: lexical, VECTOR: []}, k=10)
+
+    assert len(fused) == 3
+    assert fused[0]["retrievers"][LEXICAL] == {"rank": 1, "score": -2.0}
+    assert fused[2]["retrievers"][LEXICAL]["rank"] == 3
+
+def test_fusion_scores_first_everywhere_as_one():
+    both = [result("a", 1, 0, 0.1)]
+    fused = reciprocal_rank_fusion({LEXICAL: both, VECTOR: both}, k=1)
+    assert fused[0]["score"] == 1.0
@@ -0,0 +1,37 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from src.image_preprocessing import preprocess, estimate_skew, binarize_otsu, binarize_adaptive, crop_borders
+
+def text_page(background=235):
+    image = Image.new('L', (1200, 1600), background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=28)
+    for i in range(30):
+        draw.text((100, 100 + i * 45), f"O princípio da dignidade da pessoa humana {i}", fill=30, font=font)
+    return image
+
+def test_deskew_straightens_rotated_page():
+    rotated = text_page().rotate(3, fillcolor=235, resample=Image.BILINEAR)
+    assert estimate_skew(binarize_otsu(np.asarray(rotated))) == -3.0
+    
+    output = preprocess(rotated)
+    assert output.mode == '1'
+    assert abs(estimate_skew(~np.asarray(output))) < 0.5
+
+def test_crop_ignores_scanner_borders():
+    page = np.asarray(text_page()).copy()
+    page[:, :40] = 0
+    page[:30, :] = 0
+    rows, cols = crop_borders(binarize_otsu(page))
+    assert rows.start > 30 and cols.start > 40
+    assert rows.stop < 1600 and cols.stop < 1200
+
+def test_adaptive_threshold_handles_uneven_lighting():
+    page = np.asarray(text_page()).astype(np.int64)
+    # Darken the right half so a single global threshold no longer separates ink from paper
+    page[:, 600:] -= 120
+    page = np.clip(page, 0, 255).astype(np.uint8)
+    ink = binarize_adaptive(page)
+    assert ink[:, 600:].mean() < 0.2
+    assert ink[:, 600:].mean() > 0.005
@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+import numpy as np
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.incremental_index import (
+    CATALOG_FILE, LEGACY_IDENTITY, catalog_entry, MANIFEST_FILE, load_catalog, load_manifest, store_identity,
+    update_book_store, update_catalog
+)
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic 8-dimensional embeddings that count every embedded text."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        return [b / 255 + 0.01 for b in hashlib.sha256(text.encode('utf-8')).digest()[:8]]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+    def identity(self):
+        return {"provider": "teste", "model": "contador", "dimensions": 8}
+
+def make_chunks(pages):
+    return [{"content": text, "metadata": {"page": page, "book": "livro", "source": "livro_cleaned.txt"}}
+            for page, text in pages.items()]
+
+def stored_documents(store_dir, embeddings):
+    store = Chroma(persist_directory=str(store_dir), embedding_function=embeddings)
+    return dict(zip(*[store.get()[key] for key in ("ids", "documents")]))
+
+def test_only_changed_pages_are_reindexed(tmp_path):
+    embeddings = CountingEmbeddings()
+    pages = {1: "primeira página", 2: "segunda página", 3: "terceira página"}
+    stats = update_book_store(make_chunks(pages), str(tmp_path), "livro", embeddings)
+    assert stats.rebuilt and stats.added == 3
+    assert len(embeddings.embedded) == 3
+
+    embeddings.embedded.clear()
+    pages[2] = "segunda página corrigida"
+    del pages[3]
+    pages[4] = "quarta página"
+    stats = update_book_store(make_chunks(pages), str(tmp_path), "livro", embeddings)
+
+    assert (stats.added, stats.changed, stats.removed, stats.unchanged) == (1, 1, 1, 1)
+    assert sorted(embeddings.embedded) == ["quarta página", "segunda página corrigida"]
+    assert stored_documents(tmp_path, embeddings) == {
+        "livro:1:0": "primeira página",
+        "livro:2:0": "segunda página corrigida",
+        "livro:4:0": "quarta página",
+    }
+    assert set(load_manifest(str(tmp_path))["pages"]) == {"1", "2", "4"}
+
+    # Exported vectors follow chunk order
+    vectors = np.load(tmp_path / "vectors.npy")
+    expected = np.array([embeddings.embed_query(text) for text in pages.values()])
+    assert np.allclose(vectors, expected / np.linalg.norm(expected, axis=1, keepdims=True))
+
+def test_store_without_manifest_is_rebuilt(tmp_path):
+    embeddings = CountingEmbeddings()
+    update_book_store(make_chunks({1: "texto"}), str(tmp_path), "livro", embeddings)
+    (tmp_path / "manifest.json").unlink()
+
+    stats = update_book_store(make_chunks({1: "texto", 2: "mais texto"}), str(tmp_path), "livro", embeddings)
+    assert stats.rebuilt
+    assert set(stored_documents(tmp_path, embeddings)) == {"livro:1:0", "livro:2:0"}
+
+def test_catalog_lists_indexed_books(tmp_path):
+    embeddings = CountingEmbeddings()
+    (tmp_path / "legado").mkdir()
+    (tmp_path / "legado" / "chunks.json").write_text("[]", encoding='utf-8')
+    (tmp_path / "vazio").mkdir()
+
+    # Without catalog.json the store directories are scanned
+    assert set(load_catalog(str(tmp_path))) == {"legado"}
+
+    update_book_store(make_chunks({1: "primeira página"}), str(tmp_path / "livro"), "livro", embeddings)
+    assert (tmp_path / CATALOG_FILE).exists()
+    catalog = load_catalog(str(tmp_path))
+    assert set(catalog) == {"legado", "livro"}
+    assert catalog["livro"] == {"embedding": embeddings.identity(), "vectors": True}
+    assert catalog["legado"]["vectors"] is False
+    assert catalog["legado"] == catalog_entry(str(tmp_path / "legado"))
+
+def test_catalog_picks_up_stores_it_does_not_list(tmp_path):
+    for book in ("a", "b", "c"):
+        (tmp_path / book).mkdir()
+        (tmp_path / book / "chunks.json").write_text("[]", encoding='utf-8')
+        if book != "b":
+            # b is copied in without going through update_catalog
+            update_catalog(str(tmp_path), book)
+
+    assert set(load_catalog(str(tmp_path))) == {"a", "b", "c"}
+    update_catalog(str(tmp_path), "c")
+    assert '"b"' in (tmp_path / CATALOG_FILE).read_text(encoding='utf-8')
+
+    (tmp_path / "a" / "chunks.json").unlink()
+    (tmp_path / "a").rmdir()
+    assert set(load_catalog(str(tmp_path))) == {"b", "c"}
+
+def test_manifest_naming_only_the_model_is_still_read(tmp_path):
+    manifest = {"version": 1, "embedding_model": "text-embedding-3-small", "pages": {}}
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding='utf-8')
+    assert store_identity(str(tmp_path)) == LEGACY_IDENTITY
+
+    manifest["embedding_model"] = "CountingEmbeddings"
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest), encoding='utf-8')
+    assert store_identity(str(tmp_path))["model"] == "CountingEmbeddings"
+    assert catalog_entry(str(tmp_path))["embedding"]["provider"] == "desconhecido"
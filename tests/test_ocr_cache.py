@@ -0,0 +1,70 @@
+from src import pdf_processor
+from src.ocr_cache import OCRCache
+
+def upper(text):
+    return text.upper()
+
+def lower(text):
+    return text.lower()
+
+def make_pdf(tmp_path, content=b"%PDF-1.4 livro"):
+    path = tmp_path / "livro.pdf"
+    path.write_bytes(content)
+    return str(path)
+
+def test_raw_text_keyed_by_pdf_and_settings(tmp_path):
+    pdf = make_pdf(tmp_path)
+    cache = OCRCache(pdf, "dpi=300|lang=por", upper, cache_dir=tmp_path / "cache")
+    assert not cache.has_raw(1) and cache.get_raw(1) is None
+    cache.put_raw(1, "página um")
+    assert cache.has_raw(1) and cache.get_raw(1) == "página um"
+    assert cache.raw_hits == 1
+
+    # Same PDF and settings share entries; other settings or content do not
+    assert OCRCache(pdf, "dpi=300|lang=por", lower, cache_dir=tmp_path / "cache").has_raw(1)
+    assert not OCRCache(pdf, "dpi=200|lang=por", upper, cache_dir=tmp_path / "cache").has_raw(1)
+    other = make_pdf(tmp_path / "cache", b"%PDF-1.4 outro livro")
+    assert not OCRCache(other, "dpi=300|lang=por", upper, cache_dir=tmp_path / "cache").has_raw(1)
+
+def test_clean_text_keyed_by_raw_text_and_cleaner(tmp_path):
+    pdf = make_pdf(tmp_path)
+    calls = []
+    def cleaner(text):
+        calls.append(text)
+        return text.upper()
+
+    cache = OCRCache(pdf, "dpi=300", cleaner, cache_dir=tmp_path / "cache")
+    assert cache.clean("abc") == "ABC"
+    assert cache.clean("abc") == "ABC"
+    assert cache.clean("def") == "DEF"
+    assert calls == ["abc", "def"] and cache.clean_hits == 1
+
+    # A different cleaner gets its own entries
+    assert OCRCache(pdf, "dpi=300", lower, cache_dir=tmp_path / "cache").clean("ABC") == "abc"
+
+def test_resume_only_ocrs_missing_pages(tmp_path, monkeypatch):
+    pdf = make_pdf(tmp_path)
+    cache = OCRCache(pdf, "dpi=300", upper, cache_dir=tmp_path / "cache")
+    cache.put_raw(2, "dois")
+    cache.put_raw(4, "quatro")
+
+    requested = []
+    def fake_ocr(pdf_path, page_numbers, workers, window):
+        requested.append(list(page_numbers))
+        for page_num in page_numbers:
+            yield page_num, f"ocr {page_num}"
+    monkeypatch.setattr(pdf_processor, "iter_ocr_pages", fake_ocr)
+
+    pages = list(pdf_processor.iter_cached_ocr_pages(pdf, [1, 2, 3, 4, 5], cache))
+    assert requested == [[1, 3, 5]]
+    assert pages == [(1, "OCR 1"), (2, "DOIS"), (3, "OCR 3"), (4, "QUATRO"), (5, "OCR 5")]
+    # Fresh pages were stored, so a second run OCRs nothing
+    assert list(pdf_processor.iter_cached_ocr_pages(pdf, [1, 2, 3, 4, 5], cache)) == pages
+    assert requested[-1] == []
+
+def test_clean_key_covers_the_cleaner_helpers(tmp_path):
+    pdf = make_pdf(tmp_path)
+    plain = OCRCache(pdf, "dpi=300", upper, cache_dir=tmp_path / "cache")
+    with_lower = OCRCache(pdf, "dpi=300", upper, cache_dir=tmp_path / "cache", helpers=(lower,))
+    with_upper = OCRCache(pdf, "dpi=300", upper, cache_dir=tmp_path / "cache", helpers=(upper,))
+    assert len({plain.clean_dir, with_lower.clean_dir, with_upper.clean_dir}) == 3
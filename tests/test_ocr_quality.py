@@ -0,0 +1,53 @@
+from openai import OpenAI
+
+from src.disk_cache import DiskCache
+from src.ocr_quality import ROUTE_CLEAN, ROUTE_LIGHT, ROUTE_LLM, score_page, light_fix, is_garbage_line
+from src.text_cleaner import clean_ocr_text
+from chat_stub import ChatCompletionsStub
+
+CLEAN_PAGE = """O Estado de Direito é um tipo histórico de Estado que se afirma com o liberalismo.
+
+A dignidade da pessoa humana é o fundamento de todos os direitos consagrados na Constituição de 1976 (artigo 1.º)."""
+
+LIGHT_PAGE = """Os princípios constitucionais estruturantes da República Portuguesa
+i ora I lums / é 2ê)
+
+""" + CLEAN_PAGE + """
+rrenan, em ão) ami BB) SM) 38) EL GH)"""
+
+GARBLED_PAGE = """Ma Eres mp Mt rm
+mal Sl BE) BS EL, em Om Um um!
+Lu (a Lo EL do D+ 170
+as ju SC nu
+A vo Bá"""
+
+def test_garbage_lines():
+    assert is_garbage_line("i ora I lums / é 2ê)")
+    assert is_garbage_line("rrenan, em ão) ami BB) SM) 38) EL GH)")
+    assert is_garbage_line("porre ementa ombros tr mam")
+    assert not is_garbage_line("2. A dignitas ou a(s) dignidade(s) contingente(s)")
+    assert not is_garbage_line("Acórdão n.º 509/02, Proc. n.º 768/02, Plenário")
+
+def test_routes():
+    assert score_page(CLEAN_PAGE).route == ROUTE_CLEAN
+    assert score_page(LIGHT_PAGE).route == ROUTE_LIGHT
+    assert score_page(GARBLED_PAGE).route == ROUTE_LLM
+
+def test_light_fix_removes_header_and_noise():
+    assert light_fix(LIGHT_PAGE) == CLEAN_PAGE
+
+def test_only_garbled_pages_reach_the_model(tmp_path):
+    contents = [CLEAN_PAGE, LIGHT_PAGE, GARBLED_PAGE]
+    pages = [f"\n{'='*40}\n[PÁGINA {i}]\n{'='*40}\n\n{text}" for i, text in enumerate(contents, 1)]
+    input_file = tmp_path / "livro.txt"
+    input_file.write_text('\n\n'.join(pages), encoding='utf-8')
+    
+    with ChatCompletionsStub() as stub:
+        client = OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+        clean_ocr_text(str(input_file), client=client, cache=DiskCache(tmp_path / "cache.sqlite"))
+    output = (tmp_path / "livro_cleaned.txt").read_text(encoding='utf-8')
+    
+    assert stub.requests == 1
+    assert output.count(CLEAN_PAGE) == 2
+    assert "Página 3 limpa" in output
+    assert "lums" not in output
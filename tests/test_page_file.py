@@ -0,0 +1,42 @@
+import re
+
+from src.page_file import PageFile, iter_pages
+
+PAGE_PATTERN = r"={40}\n\[PÁGINA (\d+)\]\n={40}\n(.*?)(?=\n={40}|\Z)"
+
+def regex_pages(text):
+    return [(int(num), content.strip()) for num, content in re.findall(PAGE_PATTERN, text, re.DOTALL)]
+
+def sample_text():
+    ocr = '\n\n'.join(f"\n{'='*40}\n[PÁGINA {i}]\n{'='*40}\n\nTexto da página {i}.\nSegunda linha ç ã." for i in range(1, 6))
+    cleaned = '\n'.join(f"{'='*40}\n[PÁGINA {i}]\n{'='*40}\n\nLimpa {i}\n" for i in range(6, 9))
+    # A stray rule line ends a page, and text after it is not part of any page
+    return ocr + '\n' + cleaned + '=' * 45 + '\nperdido\n' + f"{'='*40}\n[PÁGINA 9]\n{'='*40}\nfim"
+
+def test_matches_legacy_regex(tmp_path):
+    path = tmp_path / "livro.txt"
+    text = sample_text()
+    path.write_text(text, encoding='utf-8')
+    
+    assert list(iter_pages(str(path))) == regex_pages(text)
+    assert (tmp_path / "livro.txt.pageidx").exists()
+    # Second read goes through the index
+    assert list(iter_pages(str(path))) == regex_pages(text)
+
+def test_random_access(tmp_path):
+    path = tmp_path / "livro.txt"
+    path.write_text(sample_text(), encoding='utf-8')
+    page_file = PageFile(str(path))
+    
+    assert page_file.read_page(7) == "Limpa 7"
+    assert page_file.read_pages(2, 3) == [(2, "Texto da página 2.\nSegunda linha ç ã."),
+                                           (3, "Texto da página 3.\nSegunda linha ç ã.")]
+    assert page_file.page_numbers() == list(range(1, 10))
+
+def test_index_rebuilt_when_file_changes(tmp_path):
+    path = tmp_path / "livro.txt"
+    path.write_text(sample_text(), encoding='utf-8')
+    list(iter_pages(str(path)))
+    
+    path.write_text(f"{'='*40}\n[PÁGINA 1]\n{'='*40}\n\nnovo conteúdo mais longo", encoding='utf-8')
+    assert list(iter_pages(str(path))) == [(1, "novo conteúdo mais longo")]
@@ -0,0 +1,87 @@
+import functools
+from types import SimpleNamespace
+
+import pytest
+
+from src import pdf_processor
+from src.config import TEXT_LAYER_MIN_QUALITY
+from src.ocr_cache import OCRCache
+from src.pdf_processor import _page_windows, text_layer_quality
+
+def test_page_windows_bounds():
+    assert list(_page_windows([], 4)) == []
+    assert list(_page_windows(range(1, 11), 4)) == [(1, 4), (5, 8), (9, 10)]
+    assert list(_page_windows(range(1, 5), 4)) == [(1, 4)]
+    assert list(_page_windows([1, 2, 3, 7, 8, 12], 10)) == [(1, 3), (7, 8), (12, 12)]
+    assert list(_page_windows([5, 6, 7], 1)) == [(5, 5), (6, 6), (7, 7)]
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_page_windows_cover_every_page_once(size):
+    pages = [1, 2, 3, 4, 6, 7, 9, 10, 11, 12, 13]
+    windows = list(_page_windows(pages, size))
+    assert all(last - first < size for first, last in windows)
+    assert [p for first, last in windows for p in range(first, last + 1)] == pages
+
+PROSE = ("A dignidade da pessoa humana é o fundamento da República Portuguesa, "
+         "consagrado no artigo 1.º da Constituição de 1976, e orienta a interpretação "
+         "de todos os direitos fundamentais.")
+
+def test_text_layer_quality():
+    assert text_layer_quality(PROSE) == 1.0
+    assert text_layer_quality("") == 0.0
+    assert text_layer_quality("Capítulo 1") == 0.0
+    assert text_layer_quality(PROSE + " (cid:12)") == 0.0
+    assert text_layer_quality(PROSE + " �") == 0.0
+    garbled = " ".join(["#$%", "@@1a", "~~~"] * 20)
+    assert text_layer_quality(garbled) < TEXT_LAYER_MIN_QUALITY
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        if isinstance(self.text, Exception):
+            raise self.text
+        return self.text
+
+def test_classify_pages_routes_image_pages_to_ocr(monkeypatch):
+    texts = [PROSE, "", None, "(cid:3)(cid:4) " * 20, ValueError("fonte"), PROSE]
+    monkeypatch.setattr(pdf_processor, "PdfReader",
+                        lambda path: SimpleNamespace(pages=[FakePage(text) for text in texts]))
+    assert pdf_processor.classify_pages("livro.pdf") == [PROSE, None, None, None, None, PROSE]
+    assert pdf_processor.needs_ocr("livro.pdf")
+
+    texts = [PROSE]
+    assert not pdf_processor.needs_ocr("livro.pdf")
+
+def test_iter_pdf_pages_merges_text_layer_and_ocr_in_page_order(tmp_path, monkeypatch):
+    pdf = tmp_path / "livro.pdf"
+    pdf.write_bytes(b"%PDF-1.4 livro")
+    pages = [None, "texto da página 2", None, None, "texto da página 5"]
+    requested = []
+    def fake_ocr(pdf_path, page_numbers, workers, window):
+        requested.append(list(page_numbers))
+        for page_num in page_numbers:
+            yield page_num, f"ocr da página {page_num}"
+    monkeypatch.setattr(pdf_processor, "classify_pages", lambda path: pages)
+    monkeypatch.setattr(pdf_processor, "ocr_settings", lambda: "dpi=300")
+    monkeypatch.setattr(pdf_processor, "OCRCache", functools.partial(OCRCache, cache_dir=tmp_path / "cache"))
+    monkeypatch.setattr(pdf_processor, "iter_ocr_pages", fake_ocr)
+
+    result = list(pdf_processor.iter_pdf_pages(str(pdf)))
+    assert requested == [[1, 3, 4]]
+    assert [page_num for page_num, _ in result] == [1, 2, 3, 4, 5]
+    assert ["ocr" in text for _, text in result] == [True, False, True, True, False]
+    assert "texto da página 5" in result[4][1]
+
+    # Without OCR the image pages are kept empty and nothing is rasterized
+    assert [text for _, text in pdf_processor.iter_pdf_pages(str(pdf), ocr=False)] == [
+        "", "texto da página 2", "", "", "texto da página 5"]
+    assert requested == [[1, 3, 4]]
+
+def test_process_pdf_reuses_a_given_classification(monkeypatch):
+    def classify(path):
+        raise AssertionError("classify_pages ran again")
+    monkeypatch.setattr(pdf_processor, "classify_pages", classify)
+    texts = pdf_processor.process_pdf("livro.pdf", needs_ocr=False, pages=[PROSE, PROSE])
+    assert len(texts) == 2 and "[PÁGINA 2]" in texts[1] and "dignidade" in texts[1]
@@ -0,0 +1,67 @@
+import socket
+import threading
+
+import pytest
+
+import query_book
+
+def serve_once(reply: bytes):
+    """Listen on a free port and answer one connection with reply; returns the port."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def answer():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        if reply:
+            conn.sendall(reply)
+        conn.close()
+        server.close()
+
+    threading.Thread(target=answer, daemon=True).start()
+    return server.getsockname()[1]
+
+@pytest.mark.parametrize("reply", [
+    b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\n\r\nhello",  # Another service on the port
+    b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n[]",
+    b"SSH-2.0-OpenSSH\r\n",
+    b"",  # Connection closed without a reply
+])
+def test_bad_daemon_replies_fall_back(monkeypatch, capsys, reply):
+    monkeypatch.setattr(query_book, "QUERY_DAEMON_PORT", serve_once(reply))
+    assert query_book.query_daemon("pergunta", None, timeout=5) is None
+    assert "consultando neste processo" in capsys.readouterr().out
+
+def test_no_daemon_falls_back_quietly(monkeypatch, capsys):
+    unused = socket.socket()
+    unused.bind(("127.0.0.1", 0))
+    port = unused.getsockname()[1]
+    unused.close()  # Nothing listens on the port any more
+    monkeypatch.setattr(query_book, "QUERY_DAEMON_PORT", port)
+    assert query_book.query_daemon("pergunta", None, timeout=5) is None
+    assert capsys.readouterr().out == ""
+
+def test_timeout_falls_back(monkeypatch):
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()  # Accepts the connection but never answers
+    monkeypatch.setattr(query_book, "QUERY_DAEMON_PORT", server.getsockname()[1])
+    try:
+        assert query_book.query_daemon("pergunta", None, timeout=0.2) is None
+    finally:
+        server.close()
+
+def test_port_option_reaches_the_daemon(monkeypatch):
+    port = serve_once(b'HTTP/1.1 200 OK\r\nContent-Length: 13\r\n\r\n{"answer": 1}')
+    assert query_book.query_daemon("pergunta", None, timeout=5, port=port) == {"answer": 1}
+
+    ports = []
+    def query_daemon(query, books, port=None):
+        ports.append((query, books, port))
+        raise SystemExit
+    monkeypatch.setattr(query_book, "query_daemon", query_daemon)
+    monkeypatch.setattr(query_book.sys, "argv", ["query_book.py", "--porta", "9001", "--livro", "a", "dignidade"])
+    with pytest.raises(SystemExit):
+        query_book.main()
+    assert ports == [("dignidade", ["a"], 9001)]
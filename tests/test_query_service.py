@@ -0,0 +1,150 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b''
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class FakeService:
+    def __init__(self, error=None):
+        self.error = error
+        self.queries = []
+
+    def available_books(self):
+        return ["principios", "dignidade"]
+
+    def status(self):
+        return {"status": "ok"}
+
+    def query(self, query, books, k):
+        if self.error:
+            raise self.error
+        self.queries.append((query, books, k))
+        return {"answer": f"resposta: {query}"}
+
+def serve_request(module, service, raw: bytes):
+    """Run handle_connection on one raw request; returns (status, payload)."""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        writer = FakeWriter()
+        await module.handle_connection(service, reader, writer)
+        assert writer.closed
+        return writer.data
+
+    head, _, body = asyncio.run(run()).partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+def post(payload) -> bytes:
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+    return b"POST /query HTTP/1.1\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+
+def test_read_request(query_service_module):
+    async def run(raw):
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await query_service_module._read_request(reader)
+
+    assert asyncio.run(run(post({"query": "x"}))) == ("POST", "/query", b'{"query": "x"}')
+    assert asyncio.run(run(b"GET /status HTTP/1.1\r\nHost: a\r\n\r\n")) == ("GET", "/status", b'')
+    with pytest.raises(ValueError):
+        asyncio.run(run(b"\r\n"))
+
+def test_status_codes(query_service_module):
+    service = FakeService()
+    assert serve_request(query_service_module, service, b"GET /status HTTP/1.1\r\n\r\n") == (200, {"status": "ok"})
+    assert serve_request(query_service_module, service, b"GET /outra HTTP/1.1\r\n\r\n")[0] == 404
+
+    status, payload = serve_request(query_service_module, service, post({"query": "dignidade", "books": ["principios"]}))
+    assert (status, payload) == (200, {"answer": "resposta: dignidade"})
+    assert service.queries == [("dignidade", ["principios"], 4)]
+
+    status, payload = serve_request(query_service_module, FakeService(RuntimeError("falhou")), post({"query": "x"}))
+    assert status == 500 and "falhou" in payload["erro"]
+
+    # A ValueError while answering is the server's fault, not a bad request
+    status, payload = serve_request(query_service_module, FakeService(ValueError("provedor")), post({"query": "x"}))
+    assert status == 500 and "provedor" in payload["erro"]
+
+@pytest.mark.parametrize("request_body", [
+    b"{nao e json",
+    {"books": ["principios"]},
+    {"query": "   "},
+    {"query": "x", "books": "abc"},
+    {"query": "x", "books": [1]},
+    {"query": "x", "books": ["inexistente"]},
+    {"query": "x", "k": "quatro"},
+    {"query": "x", "k": [4]},
+    {"query": "x", "k": 0},
+])
+def test_bad_requests(query_service_module, request_body):
+    service = FakeService()
+    status, payload = serve_request(query_service_module, service, post(request_body))
+    assert status == 400 and payload["erro"]
+    assert service.queries == []
+
+def test_incomplete_body(query_service_module):
+    raw = b"POST /query HTTP/1.1\r\nContent-Length: 100\r\n\r\n{}"
+    assert serve_request(query_service_module, FakeService(), raw)[0] == 400
+
+class FakeBookQA:
+    created = []
+
+    def __init__(self, stores_dir):
+        self.active_stores = {}
+        FakeBookQA.created.append(self)
+
+    def load_books(self, books):
+        self.active_stores = {book: object() for book in (books or ["principios", "dignidade"]) if book != "vazio"}
+
+    def hybrid_search(self, query, k, timings):
+        timings["embed"] = 0.0
+        return [{"content": f"trecho de {book}", "metadata": {"page": 1}, "book": book} for book in self.active_stores]
+
+def fake_client(answers):
+    def create(model, messages, temperature):
+        answers.append(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="resposta"))])
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def test_service_reuses_one_book_qa_per_book_set(query_service_module, monkeypatch):
+    prompts = []
+    FakeBookQA.created = []
+    monkeypatch.setattr(query_service_module, "BookQA", FakeBookQA)
+    monkeypatch.setattr(query_service_module, "openai_client", fake_client(prompts))
+    monkeypatch.setattr(query_service_module, "count_tokens", lambda text, model=None: len(text.split()))
+    service = query_service_module.QueryService()
+
+    result = service.query("pergunta", ["principios"])
+    assert result["answer"] == "resposta"
+    assert [r["book"] for r in result["results"]] == ["principios"]
+    assert "trecho de principios" in prompts[0]
+    assert set(result["timings"]) >= {"embed", "retrieval", "llm", "total"}
+
+    service.query("outra", ["principios"])
+    service.query("outra", None)
+    service.query("outra", ["dignidade", "principios"])
+    service.query("outra", ["principios", "dignidade"])
+    assert len(FakeBookQA.created) == 3
+    assert service.status()["requests"] == 5
+
+    # A BookQA with no books loaded is not kept
+    service.query("outra", ["vazio"])
+    service.query("outra", ["vazio"])
+    assert len(FakeBookQA.created) == 5
+    assert len(service._qas) == 3
@@ -0,0 +1,30 @@
+import pytest
+
+from src.chunk_store import open_chunk_store
+from src.embeddings import HashedNgramEmbeddings
+from src.vector_index import CompactBookStore
+
+class FailingEmbeddings(HashedNgramEmbeddings):
+    def embed_documents(self, texts):
+        raise RuntimeError("falha simulada")
+
+def write_book(path, pages):
+    path.write_text("\n\n".join(f"{'=' * 40}\n[PÁGINA {i}]\n{'=' * 40}\n\n{text}"
+                                for i, text in enumerate(pages, 1)), encoding='utf-8')
+
+def test_failed_embedding_keeps_chunks_and_vectors_in_step(text_chunker_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(text_chunker_module, "count_tokens", lambda text: len(text.split()))
+    book = tmp_path / "livro_cleaned.txt"
+    write_book(book, ["A dignidade da pessoa humana.", "O Estado de Direito."])
+    summary = text_chunker_module.process_book(str(book), str(tmp_path / "stores"), log=lambda message: None,
+                                               embeddings=HashedNgramEmbeddings(32))
+    store_dir = tmp_path / "stores" / "livro"
+    assert summary["chunks"] == 2
+
+    write_book(book, ["A dignidade da pessoa humana.", "O Estado de Direito.", "Uma página nova."])
+    with pytest.raises(RuntimeError):
+        text_chunker_module.process_book(str(book), str(tmp_path / "stores"), log=lambda message: None,
+                                         embeddings=FailingEmbeddings(32))
+    assert len(open_chunk_store(str(store_dir))) == 2
+    store = CompactBookStore(str(store_dir), HashedNgramEmbeddings(32))
+    assert store.similarity_search_with_score("Estado de Direito", k=1)[0][0].page_content == "O Estado de Direito."
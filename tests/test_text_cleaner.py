@@ -0,0 +1,154 @@
+import io
+import time
+from openai import OpenAI
+
+from src.disk_cache import DiskCache
+from src.page_journal import PageJournal
+from src import text_cleaner
+from src.text_cleaner import clean_ocr_text
+from src.rate_limiter import RateLimiter
+from chat_stub import ChatCompletionsStub
+
+def write_ocr_file(path, num_pages):
+    pages = [f"\n{'='*40}\n[PÁGINA {i}]\n{'='*40}\n\ntexto bruto {i}" for i in range(1, num_pages + 1)]
+    path.write_text('\n\n'.join(pages), encoding='utf-8')
+
+def run_cleaning(tmp_path, stub, num_pages, **kwargs):
+    input_file = tmp_path / "livro.txt"
+    write_ocr_file(input_file, num_pages)
+    client = OpenAI(api_key="test", base_url=stub.base_url, max_retries=0)
+    kwargs.setdefault("cache", DiskCache(tmp_path / "cache.sqlite"))
+    clean_ocr_text(str(input_file), client=client, backoff=0.01, **kwargs)
+    return (tmp_path / "livro_cleaned.txt").read_text(encoding='utf-8')
+
+def test_pages_cleaned_concurrently_in_order(tmp_path):
+    with ChatCompletionsStub(latency=0.2) as stub:
+        start = time.perf_counter()
+        output = run_cleaning(tmp_path, stub, 12, max_workers=6)
+        elapsed = time.perf_counter() - start
+    
+    assert stub.max_in_flight > 1
+    assert stub.max_in_flight <= 6
+    assert elapsed < 12 * 0.2
+    positions = [output.index(f"Página {i} limpa") for i in range(1, 13)]
+    assert positions == sorted(positions)
+
+def test_retries_rate_limits_and_server_errors(tmp_path):
+    with ChatCompletionsStub(errors={2: [429, 503], 3: [500]}) as stub:
+        output = run_cleaning(tmp_path, stub, 3)
+    
+    assert stub.requests == 6
+    assert "Página 2 limpa" in output
+    assert "Página 3 limpa" in output
+
+def test_falls_back_to_raw_text_after_retries(tmp_path):
+    with ChatCompletionsStub(errors={2: [500] * 20}) as stub:
+        output = run_cleaning(tmp_path, stub, 3)
+    
+    assert "Página 1 limpa" in output
+    assert "texto bruto 2" in output
+    assert "Página 3 limpa" in output
+
+def test_failed_pages_are_retried_on_the_next_run(tmp_path):
+    journal_path = tmp_path / "livro_cleaned.txt.journal"
+    with ChatCompletionsStub(errors={2: [500] * 6}) as stub:
+        output = run_cleaning(tmp_path, stub, 3)
+        assert "texto bruto 2" in output
+        journal = PageJournal(str(journal_path))
+        assert journal.is_done(1, "texto bruto 1") and journal.is_done(3, "texto bruto 3")
+        assert not journal.is_done(2, "texto bruto 2")
+        journal.close()
+
+        requests = stub.requests
+        output = run_cleaning(tmp_path, stub, 3)
+
+    assert stub.requests == requests + 1
+    assert all(f"Página {i} limpa" in output for i in (1, 2, 3))
+    assert not journal_path.exists()
+
+def test_second_run_is_served_from_cache(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    with ChatCompletionsStub() as stub:
+        first = run_cleaning(tmp_path, stub, 4, cache=cache)
+        second = run_cleaning(tmp_path, stub, 4, cache=cache)
+    
+    assert stub.requests == 4
+    assert first == second
+    assert cache.hits == 4
+
+def test_failed_pages_are_not_cached(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite")
+    with ChatCompletionsStub(errors={1: [500] * 6}) as stub:
+        run_cleaning(tmp_path, stub, 1, cache=cache)
+        output = run_cleaning(tmp_path, stub, 1, cache=cache)
+    
+    assert "Página 1 limpa" in output
+
+def test_resumes_from_journal(tmp_path):
+    journal = PageJournal(str(tmp_path / "livro_cleaned.txt.journal"))
+    journal.append(1, "texto bruto 1", "página 1 do diário\n")
+    journal.append(2, "texto bruto 2", "página 2 do diário\n")
+    journal.close()
+    # Simulate a crash in the middle of writing page 3
+    with open(tmp_path / "livro_cleaned.txt.journal", "ab") as f:
+        f.write(b'{"page": 3, "sou')
+    
+    with ChatCompletionsStub() as stub:
+        output = run_cleaning(tmp_path, stub, 3)
+    
+    assert stub.requests == 1
+    assert output.startswith("página 1 do diário\n\npágina 2 do diário\n\n")
+    assert "Página 3 limpa" in output
+    assert not (tmp_path / "livro_cleaned.txt.journal").exists()
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite", max_bytes=10)
+    cache.set("a", b"12345")
+    cache.set("b", b"12345")
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", b"12345")
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+
+def test_rate_limiter_paces_requests():
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter._requests = 0
+    start = time.perf_counter()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.perf_counter() - start >= 0.25
+
+def test_unfinished_pages_are_written_but_redone(tmp_path):
+    journal = PageJournal(str(tmp_path / "j.journal"))
+    journal.append(1, "bruto 1", "limpa 1\n")
+    journal.append(2, "bruto 2", "bruto 2\n", done=False)
+    assert journal.is_done(1, "bruto 1") and not journal.is_done(2, "bruto 2")
+    journal.close()
+
+    journal = PageJournal(str(tmp_path / "j.journal"))
+    assert journal.unfinished == 1 and not journal.is_done(2, "bruto 2")
+    journal.append(2, "bruto 2", "limpa 2\n")
+    assert journal.unfinished == 0 and journal.is_done(2, "bruto 2")
+    out = io.StringIO()
+    journal.write_pages(out, [1, 2])
+    assert out.getvalue() == "limpa 1\n\nlimpa 2\n"
+    journal.close()
+
+def test_pages_are_read_as_they_are_cleaned(tmp_path, monkeypatch):
+    ahead = []
+    def iter_pages(path):
+        for read, page in enumerate(real_iter_pages(path), 1):
+            # Pages read but whose request has not even started yet
+            ahead.append(read - stub.requests)
+            yield page
+    real_iter_pages = text_cleaner.iter_pages
+    monkeypatch.setattr(text_cleaner, "iter_pages", iter_pages)
+
+    with ChatCompletionsStub(latency=0.05) as stub:
+        output = run_cleaning(tmp_path, stub, 20, max_workers=2)
+
+    assert len(ahead) == 20 and max(ahead) <= 2 * 2 + 1
+    positions = [output.index(f"Página {i} limpa") for i in range(1, 21)]
+    assert positions == sorted(positions)
@@ -0,0 +1,61 @@
+import os
+
+from src.chunk_store import META_FILE, write_chunk_store
+from src.text_index import INDEX_FILE, build_match_query, normalize_terms, open_text_index, search_books
+
+CHUNKS = [
+    {"content": "A Constituição da República Portuguesa consagra o Estado de Direito.", "metadata": {"page": 1, "book": "livro"}},
+    {"content": "As constituições liberais e os direitos fundamentais.", "metadata": {"page": 2, "book": "livro"}},
+    {"content": "A revolução de 25 de Abril de 1974 e a nova ordem.", "metadata": {"page": 3, "book": "livro"}},
+    {"content": "Direito e Estado: a separação de poderes.", "metadata": {"page": 4, "book": "livro"}},
+]
+
+def test_normalize_folds_accents_case_and_plurals():
+    assert normalize_terms("Constituições CONSTITUIÇÃO constituicao") == ["constituicao"] * 3
+    assert normalize_terms("direitos fundamentais leis") == ["direito", "fundamental", "lei"]
+    assert normalize_terms("portugueses português") == ["portugue", "portugue"]
+
+def test_match_query_phrases_and_dates():
+    assert build_match_query('"Estado de Direito" liberais') == '"estado de direito" AND "liberal"'
+    assert build_match_query("em 25/04/1974") == '"25 04 1974" AND "em"'
+    assert build_match_query("o que diz a constituição?", "OR") == '"diz" OR "constituicao"'
+    assert build_match_query("?!") == ""
+
+def test_search_is_accent_insensitive_and_ranked(tmp_path):
+    write_chunk_store(str(tmp_path), CHUNKS)
+    index = open_text_index(str(tmp_path))
+
+    assert sorted(row for row, _ in index.search_rows("constituicao")) == [0, 1]
+    assert [row for row, _ in index.search_rows('"estado de direito"')] == [0]
+    assert [row for row, _ in index.search_rows("25 de abril de 1974")] == [2]
+    assert index.search_rows("constituicao revolucao") == []
+    assert {row for row, _ in index.search_rows("constituicao revolucao", operator="OR")} == {0, 1, 2}
+
+    results = index.search("direito estado", limit=2, book="livro")
+    assert len(results) == 2
+    assert results[0]["score"] <= results[1]["score"]
+    assert results[0]["book"] == "livro" and "content" in results[0] and "page" in results[0]["metadata"]
+
+def test_index_rebuilt_when_chunks_change(tmp_path):
+    write_chunk_store(str(tmp_path), CHUNKS)
+    open_text_index(str(tmp_path)).close()
+    write_chunk_store(str(tmp_path), CHUNKS[:1])
+    index_file = tmp_path / INDEX_FILE
+    meta_mtime = (tmp_path / META_FILE).stat().st_mtime_ns
+    os.utime(index_file, ns=(meta_mtime - 10**9, meta_mtime - 10**9))
+
+    index = open_text_index(str(tmp_path))
+    assert index.search_rows("revolução") == []
+    assert [row for row, _ in index.search_rows("república")] == [0]
+
+def test_search_books_merges_by_score(tmp_path):
+    indexes = {}
+    for book in ("a", "b"):
+        (tmp_path / book).mkdir()
+        write_chunk_store(str(tmp_path / book), CHUNKS)
+        indexes[book] = open_text_index(str(tmp_path / book))
+
+    results = search_books(indexes, "direito", limit=3)
+    assert len(results) == 3
+    assert [r["score"] for r in results] == sorted(r["score"] for r in results)
+    assert {r["book"] for r in results} == {"a", "b"}
@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.chunk_store import write_chunk_store
+from src.vector_index import CompactBookStore, CompactVectors, StackedVectorIndex, quantize_int8, save_vectors
+
+def clustered_vectors(n=2000, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    return (centers[rng.integers(0, 20, n)] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+
+def recall(found, expected):
+    return len(set(found) & set(expected)) / len(expected)
+
+def test_int8_quantization_is_close():
+    vectors = clustered_vectors()
+    codes, scale = quantize_int8(vectors)
+    assert codes.dtype == np.int8 and scale.shape == (64,)
+    assert np.abs(codes * scale - vectors).max() <= scale.max() / 2 + 1e-6
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_compact_search_matches_exact(quantization):
+    vectors = clustered_vectors()
+    exact = CompactVectors.from_vectors(vectors, "float32")
+    compact = CompactVectors.from_vectors(vectors, quantization, rescore=4)
+    assert compact.nbytes < exact.nbytes
+
+    queries = clustered_vectors(50, seed=1)
+    recalls = []
+    for query in queries:
+        expected = [row for row, _ in exact.search(query, 10)]
+        found = compact.search(query, 10)
+        recalls.append(recall([row for row, _ in found], expected))
+        # Rescored similarities are exact float32 cosines
+        for row, score in found:
+            assert score == pytest.approx(float(exact.full[row] @ (query / np.linalg.norm(query))), abs=1e-5)
+    assert np.mean(recalls) >= 0.98
+
+def test_load_keeps_full_vectors_on_disk(tmp_path):
+    vectors = clustered_vectors(100)
+    save_vectors(str(tmp_path), vectors)
+    loaded = CompactVectors.load(str(tmp_path), "int8")
+    assert isinstance(loaded.full, np.memmap)
+    assert loaded.nbytes == 100 * 64 + 64 * 4
+    assert loaded.search(vectors[7], 1)[0][0] == 7
+
+def make_book(store_dir, vectors, book):
+    store_dir.mkdir()
+    save_vectors(str(store_dir), vectors)
+    write_chunk_store(str(store_dir), [
+        {"content": f"{book} {i}", "metadata": {"page": i + 1, "book": book}} for i in range(len(vectors))
+    ])
+
+def test_stacked_index_matches_per_book_exact_search(tmp_path):
+    vectors_a, vectors_b = clustered_vectors(300, seed=2), clustered_vectors(200, seed=3)
+    make_book(tmp_path / "a", vectors_a, "a")
+    make_book(tmp_path / "b", vectors_b, "b")
+    index = StackedVectorIndex(embeddings=None)
+    index.add_book("a", str(tmp_path / "a"))
+    index.add_book("b", str(tmp_path / "b"))
+    assert index.matrix.shape == (500, 64)
+
+    query = vectors_b[42]
+    results = index.search_books(query, 3)
+    for book, vectors in (("a", vectors_a), ("b", vectors_b)):
+        expected = [row for row, _ in CompactVectors.from_vectors(vectors, "float32").search(query, 3)]
+        assert [r["metadata"]["page"] - 1 for r in results[book]] == expected
+        assert all(r["book"] == book for r in results[book])
+    assert results["b"][0]["content"] == "b 42"
+    assert results["b"][0]["score"] == pytest.approx(0.0, abs=1e-5)
+
+    assert list(index.search_books(query, 2, books=["a"])) == ["a"]
+
+def test_stacked_index_concurrent_first_searches(tmp_path):
+    books = {name: clustered_vectors(150, seed=seed) for seed, name in enumerate("abcd", 4)}
+    for name, vectors in books.items():
+        make_book(tmp_path / name, vectors, name)
+    index = StackedVectorIndex(embeddings=None)
+    for name in "abc":
+        index.add_book(name, str(tmp_path / name))
+    assert index.search_books(books["c"][5], 1)["c"][0]["content"] == "c 5"
+
+    # Adding a book rebuilds the stack; searches racing the rebuild still see a consistent one
+    index.add_book("d", str(tmp_path / "d"))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda row: index.search_books(books["d"][row], 1)["d"][0]["content"],
+                                range(32)))
+    assert results == [f"d {row}" for row in range(32)]
+    assert index.starts.tolist() == [0, 150, 300, 450, 600]
+
+def test_empty_stacked_index(tmp_path):
+    index = StackedVectorIndex(embeddings=None)
+    assert index.search_books(clustered_vectors(1)[0], 3) == {}
+    assert index.nbytes == 0
+
+def test_stacked_index_reopens_reindexed_books(tmp_path):
+    make_book(tmp_path / "a", clustered_vectors(30, seed=7), "a")
+    make_book(tmp_path / "b", clustered_vectors(20, seed=8), "b")
+    index = StackedVectorIndex(embeddings=None)
+    index.add_book("a", str(tmp_path / "a"))
+    index.add_book("b", str(tmp_path / "b"))
+    assert index.matrix.shape == (50, 64)
+
+    # Re-index "b" with more chunks, vectors first as process_book does
+    new_vectors = clustered_vectors(40, seed=9)
+    save_vectors(str(tmp_path / "b"), new_vectors)
+    assert index.search_books(new_vectors[3], 1)["b"][0]["content"].startswith("b ")  # Old pair still served
+    write_chunk_store(str(tmp_path / "b"), [
+        {"content": f"b novo {i}", "metadata": {"page": i + 1, "book": "b"}} for i in range(40)
+    ])
+    assert index.search_books(new_vectors[35], 1)["b"][0]["content"] == "b novo 35"
+    assert index.starts.tolist() == [0, 30, 70]
+
+def test_vectors_must_match_the_chunk_rows(tmp_path):
+    make_book(tmp_path / "a", clustered_vectors(10), "a")
+    save_vectors(str(tmp_path / "a"), clustered_vectors(8))
+    with pytest.raises(ValueError, match="8 vetores para 10 chunks"):
+        CompactBookStore(str(tmp_path / "a"), embeddings=None, quantization="int8")
+    index = StackedVectorIndex(embeddings=None)
+    with pytest.raises(ValueError):
+        index.add_book("a", str(tmp_path / "a"))
+    assert index.books == [] and index.matrix.shape == (0, 0)
+
+def test_saving_vectors_replaces_files_open_elsewhere(tmp_path):
+    old, new = clustered_vectors(50, seed=5), clustered_vectors(60, seed=6)
+    save_vectors(str(tmp_path), old)
+    loaded = CompactVectors.load(str(tmp_path), "int8")
+    save_vectors(str(tmp_path), new)
+
+    # The memory-mapped float32 rows of the old files stay intact
+    assert loaded.full.shape == (50, 64)
+    assert loaded.search(old[7], 1)[0][0] == 7
+    assert CompactVectors.load(str(tmp_path), "int8").full.shape == (60, 64)
+    assert not list(tmp_path.glob("*.tmp"))
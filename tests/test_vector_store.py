@@ -0,0 +1,55 @@
+import hashlib
+
+from qdrant_client import QdrantClient
+
+from src.vector_store import VectorStore
+
+class FakeEmbedder:
+    """Deterministic 8-dimensional embeddings that record every batch request."""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, texts):
+        self.calls.append(len(texts))
+        return [[b / 255 + 0.01 for b in hashlib.sha256(text.encode('utf-8')).digest()[:8]] for text in texts]
+
+def make_chunks(book, count):
+    return [{"text": f"{book} trecho {i} " * 20, "metadata": {"source": f"{book}.pdf", "book": book}} for i in range(count)]
+
+def make_store(embedder):
+    return VectorStore(collection_name="teste", client=QdrantClient(":memory:"), embedder=embedder, vector_size=8)
+
+def test_batches_embeddings_and_upserts():
+    embedder = FakeEmbedder()
+    store = make_store(embedder)
+    
+    added = store.add_documents(make_chunks("livro", 50), batch_tokens=2000, batch_size=16,
+                                upsert_batch_size=7, workers=3)
+    
+    assert added == 50
+    assert sum(embedder.calls) == 50
+    assert 1 < len(embedder.calls) < 50
+    assert max(embedder.calls) <= 16
+    assert store.client.count("teste").count == 50
+
+def test_point_ids_are_stable_per_book():
+    store = make_store(FakeEmbedder())
+    store.add_documents(make_chunks("livro_a", 10))
+    store.add_documents(make_chunks("livro_b", 10))
+    assert store.client.count("teste").count == 20
+    
+    # Re-indexing a book replaces its points instead of duplicating them
+    store.add_documents(make_chunks("livro_a", 10))
+    assert store.client.count("teste").count == 20
+
+def test_search_returns_payload():
+    embedder = FakeEmbedder()
+    store = make_store(embedder)
+    chunks = make_chunks("livro", 5)
+    store.add_documents(chunks)
+    
+    results = store.search(chunks[3]["text"], limit=1)
+    assert results[0]["text"] == chunks[3]["text"]
+    assert results[0]["chunk_index"] == 3
+    assert results[0]["source"] == "livro.pdf"